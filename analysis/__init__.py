@@ -0,0 +1,2 @@
+# analysis/__init__.py
+# Claim reports; see analysis/claims_report.py
@@ -0,0 +1,239 @@
+# analysis/claims_report.py
+"""
+python -m analysis.claims_report  [--mode stream|sql] [--reports costs,chronic]
+                                  [--chunk-size 100000] [--top 10] [--high-risk 3]
+                                  [--sqlite medoptix.db] [--profile]
+
+All claim reports from one scan of each table they need, in bounded memory.
+
+* stream – one unbuffered cursor per table, read `--chunk-size` rows at a
+           time into online aggregators (sum/count per ICD9 code, per
+           chronic-condition bitmask)
+* sql    – the database computes the same partial aggregates with GROUP BY,
+           and only a few thousand grouped rows come back
+
+Both modes reduce to the same partials, so the printed reports are identical:
+
+* costs   – top ICD9 codes by average Medicare payment, Medicare vs patient
+            cost (from `claims`)
+* chronic – total cost per chronic condition and high-risk (3+ conditions)
+            patients (from `beneficiary_summary`, one row per beneficiary;
+            see bene_summary.py)
+"""
+
+import argparse
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+import perf
+from bene_summary import SUMMARY_TABLE
+from chronic_flags import MASK_COL, N_MASKS, condition_count, rollup
+
+REPORTS = ["costs", "chronic"]
+CHUNK_SIZE = 100_000
+TOP_N = 10
+HIGH_RISK_CONDITIONS = 3
+AMOUNTS = ["medicare_payment", "patient_deductible", "coinsurance_amount"]
+DIAG_COL = "icd9_diagnosis_code"
+
+CLAIMS_QUERY = f"SELECT {DIAG_COL}, {', '.join(AMOUNTS)} FROM claims"
+SUMMARY_QUERY = f"SELECT {MASK_COL}, claim_count, total_cost FROM {SUMMARY_TABLE} WHERE claim_count > 0"
+
+
+def connect(sqlite_path=None):
+    """A SQLite connection, or a pooled MySQL one, as a context manager."""
+    if sqlite_path:
+        return closing(sqlite3.connect(sqlite_path))
+    from config.db_config import connection
+    return connection()
+
+
+# 📦 Partial aggregates: what both modes produce and the reports read
+class ClaimAggregates:
+    def __init__(self):
+        self.diag = pd.DataFrame({"sum": [], "count": []}, index=pd.Index([], name=DIAG_COL), dtype="float64")
+        self.medicare_sum = self.medicare_n = 0.0
+        self.patient_sum = self.patient_n = 0.0
+        self.rows = 0
+        # Per chronic bitmask, over beneficiaries with claims: total cost, patients, claims
+        self.mask_cost = np.zeros(N_MASKS)
+        self.mask_patients = np.zeros(N_MASKS)
+        self.mask_claims = np.zeros(N_MASKS)
+
+    def update_claims(self, chunk):
+        """Fold one chunk of `CLAIMS_QUERY` rows into the running totals."""
+        for col in AMOUNTS:
+            chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+        self.rows += len(chunk)
+
+        medicare = chunk["medicare_payment"]
+        patient = chunk["patient_deductible"] + chunk["coinsurance_amount"]
+        self.medicare_sum += medicare.sum()
+        self.medicare_n += medicare.count()
+        self.patient_sum += patient.sum()
+        self.patient_n += patient.count()
+
+        per_code = medicare.groupby(chunk[DIAG_COL]).agg(["sum", "count"])
+        self.diag = self.diag.add(per_code, fill_value=0)
+
+    def update_summary(self, chunk):
+        """Fold one chunk of `SUMMARY_QUERY` rows (one per beneficiary) into the per-mask totals."""
+        mask = chunk[MASK_COL].to_numpy(dtype="int64")
+        self.mask_cost += np.bincount(mask, weights=pd.to_numeric(chunk["total_cost"]).to_numpy(dtype="float64"),
+                                      minlength=N_MASKS)
+        self.mask_patients += np.bincount(mask, minlength=N_MASKS)
+        self.mask_claims += np.bincount(mask, weights=chunk["claim_count"].to_numpy(dtype="float64"),
+                                        minlength=N_MASKS)
+
+
+def iter_cursor_chunks(conn, query, chunk_size=CHUNK_SIZE):
+    """DataFrames of at most `chunk_size` rows from one cursor; only one chunk is held at a time."""
+    # mysql.connector cursors are unbuffered unless asked otherwise, so rows stay on the server until fetched
+    cur = conn.cursor()
+    try:
+        cur.execute(query)
+        columns = [d[0] for d in cur.description]
+        while True:
+            with perf.span("fetch chunk") as s:
+                rows = cur.fetchmany(chunk_size)
+                s.rows = len(rows)
+            if not rows:
+                return
+            yield pd.DataFrame.from_records(rows, columns=columns)
+    finally:
+        cur.close()
+
+
+def stream_aggregates(conn, reports=REPORTS, chunk_size=CHUNK_SIZE):
+    """One pass over each table the reports need."""
+    aggregates = ClaimAggregates()
+    sources = [("costs", CLAIMS_QUERY, aggregates.update_claims),
+               ("chronic", SUMMARY_QUERY, aggregates.update_summary)]
+    for report, query, update in sources:
+        if report in reports:
+            for chunk in iter_cursor_chunks(conn, query, chunk_size):
+                with perf.span(f"aggregate {report} chunk", rows=len(chunk)):
+                    update(chunk)
+    return aggregates
+
+
+def sql_aggregates(conn, reports=REPORTS):
+    """The same partials as `stream_aggregates`, computed by the database."""
+    aggregates = ClaimAggregates()
+    if "costs" in reports:
+        with perf.span("sql per-code averages") as s:
+            diag = pd.read_sql(f"""
+                SELECT {DIAG_COL}, SUM(medicare_payment) AS payment_sum, COUNT(medicare_payment) AS payment_n
+                FROM claims WHERE {DIAG_COL} IS NOT NULL GROUP BY {DIAG_COL}
+            """, conn)
+            diag = diag.rename(columns={"payment_sum": "sum", "payment_n": "count"}).set_index(DIAG_COL)
+            aggregates.diag = diag.apply(pd.to_numeric).fillna(0).astype("float64")
+            s.rows = len(diag)
+
+        with perf.span("sql cost totals"):
+            totals = pd.read_sql("""
+                SELECT COUNT(*) AS rows_, SUM(medicare_payment) AS medicare_sum, COUNT(medicare_payment) AS medicare_n,
+                       SUM(patient_deductible + coinsurance_amount) AS patient_sum,
+                       COUNT(patient_deductible + coinsurance_amount) AS patient_n
+                FROM claims
+            """, conn).iloc[0]
+            aggregates.rows = int(totals["rows_"])
+            for col in ["medicare_sum", "medicare_n", "patient_sum", "patient_n"]:
+                setattr(aggregates, col, float(pd.to_numeric(totals[col]) or 0))
+
+    if "chronic" in reports:
+        with perf.span("sql per-mask costs") as s:
+            masks = pd.read_sql(f"""
+                SELECT {MASK_COL}, SUM(total_cost) AS cost, COUNT(*) AS patients, SUM(claim_count) AS claims
+                FROM {SUMMARY_TABLE} WHERE claim_count > 0
+                GROUP BY {MASK_COL}
+            """, conn)
+            index = masks[MASK_COL].to_numpy(dtype="int64")
+            aggregates.mask_cost[index] = pd.to_numeric(masks["cost"]).to_numpy(dtype="float64")
+            aggregates.mask_patients[index] = masks["patients"].to_numpy(dtype="float64")
+            aggregates.mask_claims[index] = pd.to_numeric(masks["claims"]).to_numpy(dtype="float64")
+            s.rows = len(masks)
+    return aggregates
+
+
+# 📊 Reports
+def report_costs(aggregates, top_n=TOP_N):
+    print(f"\n🧾 Top {top_n} Average Medicare Payments by Diagnosis Code:")
+    diag = aggregates.diag[aggregates.diag["count"] > 0]
+    means = (diag["sum"] / diag["count"]).rename("medicare_payment")
+    print(means.sort_values(ascending=False).head(top_n))
+
+    print("\n💵 Medicare vs. Patient Cost Comparison:")
+    avg_medicare = aggregates.medicare_sum / aggregates.medicare_n if aggregates.medicare_n else float("nan")
+    avg_patient = aggregates.patient_sum / aggregates.patient_n if aggregates.patient_n else float("nan")
+    total_avg = avg_medicare + avg_patient
+    patient_ratio = (avg_patient / total_avg) if total_avg else 0
+
+    print(f"Average Medicare Payment : ${avg_medicare:.2f}")
+    print(f"Average Patient Cost     : ${avg_patient:.2f}")
+    print(f"Patient Cost Share       : {patient_ratio:.2%}")
+
+
+def report_chronic(aggregates, high_risk=HIGH_RISK_CONDITIONS):
+    # The partials hold one entry per mask, so the rollup weighs each by its patient count
+    masks = np.arange(N_MASKS)
+    by_condition, by_count = rollup(masks, aggregates.mask_cost, rows=aggregates.mask_patients)
+
+    print("\n📊 Total Cost per Chronic Condition:")
+    for condition, cost in by_condition.items():
+        print(f"{condition: <15}: ${cost:,.2f}")
+
+    print(f"\n🔥 High-Risk Patients ({high_risk}+ chronic conditions):")
+    risky = by_count.loc[high_risk:]
+    patients = risky["rows"].sum()
+    avg_high_risk_cost = risky["total"].sum() / patients if patients else float("nan")
+    claims = aggregates.mask_claims[condition_count(masks) >= high_risk].sum()
+    print(f"Avg total cost per high-risk patient: ${avg_high_risk_cost:,.2f}")
+    print(f"Number of high-risk patients        : {int(patients):,}")
+    print(f"Claims from high-risk patients      : {int(claims):,}")
+
+
+def run(conn, mode="stream", reports=REPORTS, chunk_size=CHUNK_SIZE, top_n=TOP_N, high_risk=HIGH_RISK_CONDITIONS):
+    """Aggregate once (streamed or pushed down) and print every requested report."""
+    with perf.span(f"{mode} aggregates") as s:
+        aggregates = stream_aggregates(conn, reports, chunk_size) if mode == "stream" else sql_aggregates(conn, reports)
+        s.rows = aggregates.rows
+    with perf.span("reports"):
+        if "costs" in reports:
+            report_costs(aggregates, top_n)
+        if "chronic" in reports:
+            report_chronic(aggregates, high_risk)
+    return aggregates
+
+
+def main(argv=None, default_reports=REPORTS):
+    p = argparse.ArgumentParser(description="Claim cost reports from one streaming pass per table (or SQL pushdown).")
+    p.add_argument("--mode", choices=["stream", "sql"], default="stream",
+                   help="stream: chunked client-side aggregation; sql: GROUP BY in the database (default: stream)")
+    p.add_argument("--reports", default=",".join(default_reports),
+                   help=f"Comma-separated subset of {','.join(REPORTS)} (default: {','.join(default_reports)})")
+    p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help=f"Rows fetched per chunk (default: {CHUNK_SIZE})")
+    p.add_argument("--top", type=int, default=TOP_N, help=f"Diagnosis codes listed (default: {TOP_N})")
+    p.add_argument("--high-risk", type=int, default=HIGH_RISK_CONDITIONS,
+                   help=f"Chronic conditions that make a patient high-risk (default: {HIGH_RISK_CONDITIONS})")
+    p.add_argument("--sqlite", help="Read a SQLite database (e.g. from benchmark.py) instead of MySQL")
+    p.add_argument("--profile", action="store_true", help="Print per-stage timings (same as MEDOPTIX_PERF=1)")
+    args = p.parse_args(argv)
+
+    reports = [r.strip() for r in args.reports.split(",") if r.strip()]
+    unknown = set(reports) - set(REPORTS)
+    if unknown:
+        p.error(f"Unknown report(s): {', '.join(sorted(unknown))}")
+    if args.profile:
+        perf.enable()
+
+    with connect(args.sqlite) as conn:
+        run(conn, args.mode, reports, args.chunk_size, args.top, args.high_risk)
+    perf.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,87 @@
 import streamlit as st
 import pandas as pd
-import mysql.connector
 import plotly.express as px
-import joblib
 import os
-import gdown
+from pathlib import Path
 from datetime import date
-from config.db_config import DB_CONFIG
+from config import db_config
+import dashboard_queries
+import snapshot_cache
+import cost_cube
+import model_assets
+import batch_predict
+import data_export
+import perf
+from bene_index import PAGE_SIZE, BeneficiaryIndex
+from result_cache import ResultCache, frame_bytes
+from schema import AGE_LABELS, CHRONIC_COLS
 
 # ------------------------------
-# 🚀 Load data from MySQL
+# 🚀 Load local snapshot (if built) or query aggregates from MySQL
 # ------------------------------
+@st.cache_resource(max_entries=1)
+def load_snapshot(version):
+    # `version` changes on every refresh, so a new snapshot gets a new cache entry
+    if version is None:
+        return None
+    # Compact dtypes (categorical codes, int8 flags, float32 amounts) with age precomputed
+    with perf.span("load snapshot") as s:
+        df = snapshot_cache.load_dashboard_frame()
+        s.rows = len(df)
+    return df
+
+def run_query(fn, *args):
+    # Connections come from the process-wide pool, so sessions reuse them instead of reconnecting
+    with perf.span(f"query {fn.__name__}"), db_config.connection() as conn:
+        return fn(conn, *args)
+
+@st.cache_data(ttl=300)
+def load_db_version():
+    return str(run_query(dashboard_queries.fetch_data_version))
+
+@st.cache_resource(max_entries=1)
+def load_cube(version, _snapshot_df):
+    # Rebuilt once per data refresh; every filter change is then a dict lookup
+    if _snapshot_df is not None:
+        with perf.span("build cost cube", rows=len(_snapshot_df)):
+            return cost_cube.build_cube_from_frame(_snapshot_df)
+    return run_query(cost_cube.build_cube_from_db)
+
+@st.cache_resource
+def load_result_cache():
+    # One LRU of per-selection results for the whole process, shared by every session
+    return ResultCache()
+
+@st.cache_resource(max_entries=1)
+def load_bene_index(version, _snapshot_df):
+    with perf.span("build beneficiary index", rows=len(_snapshot_df)):
+        return BeneficiaryIndex(_snapshot_df)
+
+@st.cache_data(max_entries=256)
+def load_bene_count(state, age_group, chronic, prefix):
+    return run_query(dashboard_queries.fetch_bene_count, state, age_group, chronic, prefix)
+
+@st.cache_data(max_entries=256)
+def load_bene_page(state, age_group, chronic, prefix, page):
+    return run_query(dashboard_queries.fetch_bene_page, state, age_group, chronic, prefix, PAGE_SIZE, page * PAGE_SIZE)
+
 @st.cache_data
-def load_data():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    df_beneficiary = pd.read_sql("SELECT * FROM beneficiary_info", conn)
-    df_claims = pd.read_sql("SELECT * FROM claims", conn)
-    conn.close()
-    return df_beneficiary, df_claims
-GDRIVE_MODELS = {
-    "cost_model_xgb": "https://drive.google.com/uc?id=1Z-3xB2tSRebrbgUjNO_68Bhiz9IiM1BD",
-    "le_icd9": "https://drive.google.com/uc?id=1VlHsM0Q8Qc7-DlLJkaij5Pa9XfeMjFLD",
-    "le_hcpcs": "https://drive.google.com/uc?id=16nYj5VHD2hqIM45GkeRV92zGYq2vtKge",
-}
+def load_beneficiary_claims(bene_id):
+    return run_query(dashboard_queries.fetch_beneficiary_claims, bene_id)
+
 # ------------------------------
 # 🧠 Load Model + Encoders
 # ------------------------------
 @st.cache_resource
 def load_model_assets():
-    os.makedirs("models", exist_ok=True)
-    
-    model_path = "models/cost_model_xgb.joblib"
-    icd9_path = "models/le_icd9.joblib"
-    hcpcs_path = "models/le_hcpcs.joblib"
-    
-    if not os.path.exists(model_path):
-        gdown.download(GDRIVE_MODELS["cost_model_xgb"], model_path, quiet=False)
-    if not os.path.exists(icd9_path):
-        gdown.download(GDRIVE_MODELS["le_icd9"], icd9_path, quiet=False)
-    if not os.path.exists(hcpcs_path):
-        gdown.download(GDRIVE_MODELS["le_hcpcs"], hcpcs_path, quiet=False)
-
-    model = joblib.load(model_path)
-    le_icd9 = joblib.load(icd9_path)
-    le_hcpcs = joblib.load(hcpcs_path)
-
-    chronic_cols = [f for f in model.feature_names_in_ if f.startswith("SP_")]
-    return model, le_icd9, le_hcpcs, chronic_cols
-
-def encode_or_unknown(le, val):
-    try:
-        return int(le.transform([str(val)])[0])
-    except:
-        return -1
-
-def build_feature_row(age, icd9, hcpcs, chronic_cols, selected_flags, le_icd9, le_hcpcs):
+    with perf.span("load model assets"):
+        return model_assets.load_model_assets()
+
+def build_feature_row(age, icd9, hcpcs, chronic_cols, selected_flags, icd9_encoder, hcpcs_encoder):
     row = {
         "age": age,
-        "icd9_diagnosis_code": encode_or_unknown(le_icd9, icd9),
-        "hcpcs_code": encode_or_unknown(le_hcpcs, hcpcs),
+        "icd9_diagnosis_code": icd9_encoder.encode_one(icd9),
+        "hcpcs_code": hcpcs_encoder.encode_one(hcpcs),
     }
     for col in chronic_cols:
         row[col] = 1 if col in selected_flags else 0
@@ -74,61 +97,71 @@ try:
 except:
     st.sidebar.warning("⚠️ Logo not found.")
 
-st.sidebar.header("🔎 Filters")
+# Spans are recorded per script run, only while the panel is on
+show_perf = st.sidebar.toggle("⏱ Performance panel", value=perf.ENABLED)
+recorder = perf.activate(perf.Recorder(enabled=show_perf))
 
-# Load & merge data
-df_beneficiary, df_claims = load_data()
-df = pd.merge(df_claims, df_beneficiary, on="bene_id")
+st.sidebar.header("🔎 Filters")
 
 # ------------------------------
 # 📌 Filters
 # ------------------------------
-df["age"] = pd.to_datetime("2022-01-01").year - pd.to_datetime(df["birth_date"], errors="coerce").dt.year
-age_bins = [0, 65, 75, 85, 100, 120]
-df["age_group"] = pd.cut(df["age"], bins=age_bins, labels=["<65", "65-74", "75-84", "85-99", "100+"])
+snapshot_version = snapshot_cache.snapshot_version()
+snapshot_df = load_snapshot(snapshot_version)
+data_version = snapshot_version or load_db_version()
+cube = load_cube(data_version, snapshot_df)
+
+state_filter = st.sidebar.selectbox("State", options=["All"] + cost_cube.state_options(cube))
+age_filter = st.sidebar.selectbox("Age Group", options=["All"] + AGE_LABELS)
+
+chronic_filter = st.sidebar.selectbox("Chronic Condition", options=["All"] + CHRONIC_COLS)
 
-state_filter = st.sidebar.selectbox("State", options=["All"] + sorted(df["state_code"].dropna().unique().tolist()))
-age_filter = st.sidebar.selectbox("Age Group", options=["All"] + df["age_group"].dropna().astype(str).unique().tolist())
+results = load_result_cache()
+results.sync(data_version)
 
-chronic_cols = [col for col in df.columns if col.startswith("SP_")]
-chronic_filter = st.sidebar.selectbox("Chronic Condition", options=["All"] + chronic_cols)
+def build_summary(state, age_group, chronic):
+    with perf.span("build summary figures"):
+        totals, top_diag, chronic_df = cost_cube.lookup_summary(cube, state, age_group, chronic)
+        fig_diag = px.bar(top_diag, x="icd9_diagnosis_code", y="medicare_payment", title="Top 10 Diagnosis Codes")
+        fig_chronic = None if chronic_df.empty else px.pie(
+            chronic_df, names="Condition", values="Total Medicare Cost", title="Medicare Cost by Chronic Condition"
+        )
+        return totals, fig_diag, fig_chronic
 
-if state_filter != "All":
-    df = df[df["state_code"] == state_filter]
-if age_filter != "All":
-    df = df[df["age_group"] == age_filter]
-if chronic_filter != "All":
-    df = df[df[chronic_filter] == 1]
+def filtered_frame(state, age_group, chronic):
+    # "All" is the snapshot frame itself, so it adds nothing to the cache size
+    return results.get(
+        ("frame", state, age_group, chronic),
+        lambda: dashboard_queries.filter_frame(snapshot_df, state, age_group, chronic),
+        size=lambda sub: 0 if sub is snapshot_df else frame_bytes(sub),
+    )
+
+with perf.span("filters"):
+    totals, fig_diag, fig_chronic = results.get(
+        ("summary", state_filter, age_filter, chronic_filter),
+        lambda: build_summary(state_filter, age_filter, chronic_filter),
+    )
 
 # ------------------------------
 # 📊 Cost Summary
 # ------------------------------
 st.title("📊 Cost Summary Dashboard")
 
-st.metric("💰 Total Medicare Payment", f"${df['medicare_payment'].sum():,.2f}")
-st.metric("🧾 Total Patient Cost", f"${(df['patient_deductible'] + df['coinsurance_amount']).sum():,.2f}")
+st.metric("💰 Total Medicare Payment", f"${totals['medicare_payment']:,.2f}")
+st.metric("🧾 Total Patient Cost", f"${totals['patient_cost']:,.2f}")
 
 st.subheader("💡 Medicare Payments by Diagnosis Code")
-top_diag = df.groupby("icd9_diagnosis_code")["medicare_payment"].sum().nlargest(10).reset_index()
-fig_diag = px.bar(top_diag, x="icd9_diagnosis_code", y="medicare_payment", title="Top 10 Diagnosis Codes")
-st.plotly_chart(fig_diag, use_container_width=True)
+with perf.span("plot diagnoses"):
+    st.plotly_chart(fig_diag, use_container_width=True)
 
 # ------------------------------
 # 🧠 Chronic Insights
 # ------------------------------
 st.title("🧠 Chronic Condition Insights")
 
-chronic_summary = {
-    col: df[df[col] == 1]["medicare_payment"].sum()
-    for col in chronic_cols
-}
-chronic_df = pd.DataFrame(list(chronic_summary.items()), columns=["Condition", "Total Medicare Cost"])
-chronic_df = chronic_df[chronic_df["Total Medicare Cost"] > 0]
-
-if not chronic_df.empty:
-    fig_chronic = px.pie(chronic_df, names="Condition", values="Total Medicare Cost",
-                         title="Medicare Cost by Chronic Condition")
-    st.plotly_chart(fig_chronic, use_container_width=True)
+if fig_chronic is not None:
+    with perf.span("plot chronic"):
+        st.plotly_chart(fig_chronic, use_container_width=True)
 else:
     st.info("No chronic condition costs found for current filters.")
 
@@ -137,22 +170,42 @@ else:
 # ------------------------------
 st.title("🧾 Individual Claim Explorer")
 
-selected_id = st.selectbox("🔍 Select Beneficiary ID", options=sorted(df["bene_id"].unique()))
-filtered_claims = df[df["bene_id"] == selected_id]
+# Only one page of IDs goes to the browser; search and lookup use the sorted index (or the bene_id key in MySQL)
+with perf.span("claim explorer") as s:
+    search_col, page_col = st.columns([3, 1])
+    prefix = search_col.text_input("🔍 Search Beneficiary ID", placeholder="Type the start of an ID").strip()
+    if snapshot_df is not None:
+        bene_index = load_bene_index(data_version, snapshot_df)
+        selection = bene_index.select(state_filter, age_filter, chronic_filter)
+        total = bene_index.count(selection, prefix)
+    else:
+        total = load_bene_count(state_filter, age_filter, chronic_filter, prefix)
+    n_pages = max(1, -(-total // PAGE_SIZE))
+    page = page_col.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1) - 1
+
+    if snapshot_df is not None:
+        options, _ = bene_index.search(selection, prefix, page)
+    else:
+        options = load_bene_page(state_filter, age_filter, chronic_filter, prefix, page)
+    selected_id = st.selectbox(f"Select Beneficiary ID ({total:,} match)", options=options)
+
+    if selected_id is None:
+        filtered_claims = pd.DataFrame(columns=dashboard_queries.EXPLORER_COLUMNS)
+    elif snapshot_df is not None:
+        filtered_claims = bene_index.claims(selected_id)[dashboard_queries.EXPLORER_COLUMNS]
+    else:
+        filtered_claims = load_beneficiary_claims(selected_id)
+    s.rows = len(filtered_claims)
 
 st.write(f"Showing {len(filtered_claims)} claim(s) for Beneficiary ID: `{selected_id}`")
-st.dataframe(filtered_claims[[
-    "claim_id", "bene_id", "birth_date", "state_code", "age", 
-    "icd9_diagnosis_code", "hcpcs_code", 
-    "medicare_payment", "patient_deductible", "coinsurance_amount"
-]], use_container_width=True)
+st.dataframe(filtered_claims, use_container_width=True)
 
 # ------------------------------
 # 💸 Cost Predictor
 # ------------------------------
 st.title("💸 Medicare Cost Predictor")
 
-model, le_icd9, le_hcpcs, chronic_flags = load_model_assets()
+model, icd9_encoder, hcpcs_encoder, chronic_flags = load_model_assets()
 
 with st.form("predict_form"):
     birth_year = st.number_input("Birth Year", min_value=1900, max_value=date.today().year, value=1950)
@@ -163,9 +216,10 @@ with st.form("predict_form"):
 
     submitted = st.form_submit_button("Predict Cost")
     if submitted:
-        X_pred = build_feature_row(age, icd9, hcpcs, chronic_flags, selected_flags, le_icd9, le_hcpcs)
+        X_pred = build_feature_row(age, icd9, hcpcs, chronic_flags, selected_flags, icd9_encoder, hcpcs_encoder)
         X_pred = X_pred.reindex(columns=model.feature_names_in_, fill_value=0)
-        prediction = float(model.predict(X_pred)[0])
+        with perf.span("model.predict", rows=1):
+            prediction = float(model.predict(X_pred)[0])
         st.metric("💵 Predicted Medicare Payment", f"${prediction:,.2f}")
 
 # ------------------------------
@@ -174,28 +228,88 @@ with st.form("predict_form"):
 st.subheader("📂 Upload CSV for Batch Prediction")
 csv_file = st.file_uploader("Upload CSV with columns: age, icd9_diagnosis_code, hcpcs_code, SP_*", type=["csv"])
 
-if csv_file:
-    df_upload = pd.read_csv(csv_file)
-    df_upload["icd9_diagnosis_code"] = df_upload["icd9_diagnosis_code"].astype(str).apply(lambda v: encode_or_unknown(le_icd9, v))
-    df_upload["hcpcs_code"] = df_upload["hcpcs_code"].astype(str).apply(lambda v: encode_or_unknown(le_hcpcs, v))
+# Scored files are deleted when their upload is removed or replaced; files of sessions
+# that closed without doing so are swept once nobody has shown them for a while
+os.makedirs(batch_predict.OUTPUT_DIR, exist_ok=True)
+batch_predict.sweep_outputs()
+batch = st.session_state.get("batch_output")
+if batch is not None and (csv_file is None or batch[0] != csv_file.file_id):
+    Path(batch[1]).unlink(missing_ok=True)
+    del st.session_state["batch_output"]
 
-    missing = [col for col in model.feature_names_in_ if col not in df_upload.columns]
-    for m in missing:
-        df_upload[m] = 0
-    df_upload = df_upload[model.feature_names_in_]
+if csv_file:
+    # Score once per uploaded file; reruns reuse the scored temp file
+    if "batch_output" not in st.session_state:
+        progress_bar = st.progress(0.0, text="Scoring...")
+        out_path = os.path.join(batch_predict.OUTPUT_DIR, f"{csv_file.file_id}.csv.gz")
+        try:
+            with perf.span("batch scoring") as s:
+                rows, preview = batch_predict.score_csv(
+                    csv_file, out_path, model, icd9_encoder, hcpcs_encoder,
+                    progress=lambda done, fraction: progress_bar.progress(fraction, text=f"Scored {done:,} rows")
+                )
+                s.rows = rows
+        except BaseException:
+            Path(out_path).unlink(missing_ok=True)
+            raise
+        progress_bar.empty()
+        st.session_state["batch_output"] = (csv_file.file_id, out_path, rows, preview)
 
-    preds = model.predict(df_upload)
-    df_out = df_upload.copy()
-    df_out["predicted_medicare_payment"] = preds
-    st.dataframe(df_out.head())
-    st.download_button("⬇️ Download Predictions", df_out.to_csv(index=False), "predictions.csv", "text/csv")
+    _, out_path, rows, preview = st.session_state["batch_output"]
+    if not os.path.exists(out_path):
+        # Swept while the session sat idle: score the upload again on the next run
+        del st.session_state["batch_output"]
+        st.rerun()
+    os.utime(out_path)   # still shown, keep it from being swept
+    st.write(f"Scored {rows:,} row(s).")
+    st.dataframe(preview)
+    # Streamlit serves downloads from memory, so the file is read only when the button is clicked
+    st.download_button("⬇️ Download Predictions", lambda path=out_path: Path(path).read_bytes(), "predictions.csv.gz", "application/gzip")
 
 # ------------------------------
 # 📂 Download Filtered Data
 # ------------------------------
+def export_filtered(fmt, state, age_group, chronic, claim_count):
+    # Runs only when the button is clicked; rows are streamed a chunk at a time into a compressed temp file,
+    # whose bytes are handed to Streamlit before the file is deleted
+    with perf.span(f"export {fmt}") as s:
+        if snapshot_df is None:
+            return run_query(lambda conn: data_export.to_bytes(
+                data_export.export_query, conn, state, age_group, chronic, fmt=fmt))
+        if claim_count <= data_export.LARGE_EXPORT_ROWS:
+            df = filtered_frame(state, age_group, chronic)
+            s.rows = len(df)
+            return data_export.to_bytes(data_export.export_frame, df, fmt=fmt)
+        return data_export.to_bytes(data_export.export_snapshot, state, age_group, chronic, fmt=fmt)
+
+export_fmt = st.radio("Export format", options=list(data_export.FORMATS), horizontal=True,
+                      format_func=lambda fmt: data_export.FORMATS[fmt][0])
 st.download_button(
-    label="⬇️ Download All Filtered Data as CSV",
-    data=df.to_csv(index=False),
-    file_name="filtered_claims.csv",
-    mime="text/csv"
+    label=f"⬇️ Download All Filtered Data ({totals['claim_count']:,} claims)",
+    data=lambda args=(export_fmt, state_filter, age_filter, chronic_filter, totals["claim_count"]): export_filtered(*args),
+    file_name=f"filtered_claims.{export_fmt}",
+    mime=data_export.FORMATS[export_fmt][1]
 )
+
+# ------------------------------
+# ⏱ Performance panel
+# ------------------------------
+if show_perf:
+    recorder.flush()
+    with st.sidebar.expander("⏱ Performance", expanded=True):
+        summary = pd.DataFrame(recorder.summary())
+        if summary.empty:
+            st.caption("No spans recorded in this run.")
+        else:
+            summary["span"] = ["  " * depth + name for depth, name in zip(summary["depth"], summary["span"])]
+            st.caption(f"This run: {summary.loc[summary['depth'] == 0, 'seconds'].sum():.3f}s in spans "
+                       "(cached steps only appear when they recompute)")
+            st.dataframe(summary[["span", "calls", "seconds", "rows", "rss_delta_mb"]].round(4), hide_index=True)
+        st.caption("Result cache: {hits:,} hits / {misses:,} misses ({hit_rate:.0%}), {entries} entries, "
+                   "{mb} MB, {evictions:,} evicted, {invalidations:,} invalidations".format(**results.stats()))
+        for name, pool in db_config.pool_stats().items():
+            st.caption(f"DB pool `{name}`: {pool['in_use']}/{pool['size']} in use (peak {pool['peak_in_use']}), "
+                       f"{pool['created']:,} opened / {pool['reused']:,} reused, "
+                       f"wait {pool['avg_wait_ms']:.1f} ms avg / {pool['max_wait_ms']:.1f} ms max")
+        st.download_button("Prometheus metrics", recorder.to_prometheus(), "medoptix_perf.prom", "text/plain")
+        st.download_button("JSON log", recorder.to_json(), "medoptix_perf.json", "application/json")
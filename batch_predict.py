@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+batch_predict.py  input.csv  output.csv[.gz]  [--chunksize 100000]
+
+Streaming batch scoring for the cost model.
+
+The input is read in bounded chunks; each chunk is encoded, reindexed to
+`model.feature_names_in_`, scored and appended to the output file, so peak
+memory depends on the chunk size rather than the file size. Used by the
+Streamlit batch upload and runnable on its own for multi-GB files.
+"""
+
+import argparse
+import gzip
+import os
+import tempfile
+import time
+
+import pandas as pd
+from model_assets import MODELS_DIR, load_model_assets
+
+CHUNKSIZE = 100_000
+PREVIEW_ROWS = 5
+PREDICTION_COL = "predicted_medicare_payment"
+# Every row must carry these; any other model feature (the SP_* flags) defaults to 0
+REQUIRED_COLS = ["age", "icd9_diagnosis_code", "hcpcs_code"]
+# Read codes as text: a chunk holding only numeric-looking codes and a blank would
+# otherwise be inferred as float, and "4019.0" is not the code "4019"
+CODE_DTYPES = {"icd9_diagnosis_code": str, "hcpcs_code": str}
+# Where the dashboard keeps scored uploads, and how long one may sit unshown before it is swept
+OUTPUT_DIR = os.path.join(tempfile.gettempdir(), "medoptix_batch")
+OUTPUT_TTL = int(os.getenv("MEDOPTIX_BATCH_TTL", 6 * 3600))
+
+
+def build_features(df, model, icd9_encoder, hcpcs_encoder):
+    """Encode codes and align columns to what the model was trained on."""
+    df = df.copy()
+    df["icd9_diagnosis_code"] = icd9_encoder.encode(df["icd9_diagnosis_code"])
+    df["hcpcs_code"] = hcpcs_encoder.encode(df["hcpcs_code"])
+    features = df.reindex(columns=model.feature_names_in_, fill_value=0)
+    # reindex only fills columns absent from the whole frame. A flag one row leaves out but
+    # another sends (rows of several requests, blank CSV cells) is NaN, which XGBoost would
+    # treat as "missing" rather than 0, so fill the defaults per row too.
+    optional = [col for col in features.columns if col not in REQUIRED_COLS]
+    features[optional] = features[optional].fillna(0)
+    return features
+
+
+def score_frame(df, model, icd9_encoder, hcpcs_encoder):
+    """Features plus a `predicted_medicare_payment` column, as in the original batch output."""
+    features = build_features(df, model, icd9_encoder, hcpcs_encoder)
+    features[PREDICTION_COL] = model.predict(features)
+    return features
+
+
+def _input_size(f):
+    pos = f.tell()
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(pos)
+    return size
+
+
+def _open_output(path):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "wt", newline="")
+    return open(path, "w", newline="")
+
+
+def score_csv(source, output_path, model, icd9_encoder, hcpcs_encoder, chunksize=CHUNKSIZE, progress=None):
+    """
+    Score a CSV (path or binary file-like) chunk by chunk into `output_path`.
+
+    `progress(rows_done, fraction)` is called after each chunk. Returns the
+    number of rows scored and a preview of the first rows.
+    """
+    fin = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    total = _input_size(fin) or 1
+    rows, preview = 0, None
+    try:
+        with _open_output(output_path) as fout:
+            for chunk in pd.read_csv(fin, chunksize=chunksize, dtype=CODE_DTYPES):
+                scored = score_frame(chunk, model, icd9_encoder, hcpcs_encoder)
+                scored.to_csv(fout, header=(rows == 0), index=False)
+                if preview is None:
+                    preview = scored.head(PREVIEW_ROWS)
+                rows += len(scored)
+                if progress is not None:
+                    progress(rows, min(fin.tell() / total, 1.0))
+    finally:
+        if fin is not source:
+            fin.close()
+    return rows, preview
+
+
+def sweep_outputs(directory=OUTPUT_DIR, max_age=OUTPUT_TTL):
+    """
+    Delete files in `directory` not modified for `max_age` seconds and return
+    how many went. Streamlit has no session-end hook, so the dashboard touches
+    the file it shows on every rerun and sweeps the ones closed sessions left.
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass   # another session swept it first
+    return removed
+
+
+def main():
+    p = argparse.ArgumentParser(description="Score a claims CSV with the Medicare cost model in bounded chunks.")
+    p.add_argument("input", help="CSV with columns: age, icd9_diagnosis_code, hcpcs_code, SP_*")
+    p.add_argument("output", help="Where to write predictions (.csv or .csv.gz)")
+    p.add_argument("--chunksize", type=int, default=CHUNKSIZE, help=f"Rows per chunk (default: {CHUNKSIZE})")
+    p.add_argument("--models-dir", default=MODELS_DIR, help=f"Directory with the .joblib assets (default: {MODELS_DIR})")
+    args = p.parse_args()
+
+    model, icd9_encoder, hcpcs_encoder, _ = load_model_assets(args.models_dir)
+
+    def report(rows, fraction):
+        print(f"\r   📈 {rows:,} rows scored ({fraction:.0%})", end="", flush=True)
+
+    rows, _ = score_csv(args.input, args.output, model, icd9_encoder, hcpcs_encoder, args.chunksize, report)
+    print(f"\n✅ Done. Wrote {rows:,} predictions to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
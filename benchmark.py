@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+benchmark.py  [--size 100k] [--stages ingest,dashboard,...] [--workdir data/benchmark]
+              [--output benchmark_results.json] [--streaming]
+
+End-to-end performance benchmark on synthetic data (`synthetic_data.py`),
+with SQLite and local files standing in for MySQL/RDS, so it runs anywhere:
+
+    generate   write the synthetic DE-SynPUF CSV (reused when it already exists)
+    ingest     clean_claims_data: chunked CSV read + INSERT OR IGNORE batches
+    migrate    migrate_docker_to_rds.migrate_table, SQLite to SQLite, verified
+    snapshot   snapshot_cache.build_snapshot
+    dashboard  the sidebar queries for a few selections, and the cost cube
+    train      cost_predictor in-memory (or --streaming from the snapshot)
+    predict    batch_predict.score_csv over the claims
+
+Each run appends wall time, rows/s and memory per stage to a JSON file along
+with the git version, and is compared with the previous run of the same size
+so regressions show up between versions.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import time
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+
+from bene_summary import SQLITE_DDL as SUMMARY_SQLITE_DDL
+from cost_predictor import StageReport
+from schema import BENEFICIARY_COLUMNS, CHRONIC_COLS, CLAIM_COLUMNS, add_age_columns
+from synthetic_data import SEED, SIZES, parse_size, write_synthetic_csv
+
+STAGES = ["generate", "ingest", "migrate", "snapshot", "dashboard", "train", "predict"]
+WORKDIR = "data/benchmark"
+RESULTS_PATH = "benchmark_results.json"
+REGRESSION_THRESHOLD = 0.20
+DASHBOARD_SELECTIONS = [
+    ("All", "All", "All"),
+    (5, "All", "All"),
+    ("All", "65-74", "SP_DIABETES"),
+    (5, "75-84", "SP_CHF"),
+]
+
+SQLITE_TYPES = {
+    'claim_id': 'INTEGER PRIMARY KEY', 'bene_id': 'TEXT', 'birth_date': 'DATE', 'death_date': 'DATE',
+    'claim_from': 'DATE', 'claim_thru': 'DATE', 'sex_code': 'TEXT', 'esrd_ind': 'TEXT',
+    'icd9_diagnosis_code': 'TEXT', 'hcpcs_code': 'TEXT',
+    'medicare_payment': 'REAL', 'patient_deductible': 'REAL', 'coinsurance_amount': 'REAL',
+}
+
+
+def sqlite_ddl():
+    """SQLite stand-ins for the MySQL tables, with the keys and join index."""
+    bene_cols = [f"{col} {'TEXT PRIMARY KEY' if col == 'bene_id' else SQLITE_TYPES.get(col, 'INTEGER')}"
+                 for col in BENEFICIARY_COLUMNS + ["chronic_mask"]]
+    claim_cols = [f"{col} {SQLITE_TYPES.get(col, 'INTEGER')}" for col in CLAIM_COLUMNS]
+    return [
+        f"CREATE TABLE IF NOT EXISTS beneficiary_info ({', '.join(bene_cols)})",
+        f"CREATE TABLE IF NOT EXISTS claims ({', '.join(claim_cols)})",
+        "CREATE INDEX IF NOT EXISTS idx_claims_bene_id ON claims (bene_id)",
+        "CREATE INDEX IF NOT EXISTS idx_bene_state_code ON beneficiary_info (state_code)",
+    ] + SUMMARY_SQLITE_DDL
+
+
+def create_sqlite_db(path):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    for statement in sqlite_ddl():
+        conn.execute(statement)
+    conn.commit()
+    return conn
+
+
+def git_version():
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+# 🏁 Stages
+def run_generate(ctx):
+    if ctx["csv"].exists() and not ctx["regenerate"]:
+        print(f"♻️  Reusing {ctx['csv']}")
+        return None
+    return write_synthetic_csv(ctx["csv"], ctx["rows"], ctx["seed"])
+
+
+def run_ingest(ctx):
+    from bene_summary import refresh
+    from clean_claims_data import insert_to_mysql, iter_clean_chunks
+
+    conn = create_sqlite_db(ctx["db"])
+    rows = 0
+    try:
+        for beneficiary_df, claims_df in iter_clean_chunks(str(ctx["csv"])):
+            insert_to_mysql(beneficiary_df, "beneficiary_info", "bene_id", conn=conn)
+            insert_to_mysql(claims_df, "claims", "claim_id", conn=conn)
+            refresh(conn, beneficiary_df["bene_id"].tolist() + claims_df["bene_id"].tolist())
+            rows += len(claims_df)
+    finally:
+        conn.close()
+    return rows
+
+
+def run_migrate(ctx):
+    from sqlalchemy import create_engine
+    from migrate_docker_to_rds import TABLES_TO_MIGRATE, migrate_table
+
+    target = ctx["workdir"] / "migrated.db"
+    create_sqlite_db(target).close()
+    checkpoint = ctx["workdir"] / "migration_checkpoint.json"
+    if checkpoint.exists():
+        checkpoint.unlink()
+    src = create_engine(f"sqlite:///{ctx['db']}")
+    dst = create_engine(f"sqlite:///{target}")
+    try:
+        # SQLite takes one writer at a time
+        for table in TABLES_TO_MIGRATE:
+            migrate_table(table, src, dst, workers=1, readers=1, checkpoint_path=str(checkpoint))
+        with dst.connect() as conn:
+            return pd.read_sql("SELECT COUNT(*) AS n FROM claims", conn)["n"].iloc[0]
+    finally:
+        src.dispose()
+        dst.dispose()
+
+
+def run_snapshot(ctx):
+    from snapshot_cache import build_snapshot
+
+    with closing(sqlite3.connect(ctx["db"])) as conn:
+        return build_snapshot(conn, ctx["workdir"] / "snapshot")
+
+
+def run_dashboard(ctx):
+    import dashboard_queries as dq
+    from cost_cube import build_cube_from_db, lookup_summary
+
+    with closing(sqlite3.connect(ctx["db"])) as conn:
+        for state, age_group, chronic in DASHBOARD_SELECTIONS:
+            dq.fetch_cost_totals(conn, state, age_group, chronic)
+            dq.fetch_top_diagnoses(conn, state, age_group, chronic)
+            dq.fetch_chronic_costs(conn, state, age_group, chronic)
+        cube = build_cube_from_db(conn)
+        for state, age_group, chronic in DASHBOARD_SELECTIONS:
+            lookup_summary(cube, state, age_group, chronic)
+        return dq.fetch_cost_totals(conn)["claim_count"] * len(DASHBOARD_SELECTIONS)
+
+
+def run_train(ctx):
+    import cost_predictor as cp
+    import feature_store as fs
+    from snapshot_cache import read_watermark
+
+    report = StageReport()
+    if ctx["streaming"]:
+        snapshot_dir = ctx["workdir"] / "snapshot"
+        rows = read_watermark(snapshot_dir)["row_count"]
+        make_batches = cp.source_batches("snapshot", snapshot_dir=snapshot_dir)
+        le_icd9, le_hcpcs = fs.fit_encoders(make_batches(fs.CODE_COLS))
+        model, mae, r2 = cp.train_streaming(
+            lambda: fs.encoded_batches(make_batches, le_icd9, le_hcpcs), report, plot_path=None
+        )
+    else:
+        with closing(sqlite3.connect(ctx["db"])) as conn:
+            X, y, holdout, le_icd9, le_hcpcs = cp.load_in_memory(lambda: cp.read_db_join(conn), report)
+        rows = len(X)
+        model, mae, r2 = cp.train_in_memory(X, y, holdout, report, plot_path=None)
+    cp.save_model(model, le_icd9, le_hcpcs, ctx["workdir"] / "models")
+    ctx["extra"]["train"] = {"mae": round(float(mae), 4), "r2": round(float(r2), 4)}
+    return rows
+
+
+def run_predict(ctx):
+    from batch_predict import score_csv
+    from model_assets import load_model_assets
+
+    model, icd9_encoder, hcpcs_encoder, _ = load_model_assets(ctx["workdir"] / "models", download=False)
+    source = ctx["workdir"] / "to_score.csv"
+    columns = ["c.icd9_diagnosis_code", "c.hcpcs_code", "b.birth_date"] + [f"b.{col}" for col in CHRONIC_COLS]
+    with closing(sqlite3.connect(ctx["db"])) as conn, open(source, "w", newline="") as f:
+        query = f"SELECT {', '.join(columns)} FROM claims c JOIN beneficiary_info b ON c.bene_id = b.bene_id"
+        for i, chunk in enumerate(pd.read_sql(query, conn, chunksize=200_000)):
+            chunk = add_age_columns(chunk).drop(columns=["birth_date", "age_group"])
+            chunk.to_csv(f, header=(i == 0), index=False)
+
+    start = time.perf_counter()
+    rows, _ = score_csv(source, ctx["workdir"] / "scored.csv.gz", model, icd9_encoder, hcpcs_encoder)
+    ctx["extra"]["predict"] = {"score_seconds": round(time.perf_counter() - start, 2)}
+    return rows
+
+
+RUNNERS = {
+    "generate": run_generate, "ingest": run_ingest, "migrate": run_migrate, "snapshot": run_snapshot,
+    "dashboard": run_dashboard, "train": run_train, "predict": run_predict,
+}
+
+
+# 📈 Results
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(path, runs):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(runs, f, indent=2)
+    os.replace(tmp, path)
+
+
+def compare(run, previous, threshold=REGRESSION_THRESHOLD):
+    """Print each stage's time against the previous run; returns the stages that got slower."""
+    print(f"\n📊 Compared with {previous['version']} ({previous['timestamp']})")
+    regressions = []
+    for name, stage in run["stages"].items():
+        before = previous["stages"].get(name)
+        if not before or not before["seconds"]:
+            continue
+        change = stage["seconds"] / before["seconds"] - 1
+        mark = "⚠️ " if change > threshold else "  "
+        print(f"   {mark}{name:<12}{before['seconds']:>10.2f}s → {stage['seconds']:>8.2f}s  ({change:+.0%})")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    p = argparse.ArgumentParser(description="End-to-end MedOptix benchmark on synthetic data.")
+    p.add_argument("--size", default="100k", help=f"Row count or one of {', '.join(SIZES)} (default: 100k)")
+    p.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of {','.join(STAGES)}")
+    p.add_argument("--seed", type=int, default=SEED, help=f"Generator seed (default: {SEED})")
+    p.add_argument("--workdir", default=WORKDIR, help=f"Where data and databases go (default: {WORKDIR})")
+    p.add_argument("--output", default=RESULTS_PATH, help=f"Results JSON, appended to (default: {RESULTS_PATH})")
+    p.add_argument("--regenerate", action="store_true", help="Rewrite the synthetic CSV even if it exists")
+    p.add_argument("--streaming", action="store_true", help="Train out-of-core from the snapshot")
+    args = p.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        p.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    rows = parse_size(args.size)
+    workdir = Path(args.workdir) / str(rows)
+    workdir.mkdir(parents=True, exist_ok=True)
+    ctx = {
+        "rows": rows, "seed": args.seed, "workdir": workdir, "regenerate": args.regenerate,
+        "streaming": args.streaming, "csv": workdir / f"synthetic_{args.seed}.csv",
+        "db": workdir / "medoptix.db", "extra": {},
+    }
+
+    report = StageReport()
+    processed = {}
+    for name in STAGES:
+        if name not in stages:
+            continue
+        with report.stage(name):
+            processed[name] = RUNNERS[name](ctx)
+        if name == "generate" and processed[name] is None:
+            report.stages.pop()
+
+    run = {
+        "version": git_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "rows": rows,
+        "seed": args.seed,
+        "streaming": args.streaming,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "stages": {},
+    }
+    for name, seconds, rss, peak in report.stages:
+        n = processed.get(name)
+        run["stages"][name] = {
+            "seconds": round(seconds, 3),
+            "rows": int(n) if n else None,
+            "rows_per_s": round(n / seconds) if n and seconds else None,
+            "rss_mb": round(rss),
+            "peak_rss_mb": round(peak),
+            **ctx["extra"].get(name, {}),
+        }
+    report.print()
+
+    runs = load_results(args.output)
+    previous = next((r for r in reversed(runs) if r["rows"] == rows and r["streaming"] == args.streaming), None)
+    runs.append(run)
+    save_results(args.output, runs)
+    print(f"\n💾 Results appended to {args.output}")
+    if previous:
+        regressions = compare(run, previous)
+        if regressions:
+            print(f"⚠️  Slower than the previous run by more than {REGRESSION_THRESHOLD:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Sorted beneficiary index over the snapshot frame, for the Claim Explorer.
+
+Built once per snapshot version:
+
+* `ids`     – the distinct bene_ids, sorted
+* `order`   – claim row positions sorted by bene_id (stable, so claims keep
+              their snapshot order within a beneficiary)
+* `offsets` – claims of `ids[i]` are `order[offsets[i]:offsets[i + 1]]`
+* `benes`   – one row of beneficiary attributes per id, for the sidebar filters
+
+A prefix search is two `searchsorted` calls on the sorted ids and a
+beneficiary's claims are one `searchsorted` plus a slice, so neither scans
+the claims. The sidebar filters only touch beneficiary attributes, so a
+selection is a mask over `benes` (one row per beneficiary), kept for the
+last few selections in a `ResultCache` (the index is shared by every session,
+so its LRU and lock are too).
+"""
+
+import numpy as np
+import pandas as pd
+
+from chronic_flags import MASK_COL
+from dashboard_queries import ALL, filter_frame, prefix_upper_bound
+from result_cache import ResultCache
+from schema import CHRONIC_COLS
+
+PAGE_SIZE = 100
+SELECTION_CACHE = 16
+
+
+def prefix_range(ids, prefix):
+    """`(lo, hi)` such that `ids[lo:hi]` are the sorted ids starting with `prefix`."""
+    if not prefix:
+        return 0, len(ids)
+    lo = int(np.searchsorted(ids, prefix, side="left"))
+    hi = int(np.searchsorted(ids, prefix_upper_bound(prefix), side="left"))
+    return lo, hi
+
+
+class BeneficiaryIndex:
+    def __init__(self, df):
+        self.df = df
+        codes, ids = pd.factorize(df["bene_id"], sort=True)
+        self.ids = np.asarray(ids, dtype=object)
+        valid = codes >= 0
+        self.order = np.flatnonzero(valid)[np.argsort(codes[valid], kind="stable")]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes[valid], minlength=len(self.ids)))])
+
+        attrs = ["state_code", "age_group"] + ([MASK_COL] if MASK_COL in df.columns else CHRONIC_COLS)
+        self.benes = df[attrs].iloc[self.order[self.offsets[:-1]]].reset_index(drop=True)
+        self._selections = ResultCache(max_entries=SELECTION_CACHE)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def select(self, state=ALL, age_group=ALL, chronic=ALL):
+        """Sorted ids of the beneficiaries matching the sidebar selection."""
+        if (state, age_group, chronic) == (ALL, ALL, ALL):
+            return self.ids
+
+        def compute():
+            return self.ids[filter_frame(self.benes, state, age_group, chronic).index.to_numpy()]
+
+        return self._selections.get((state, age_group, chronic), compute, size=lambda ids: ids.nbytes)
+
+    def count(self, ids, prefix=""):
+        lo, hi = prefix_range(ids, prefix)
+        return hi - lo
+
+    def search(self, ids, prefix="", page=0, page_size=PAGE_SIZE):
+        """`(page_ids, total)`: one page of `ids` starting with `prefix`, and how many match."""
+        lo, hi = prefix_range(ids, prefix)
+        start = lo + page * page_size
+        return list(ids[start:min(start + page_size, hi)]), hi - lo
+
+    def claims(self, bene_id):
+        """Claim rows of one beneficiary (empty if unknown)."""
+        i = int(np.searchsorted(self.ids, bene_id))
+        if i == len(self.ids) or self.ids[i] != bene_id:
+            return self.df.iloc[:0]
+        return self.df.iloc[self.order[self.offsets[i]:self.offsets[i + 1]]]
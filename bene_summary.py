@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+bene_summary.py  [--sqlite medoptix.db]
+
+Materialized per-beneficiary cost summary, `beneficiary_summary`: one row per
+beneficiary with its claim count, summed costs and chronic-condition
+bitmask/count. Patient-level reports (high-risk patients, cost per condition)
+and the Claim Explorer read it instead of re-aggregating the claims join.
+
+`clean_claims_data.py` keeps it current: after each chunk is inserted, the
+rows of the beneficiaries that chunk touched are recomputed from their claims,
+an indexed lookup on `claims.bene_id` (`create_table` adds that index when
+`claims` has none, otherwise every refresh scans the whole table). Recomputing
+instead of adding deltas
+keeps re-runs idempotent, since INSERT IGNORE silently skips claims that were
+already loaded. Running this script rebuilds the whole table, e.g. after a
+migration or a bulk update of `beneficiary_info`.
+"""
+
+import argparse
+from contextlib import closing
+
+import perf
+from chronic_flags import MASK_COL, count_sql, mask_sql
+from db_utils import is_sqlite, param_marker
+
+SUMMARY_TABLE = "beneficiary_summary"
+CLAIMS_INDEX = "idx_claims_bene_id"
+REFRESH_BATCH = 1000
+
+SUMMARY_COLUMNS = [
+    "bene_id", "state_code", "birth_date", MASK_COL, "condition_count",
+    "claim_count", "medicare_payment", "patient_cost", "total_cost",
+]
+
+MYSQL_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+        bene_id VARCHAR(50) PRIMARY KEY,
+        state_code BIGINT,
+        birth_date DATE,
+        {MASK_COL} SMALLINT UNSIGNED NOT NULL,
+        condition_count TINYINT UNSIGNED NOT NULL,
+        claim_count INT NOT NULL,
+        medicare_payment DOUBLE NOT NULL,
+        patient_cost DOUBLE NOT NULL,
+        total_cost DOUBLE NOT NULL,
+        INDEX idx_summary_state_code (state_code),
+        INDEX idx_summary_condition_count (condition_count)
+    )
+    """,
+]
+
+SQLITE_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+        bene_id TEXT PRIMARY KEY,
+        state_code INTEGER,
+        birth_date DATE,
+        {MASK_COL} INTEGER NOT NULL,
+        condition_count INTEGER NOT NULL,
+        claim_count INTEGER NOT NULL,
+        medicare_payment REAL NOT NULL,
+        patient_cost REAL NOT NULL,
+        total_cost REAL NOT NULL
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS idx_summary_state_code ON {SUMMARY_TABLE} (state_code)",
+    f"CREATE INDEX IF NOT EXISTS idx_summary_condition_count ON {SUMMARY_TABLE} (condition_count)",
+]
+
+
+def _table_exists(cur, sqlite, table):
+    if sqlite:
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    else:
+        cur.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                    (table,))
+    return cur.fetchone()[0] > 0
+
+
+def summary_exists(conn):
+    """Whether the summary table has been created, e.g. by `clean_claims_data.py` or a rebuild."""
+    cur = conn.cursor()
+    try:
+        return _table_exists(cur, is_sqlite(conn), SUMMARY_TABLE)
+    finally:
+        cur.close()
+
+
+def _has_bene_id_index(cur, sqlite):
+    """Whether `claims` exists and has an index leading with `bene_id` (None when there is no table)."""
+    if not _table_exists(cur, sqlite, "claims"):
+        return None
+    if sqlite:
+        cur.execute("SELECT name FROM pragma_index_list('claims')")
+        for (index,) in cur.fetchall():
+            cur.execute("SELECT name FROM pragma_index_info(?) ORDER BY seqno LIMIT 1", (index,))
+            if cur.fetchone() == ("bene_id",):
+                return True
+        return False
+
+    cur.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'claims'
+          AND column_name = 'bene_id' AND seq_in_index = 1
+    """)
+    return cur.fetchone()[0] > 0
+
+
+def create_table(conn):
+    """Create the summary table, and the `claims(bene_id)` index `refresh` relies on if it is missing."""
+    sqlite = is_sqlite(conn)
+    cur = conn.cursor()
+    try:
+        for statement in SQLITE_DDL if sqlite else MYSQL_DDL:
+            cur.execute(statement)
+        if _has_bene_id_index(cur, sqlite) is False:
+            print(f"🔧 Adding index `{CLAIMS_INDEX}` on claims(bene_id) for the summary refresh...")
+            cur.execute(f"CREATE INDEX {CLAIMS_INDEX} ON claims (bene_id)")
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def _refresh_sql(conn, n_ids=None):
+    """
+    REPLACE the summary rows of every beneficiary, or of `n_ids` bound bene_ids.
+    Beneficiaries without claims get a row with zero counts and costs.
+    """
+    if n_ids is None:
+        claims_where = bene_where = ""
+    else:
+        marks = ", ".join([param_marker(conn)] * n_ids)
+        claims_where = f"WHERE bene_id IN ({marks})"
+        bene_where = f"WHERE b.bene_id IN ({marks})"
+    # REPLACE INTO is the same statement on MySQL and SQLite: delete the old row, insert the new one
+    return f"""
+        REPLACE INTO {SUMMARY_TABLE} ({', '.join(SUMMARY_COLUMNS)})
+        SELECT
+            b.bene_id, b.state_code, b.birth_date,
+            {mask_sql()}, {count_sql()},
+            COALESCE(c.claim_count, 0), COALESCE(c.medicare_payment, 0),
+            COALESCE(c.patient_cost, 0), COALESCE(c.total_cost, 0)
+        FROM beneficiary_info b
+        LEFT JOIN (
+            SELECT
+                bene_id,
+                COUNT(*) AS claim_count,
+                SUM(medicare_payment) AS medicare_payment,
+                SUM(patient_deductible + coinsurance_amount) AS patient_cost,
+                SUM(medicare_payment + patient_deductible + coinsurance_amount) AS total_cost
+            FROM claims
+            {claims_where}
+            GROUP BY bene_id
+        ) c ON c.bene_id = b.bene_id
+        {bene_where}
+    """
+
+
+def refresh(conn, bene_ids, batch_size=REFRESH_BATCH):
+    """Recompute the summary rows of `bene_ids` from their claims. Returns how many IDs were refreshed."""
+    ids = list(dict.fromkeys(bene_ids))
+    cur = conn.cursor()
+    try:
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            cur.execute(_refresh_sql(conn, len(batch)), batch + batch)
+        conn.commit()
+    finally:
+        cur.close()
+    return len(ids)
+
+
+def rebuild(conn):
+    """Recompute every row (and drop rows of beneficiaries that no longer exist)."""
+    create_table(conn)
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DELETE FROM {SUMMARY_TABLE}")
+        cur.execute(_refresh_sql(conn))
+        conn.commit()
+        cur.execute(f"SELECT COUNT(*) FROM {SUMMARY_TABLE}")
+        return cur.fetchone()[0]
+    finally:
+        cur.close()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Rebuild the per-beneficiary cost summary table.")
+    p.add_argument("--sqlite", help="Rebuild in a SQLite database (e.g. from benchmark.py) instead of MySQL")
+    args = p.parse_args()
+
+    if args.sqlite:
+        import sqlite3
+        connect = closing(sqlite3.connect(args.sqlite))
+    else:
+        from config.db_config import connection
+        connect = connection()
+    with connect as conn, perf.span(f"rebuild {SUMMARY_TABLE}") as s:
+        s.rows = rows = rebuild(conn)
+    print(f"✅ `{SUMMARY_TABLE}` rebuilt: {rows:,} beneficiaries")
+    perf.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Bit-packed chronic condition flags.
+
+The 11 `SP_*` columns (1 = condition present, anything else = absent) are packed
+into a single uint16 `chronic_mask` per beneficiary, bit i set for
+`CHRONIC_COLS[i]`. Two bytes per row instead of 11 int64 columns (88 bytes).
+
+Rollups work on the mask directly: `rollup` groups values by mask in one
+`np.bincount` pass, and a 2048 x 11 bit table spreads those sums across
+conditions and condition counts, so no per-condition Python loop touches the
+full frame.
+"""
+
+import numpy as np
+import pandas as pd
+from schema import CHRONIC_COLS
+
+MASK_COL = "chronic_mask"
+N_MASKS = 1 << len(CHRONIC_COLS)
+
+CHRONIC_BITS = {col: 1 << i for i, col in enumerate(CHRONIC_COLS)}
+
+# BIT_TABLE[m, i] is 1 when mask m has condition i; POPCOUNT[m] is its condition count
+BIT_TABLE = ((np.arange(N_MASKS)[:, None] >> np.arange(len(CHRONIC_COLS))) & 1).astype(np.uint8)
+POPCOUNT = BIT_TABLE.sum(axis=1).astype(np.uint8)
+
+
+def pack_flags(df):
+    """Pack the SP_* columns of `df` into a uint16 mask array."""
+    mask = np.zeros(len(df), dtype=np.uint16)
+    for col, bit in CHRONIC_BITS.items():
+        mask |= np.where(df[col].to_numpy(dtype="float64", na_value=0) == 1, bit, 0).astype(np.uint16)
+    return mask
+
+
+def add_mask_column(df, drop_flags=False):
+    """Add the `chronic_mask` column, optionally dropping the SP_* columns it replaces."""
+    df[MASK_COL] = pack_flags(df)
+    if drop_flags:
+        df = df.drop(columns=CHRONIC_COLS)
+    return df
+
+
+def unpack_flags(mask):
+    """Expand masks back into int8 SP_* columns (for exports and model features)."""
+    mask = np.asarray(mask, dtype=np.uint16)
+    return pd.DataFrame(BIT_TABLE[mask].astype(np.int8), columns=CHRONIC_COLS)
+
+
+def has_condition(mask, condition):
+    """Boolean array: which rows have `condition` (an SP_* column name)."""
+    return (np.asarray(mask, dtype=np.uint16) & CHRONIC_BITS[condition]) != 0
+
+
+def condition_count(mask):
+    """Number of chronic conditions per row."""
+    return POPCOUNT[np.asarray(mask, dtype=np.uint16)]
+
+
+def mask_sql():
+    """SQL expression computing the mask from the SP_* columns (MySQL and SQLite)."""
+    return " + ".join(
+        f"(CASE WHEN {col} = 1 THEN {bit} ELSE 0 END)" for col, bit in CHRONIC_BITS.items()
+    )
+
+
+def count_sql():
+    """SQL expression counting the chronic conditions set in the SP_* columns."""
+    return " + ".join(f"(CASE WHEN {col} = 1 THEN 1 ELSE 0 END)" for col in CHRONIC_COLS)
+
+
+def has_condition_sql(condition, column=MASK_COL):
+    """SQL predicate: the bitmask in `column` has `condition` (an SP_* column name)."""
+    return f"({column} & {CHRONIC_BITS[condition]}) <> 0"
+
+
+def rollup(mask, values, rows=None):
+    """
+    Sum `values` per chronic condition and per condition count in one pass.
+
+    Returns `(by_condition, by_count)`: a Series of totals indexed by SP_* column,
+    and a DataFrame indexed by condition count with `total` and `rows` columns.
+    NaN values are treated as 0, as in `Series.sum`. For input that is already
+    grouped (one entry per mask), `rows` gives how many rows each entry stands for.
+    """
+    mask = np.asarray(mask, dtype=np.intp)
+    values = np.nan_to_num(np.asarray(values, dtype="float64"))
+    per_mask = np.bincount(mask, weights=values, minlength=N_MASKS)
+    rows_per_mask = np.bincount(mask, weights=None if rows is None else np.asarray(rows, dtype="float64"),
+                                minlength=N_MASKS)
+
+    by_condition = pd.Series(per_mask @ BIT_TABLE, index=CHRONIC_COLS)
+    by_count = pd.DataFrame({
+        "total": np.bincount(POPCOUNT, weights=per_mask, minlength=len(CHRONIC_COLS) + 1),
+        "rows": np.bincount(POPCOUNT, weights=rows_per_mask, minlength=len(CHRONIC_COLS) + 1).astype(np.int64),
+    })
+    by_count.index.name = "condition_count"
+    return by_condition, by_count
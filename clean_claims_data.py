@@ -1,116 +1,380 @@
+import argparse
+import os
+import re
+import sqlite3
+import tempfile
 import pandas as pd
 import mysql.connector
-from config.db_config import DB_CONFIG
+from config.db_config import connection
 from pandas.api.types import is_numeric_dtype
 from tqdm import tqdm
+import perf
+import bene_summary
+from chronic_flags import add_mask_column
+from db_utils import insert_ignore, is_sqlite, param_marker
 
-# --- Helper: Convert all values to native Python types ---
-def convert_value(val):
-    import numpy as np
-    if pd.isnull(val):
-        return None
-    if isinstance(val, (np.int64, np.int32)):
-        return int(val)
-    if isinstance(val, (np.float64, np.float32)):
-        return float(val)
-    if isinstance(val, pd.Timestamp):
-        return val.date()
-    return str(val)
+CSV_PATH = "data/medicare_claims.csv"
+BATCH_SIZE = 5000
+READ_CHUNK = 200_000
+# Rows repeated across chunks are skipped by these keys (INSERT IGNORE / LOAD DATA ... IGNORE)
+UNIQUE_KEYS = {"beneficiary_info": "bene_id", "claims": "claim_id"}
+
+CHRONIC_SOURCE_COLUMNS = [
+    'SP_ALZHDMTA', 'SP_CHF', 'SP_CHRNKIDN', 'SP_CNCR', 'SP_COPD',
+    'SP_DEPRESSN', 'SP_DIABETES', 'SP_ISCHMCHT', 'SP_OSTEOPRS', 'SP_RA_OA', 'SP_STRKETIA'
+]
 
-# --- Load the CSV ---
-df = pd.read_csv("data/medicare_claims.csv")
+# Only the ~30 columns we load are parsed, with compact dtypes. Dates stay
+# strings until `pd.to_datetime(format='%Y%m%d')` so missing values don't turn
+# them into floats.
+SOURCE_DTYPES = {
+    'DESYNPUF_ID': 'string', 'BENE_BIRTH_DT': 'string', 'BENE_DEATH_DT': 'string',
+    'BENE_SEX_IDENT_CD': 'Int8', 'BENE_RACE_CD': 'Int8', 'BENE_ESRD_IND': 'string',
+    'SP_STATE_CODE': 'Int16', 'BENE_COUNTY_CD': 'Int16',
+    'BENE_HI_CVRAGE_TOT_MONS': 'Int8', 'BENE_SMI_CVRAGE_TOT_MONS': 'Int8', 'BENE_HMO_CVRAGE_TOT_MONS': 'Int8',
+    **{col: 'Int8' for col in CHRONIC_SOURCE_COLUMNS},
+    'CLM_ID': 'Int64', 'CLM_FROM_DT': 'string', 'CLM_THRU_DT': 'string',
+    'ICD9_DGNS_CD_1': 'string', 'HCPCS_CD_1': 'string',
+    'LINE_NCH_PMT_AMT_1': 'float64', 'LINE_BENE_PTB_DDCTBL_AMT_1': 'float64', 'LINE_COINSRNC_AMT_1': 'float64',
+}
+
+# --- Helper: Convert all values to native Python types ---
+def to_native_rows(df):
+    """Rows as tuples of Python natives (int, float, str, date), with None for nulls."""
+    native = df.astype(object).where(df.notna(), None)
+    return list(native.itertuples(index=False, name=None))
 
 # ===============================
 # 🧾 Clean Beneficiary Info Table
 # ===============================
-beneficiary_df = df[[  
-    'DESYNPUF_ID', 'BENE_BIRTH_DT', 'BENE_DEATH_DT',
-    'BENE_SEX_IDENT_CD', 'BENE_RACE_CD', 'BENE_ESRD_IND',
-    'SP_STATE_CODE', 'BENE_COUNTY_CD',
-    'BENE_HI_CVRAGE_TOT_MONS', 'BENE_SMI_CVRAGE_TOT_MONS', 'BENE_HMO_CVRAGE_TOT_MONS',
-    'SP_ALZHDMTA', 'SP_CHF', 'SP_CHRNKIDN', 'SP_CNCR', 'SP_COPD',
-    'SP_DEPRESSN', 'SP_DIABETES', 'SP_ISCHMCHT', 'SP_OSTEOPRS', 'SP_RA_OA', 'SP_STRKETIA'
-]].copy()
+def clean_beneficiaries(df):
+    beneficiary_df = df[[  
+        'DESYNPUF_ID', 'BENE_BIRTH_DT', 'BENE_DEATH_DT',
+        'BENE_SEX_IDENT_CD', 'BENE_RACE_CD', 'BENE_ESRD_IND',
+        'SP_STATE_CODE', 'BENE_COUNTY_CD',
+        'BENE_HI_CVRAGE_TOT_MONS', 'BENE_SMI_CVRAGE_TOT_MONS', 'BENE_HMO_CVRAGE_TOT_MONS',
+        'SP_ALZHDMTA', 'SP_CHF', 'SP_CHRNKIDN', 'SP_CNCR', 'SP_COPD',
+        'SP_DEPRESSN', 'SP_DIABETES', 'SP_ISCHMCHT', 'SP_OSTEOPRS', 'SP_RA_OA', 'SP_STRKETIA'
+    ]].copy()
 
-beneficiary_df.columns = [
-    'bene_id', 'birth_date', 'death_date', 'sex_code', 'race_code',
-    'esrd_ind', 'state_code', 'county_code', 'hi_coverage_mos',
-    'smi_coverage_mos', 'hmo_coverage_mos',
-    'SP_ALZHDMTA', 'SP_CHF', 'SP_CHRNKIDN', 'SP_CNCR', 'SP_COPD',
-    'SP_DEPRESSN', 'SP_DIABETES', 'SP_ISCHMCHT', 'SP_OSTEOPRS', 'SP_RA_OA', 'SP_STRKETIA'
-]
+    beneficiary_df.columns = [
+        'bene_id', 'birth_date', 'death_date', 'sex_code', 'race_code',
+        'esrd_ind', 'state_code', 'county_code', 'hi_coverage_mos',
+        'smi_coverage_mos', 'hmo_coverage_mos',
+        'SP_ALZHDMTA', 'SP_CHF', 'SP_CHRNKIDN', 'SP_CNCR', 'SP_COPD',
+        'SP_DEPRESSN', 'SP_DIABETES', 'SP_ISCHMCHT', 'SP_OSTEOPRS', 'SP_RA_OA', 'SP_STRKETIA'
+    ]
+
+    # Format date fields
+    beneficiary_df['birth_date'] = pd.to_datetime(beneficiary_df['birth_date'], format='%Y%m%d', errors='coerce').dt.date
+    beneficiary_df['death_date'] = pd.to_datetime(beneficiary_df['death_date'], format='%Y%m%d', errors='coerce').dt.date
 
-# Format date fields
-beneficiary_df['birth_date'] = pd.to_datetime(beneficiary_df['birth_date'], format='%Y%m%d', errors='coerce').dt.date
-beneficiary_df['death_date'] = pd.to_datetime(beneficiary_df['death_date'], format='%Y%m%d', errors='coerce').dt.date
+    # Handle numeric columns
+    int_columns = ['race_code', 'state_code', 'county_code', 'hi_coverage_mos', 'smi_coverage_mos', 'hmo_coverage_mos'] + \
+                  ['SP_ALZHDMTA', 'SP_CHF', 'SP_CHRNKIDN', 'SP_CNCR', 'SP_COPD',
+                   'SP_DEPRESSN', 'SP_DIABETES', 'SP_ISCHMCHT', 'SP_OSTEOPRS', 'SP_RA_OA', 'SP_STRKETIA']
+    for col in int_columns:
+        if is_numeric_dtype(beneficiary_df[col]):
+            beneficiary_df[col] = beneficiary_df[col].fillna(0).round().astype("Int64")
 
-# Handle numeric columns
-int_columns = ['race_code', 'state_code', 'county_code', 'hi_coverage_mos', 'smi_coverage_mos', 'hmo_coverage_mos'] + \
-              ['SP_ALZHDMTA', 'SP_CHF', 'SP_CHRNKIDN', 'SP_CNCR', 'SP_COPD',
-               'SP_DEPRESSN', 'SP_DIABETES', 'SP_ISCHMCHT', 'SP_OSTEOPRS', 'SP_RA_OA', 'SP_STRKETIA']
-for col in int_columns:
-    if is_numeric_dtype(beneficiary_df[col]):
-        beneficiary_df[col] = beneficiary_df[col].fillna(0).round().astype("Int64")
+    # Pack the 11 SP_* flags into one uint16 bitmask column
+    beneficiary_df = add_mask_column(beneficiary_df)
 
-beneficiary_df['sex_code'] = beneficiary_df['sex_code'].astype(str)
-beneficiary_df['esrd_ind'] = beneficiary_df['esrd_ind'].astype(str)
+    beneficiary_df['sex_code'] = beneficiary_df['sex_code'].astype(str)
+    beneficiary_df['esrd_ind'] = beneficiary_df['esrd_ind'].astype(str)
 
-# Drop missing and duplicate bene_id
-beneficiary_df.dropna(subset=['bene_id'], inplace=True)
-beneficiary_df.drop_duplicates(subset=['bene_id'], inplace=True)
+    # Drop missing and duplicate bene_id
+    beneficiary_df.dropna(subset=['bene_id'], inplace=True)
+    beneficiary_df.drop_duplicates(subset=['bene_id'], inplace=True)
+    return beneficiary_df
 
 # ============================
 # 💸 Clean Claims Table
 # ============================
-claims_df = df[[  
-    'CLM_ID', 'DESYNPUF_ID', 'CLM_FROM_DT', 'CLM_THRU_DT',
-    'ICD9_DGNS_CD_1', 'HCPCS_CD_1',
-    'LINE_NCH_PMT_AMT_1', 'LINE_BENE_PTB_DDCTBL_AMT_1', 'LINE_COINSRNC_AMT_1'
-]].copy()
-
-claims_df.columns = [
-    'claim_id', 'bene_id', 'claim_from', 'claim_thru',
-    'icd9_diagnosis_code', 'hcpcs_code',
-    'medicare_payment', 'patient_deductible', 'coinsurance_amount'
-]
+def clean_claims(df, valid_bene_ids):
+    claims_df = df[[  
+        'CLM_ID', 'DESYNPUF_ID', 'CLM_FROM_DT', 'CLM_THRU_DT',
+        'ICD9_DGNS_CD_1', 'HCPCS_CD_1',
+        'LINE_NCH_PMT_AMT_1', 'LINE_BENE_PTB_DDCTBL_AMT_1', 'LINE_COINSRNC_AMT_1'
+    ]].copy()
 
-# Date formatting
-claims_df['claim_from'] = pd.to_datetime(claims_df['claim_from'], format='%Y%m%d', errors='coerce').dt.date
-claims_df['claim_thru'] = pd.to_datetime(claims_df['claim_thru'], format='%Y%m%d', errors='coerce').dt.date
+    claims_df.columns = [
+        'claim_id', 'bene_id', 'claim_from', 'claim_thru',
+        'icd9_diagnosis_code', 'hcpcs_code',
+        'medicare_payment', 'patient_deductible', 'coinsurance_amount'
+    ]
 
-claims_df.dropna(subset=['claim_id', 'bene_id'], inplace=True)
-claims_df.drop_duplicates(subset=['claim_id'], inplace=True)
+    # Date formatting
+    claims_df['claim_from'] = pd.to_datetime(claims_df['claim_from'], format='%Y%m%d', errors='coerce').dt.date
+    claims_df['claim_thru'] = pd.to_datetime(claims_df['claim_thru'], format='%Y%m%d', errors='coerce').dt.date
 
-# Match bene_id to valid ones only
-claims_df = claims_df[claims_df['bene_id'].isin(set(beneficiary_df['bene_id']))]
-# ⏱️ TEMP: Limit to 10 rows for faster testing
+    claims_df.dropna(subset=['claim_id', 'bene_id'], inplace=True)
+    claims_df.drop_duplicates(subset=['claim_id'], inplace=True)
 
+    # Match bene_id to valid ones only
+    return claims_df[claims_df['bene_id'].isin(valid_bene_ids)]
 
 # ================================
 # 🗃️ Insert Data into MySQL Tables
 # ================================
-def insert_to_mysql(df, table_name, key_col):
-    conn = mysql.connector.connect(**DB_CONFIG)
+def insert_to_mysql(df, table_name, key_col, batch_size=BATCH_SIZE, conn=None):
+    """
+    Bulk INSERT IGNORE in batches of `batch_size` rows, committing per batch.
+
+    Each batch is one `executemany` (sent by mysql.connector as a multi-row
+    INSERT). If a batch fails, its rows are retried one by one so the bad rows
+    can be reported without dropping the rest. Returns the failed rows as
+    `(key, error)` pairs.
+    """
+    if conn is None:
+        with connection() as conn:
+            return insert_to_mysql(df, table_name, key_col, batch_size, conn)
     cursor = conn.cursor()
+    db_error = sqlite3.Error if is_sqlite(conn) else mysql.connector.Error
+
+    placeholders = ', '.join([param_marker(conn)] * len(df.columns))
+    columns = ', '.join(df.columns)
+    sql = f"{insert_ignore(conn)} INTO {table_name} ({columns}) VALUES ({placeholders})"
+    key_pos = list(df.columns).index(key_col)
+    failed = []
+
+    with tqdm(total=len(df), desc=f"Inserting into {table_name}") as bar:
+        for start in range(0, len(df), batch_size):
+            rows = to_native_rows(df.iloc[start:start + batch_size])
+            try:
+                cursor.executemany(sql, rows)
+                conn.commit()
+            except db_error:
+                conn.rollback()
+                batch_failed = []
+                for row in rows:
+                    try:
+                        cursor.execute(sql, row)
+                    except db_error as err:
+                        batch_failed.append((row[key_pos], str(err)))
+                conn.commit()
+                print(f"❌ {len(batch_failed)} row(s) failed in `{table_name}` batch starting at {start}")
+                failed.extend(batch_failed)
+            bar.update(len(rows))
 
-    for _, row in tqdm(df.iterrows(), total=len(df), desc=f"Inserting into {table_name}"):
-        placeholders = ', '.join(['%s'] * len(row))
-        columns = ', '.join(row.index)
-        sql = f"INSERT IGNORE INTO {table_name} ({columns}) VALUES ({placeholders})"
-        try:
-            values = [convert_value(v) for v in row]
-            cursor.execute(sql, values)
-        except mysql.connector.Error as err:
-            print(f"❌ Error inserting into `{table_name}`: {err}")
-            continue
-
-    conn.commit()
     cursor.close()
-    conn.close()
-    print(f"✅ Done inserting into `{table_name}`.\n")
-
-# Run Inserts
-print("📤 Loading data into MySQL...")
-insert_to_mysql(beneficiary_df, 'beneficiary_info', 'bene_id')
-insert_to_mysql(claims_df, 'claims', 'claim_id')
-print("🎉 All done!")
+    print(f"✅ Done inserting into `{table_name}` ({len(df) - len(failed):,} rows, {len(failed)} errors).\n")
+    return failed
+
+def _infile_warning_key(df, key_col, message):
+    """The key of the row a LOAD DATA warning is about, when the message names it."""
+    duplicate = re.match(r"Duplicate entry '(.*)' for key", message)
+    if duplicate:
+        return duplicate.group(1)
+    at_row = re.search(r"at row (\d+)", message)
+    if at_row and key_col is not None and 0 < int(at_row.group(1)) <= len(df):
+        return df[key_col].iloc[int(at_row.group(1)) - 1]
+    return None
+
+# LOAD DATA's default FIELDS ESCAPED BY '\\': \N is NULL, and a backslash, tab, newline,
+# carriage return or NUL inside a value must be written as its escape sequence
+INFILE_NULL = "\\N"
+INFILE_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"})
+
+def _infile_column(col):
+    text = col.astype(str).str.translate(INFILE_ESCAPES)
+    return text.where(col.notna(), INFILE_NULL)
+
+def write_infile_tsv(df, f):
+    """
+    Write `df` to the text file `f` in LOAD DATA's default format: tab
+    separated, one row per line, escaped values and an unescaped \\N for
+    missing values (NaN, NaT, None, pd.NA).
+    """
+    # The csv module would escape the backslash of \N too, which MySQL then reads as the text "\N"
+    columns = [_infile_column(df[col]) for col in df.columns]
+    f.writelines("\t".join(row) + "\n" for row in zip(*columns))
+
+def load_infile_to_mysql(df, table_name, conn=None, key_col=None):
+    """
+    Stage `df` as a TSV and bulk load it with LOAD DATA LOCAL INFILE ... IGNORE,
+    which skips duplicate keys like INSERT IGNORE. The server must have
+    `local_infile` enabled.
+
+    Like `insert_to_mysql`, returns the skipped or failed rows as
+    `(key, error)` pairs, from the statement's warnings (`key` is None when a
+    warning does not name its row).
+    """
+    if conn is None:
+        with connection(allow_local_infile=True) as conn:
+            return load_infile_to_mysql(df, table_name, conn, key_col)
+    cursor = conn.cursor()
+
+    fd, path = tempfile.mkstemp(suffix=".tsv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            write_infile_tsv(df, f)
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{path}' IGNORE INTO TABLE {table_name} "
+            f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"({', '.join(df.columns)})"
+        )
+        # Both belong to the LOAD DATA statement: read them before anything else runs on the session
+        loaded = cursor.rowcount
+        cursor.execute("SHOW WARNINGS")
+        warnings = cursor.fetchall()
+        conn.commit()
+    finally:
+        os.remove(path)
+        cursor.close()
+
+    failed = [(_infile_warning_key(df, key_col, message), f"{level} {code}: {message}")
+              for level, code, message in warnings]
+    skipped = len(df) - loaded
+    if skipped or failed:
+        # SHOW WARNINGS lists at most max_error_count (default 1024) of them
+        print(f"❌ {skipped:,} row(s) skipped in `{table_name}` (duplicate keys or bad rows), "
+              f"{len(failed):,} warning(s)")
+    print(f"✅ Loaded {loaded:,} rows into `{table_name}` via LOAD DATA ({skipped:,} skipped).\n")
+    return failed
+
+def _has_unique_key(cur, sqlite, table, key_col):
+    """Whether `table` has a primary key or unique index on `key_col` alone (None when there is no table)."""
+    if sqlite:
+        cur.execute("SELECT name, pk FROM pragma_table_info(?)", (table,))
+        columns = cur.fetchall()
+        if not columns:
+            return None
+        # An INTEGER PRIMARY KEY is the rowid and has no entry in the index list
+        if [name for name, pk in columns if pk] == [key_col]:
+            return True
+        cur.execute('SELECT name FROM pragma_index_list(?) WHERE "unique" = 1', (table,))
+        for (index,) in cur.fetchall():
+            cur.execute("SELECT name FROM pragma_index_info(?)", (index,))
+            if cur.fetchall() == [(key_col,)]:
+                return True
+        return False
+
+    cur.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                (table,))
+    if not cur.fetchone()[0]:
+        return None
+    cur.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT index_name FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND non_unique = 0
+            GROUP BY index_name
+            HAVING COUNT(*) = 1 AND MAX(column_name) = %s
+        ) AS keys_
+    """, (table, key_col))
+    return cur.fetchone()[0] > 0
+
+def ensure_unique_keys(conn):
+    """
+    Add a unique index on each table's key column where there is none, so the
+    loaders' IGNORE skips rows already loaded by an earlier chunk (or an
+    earlier run). Fails if the table already holds duplicate keys.
+    """
+    sqlite = is_sqlite(conn)
+    cursor = conn.cursor()
+    try:
+        for table, key_col in UNIQUE_KEYS.items():
+            if _has_unique_key(cursor, sqlite, table, key_col) is False:
+                print(f"🔧 Adding a unique key on `{table}`({key_col}) so duplicate rows are skipped...")
+                cursor.execute(f"CREATE UNIQUE INDEX uq_{table}_{key_col} ON {table} ({key_col})")
+        conn.commit()
+    finally:
+        cursor.close()
+
+# ================================
+# 📥 Chunked CSV ingestion
+# ================================
+def _arrow_type(dtype):
+    import pyarrow as pa
+    return {'string': pa.string(), 'Int8': pa.int8(), 'Int16': pa.int16(),
+            'Int64': pa.int64(), 'float64': pa.float64()}[dtype]
+
+def read_source_chunks(csv_path, chunksize=READ_CHUNK, engine="c"):
+    """
+    Yield DataFrames of at most ~`chunksize` rows holding only SOURCE_DTYPES columns.
+
+    engine="pyarrow" streams record batches through pyarrow's multithreaded CSV
+    reader; engine="c" uses pandas' chunked reader.
+    """
+    if engine == "pyarrow":
+        from pyarrow import csv as pacsv
+        reader = pacsv.open_csv(
+            csv_path,
+            read_options=pacsv.ReadOptions(block_size=64 << 20),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=list(SOURCE_DTYPES),
+                column_types={col: _arrow_type(dtype) for col, dtype in SOURCE_DTYPES.items()},
+                strings_can_be_null=True,
+            ),
+        )
+        for batch in reader:
+            df = batch.to_pandas(types_mapper=pd.ArrowDtype).astype(SOURCE_DTYPES)
+            for start in range(0, len(df), chunksize):
+                yield df.iloc[start:start + chunksize]
+    else:
+        yield from pd.read_csv(csv_path, usecols=list(SOURCE_DTYPES), dtype=SOURCE_DTYPES, chunksize=chunksize)
+
+def iter_clean_chunks(csv_path, chunksize=READ_CHUNK, engine="c"):
+    """
+    Yield `(beneficiary_df, claims_df)` per chunk, deduplicated within the chunk.
+
+    Nothing is kept between chunks, so memory stays bounded by the chunk size
+    however many distinct beneficiaries and claims the file holds. A key seen
+    in an earlier chunk is yielded again and skipped by the table's unique key
+    (see `ensure_unique_keys`); chunks load in file order, so the first row of
+    each key still wins.
+    """
+    chunks = read_source_chunks(csv_path, chunksize, engine)
+    while True:
+        with perf.span("read CSV chunk") as s:
+            chunk = next(chunks, None)
+            s.rows = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            return
+
+        with perf.span("clean chunk", rows=len(chunk)):
+            beneficiary_df = clean_beneficiaries(chunk)
+            # Every claim row carries its beneficiary, so the valid ones are in this chunk
+            claims_df = clean_claims(chunk, beneficiary_df['bene_id'])
+        yield beneficiary_df, claims_df
+
+def main():
+    p = argparse.ArgumentParser(description="Clean the DE-SynPUF claims CSV and load it into MySQL.")
+    p.add_argument("--csv", default=CSV_PATH, help=f"Input CSV (default: {CSV_PATH})")
+    p.add_argument("--mode", choices=["batch", "infile"], default="batch",
+                   help="batch: executemany INSERT IGNORE; infile: LOAD DATA LOCAL INFILE from a staged TSV")
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Rows per commit (default: {BATCH_SIZE})")
+    p.add_argument("--chunksize", type=int, default=READ_CHUNK, help=f"CSV rows read per chunk (default: {READ_CHUNK})")
+    p.add_argument("--engine", choices=["c", "pyarrow"], default="c", help="CSV parser (default: c)")
+    p.add_argument("--profile", action="store_true", help="Print per-stage timings (same as MEDOPTIX_PERF=1)")
+    args = p.parse_args()
+    if args.profile:
+        perf.enable()
+
+    # --- Stream the CSV chunk by chunk into MySQL ---
+    print("📤 Loading data into MySQL...")
+    # LOAD DATA LOCAL needs its own connect option, so infile mode gets a separate pool
+    options = {"allow_local_infile": True} if args.mode == "infile" else {}
+    with connection(**options) as conn:
+        ensure_unique_keys(conn)
+        bene_summary.create_table(conn)
+        for beneficiary_df, claims_df in iter_clean_chunks(args.csv, args.chunksize, args.engine):
+            if args.mode == "infile":
+                with perf.span("load beneficiary_info", rows=len(beneficiary_df)):
+                    load_infile_to_mysql(beneficiary_df, 'beneficiary_info', conn, 'bene_id')
+                with perf.span("load claims", rows=len(claims_df)):
+                    load_infile_to_mysql(claims_df, 'claims', conn, 'claim_id')
+            else:
+                with perf.span("insert beneficiary_info", rows=len(beneficiary_df)):
+                    insert_to_mysql(beneficiary_df, 'beneficiary_info', 'bene_id', args.batch_size, conn)
+                with perf.span("insert claims", rows=len(claims_df)):
+                    insert_to_mysql(claims_df, 'claims', 'claim_id', args.batch_size, conn)
+            # Recompute the per-beneficiary totals of everyone this chunk touched
+            touched = beneficiary_df['bene_id'].tolist() + claims_df['bene_id'].tolist()
+            with perf.span("refresh beneficiary_summary") as s:
+                s.rows = bene_summary.refresh(conn, touched)
+    print("🎉 All done!")
+    perf.report()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Vectorized ICD9/HCPCS code encoding for prediction.
+
+Wraps a fitted `LabelEncoder` in a hash table built once from `classes_`, so a
+whole column is encoded with one lookup instead of a `transform` call per row.
+Unknown codes map to -1, as `encode_or_unknown` did.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_string_dtype
+from sklearn.preprocessing import LabelEncoder
+
+UNKNOWN = -1
+
+
+def _as_str(values):
+    """Stringify like `str(val)` per row ("nan" for any missing value, "4019.0" for floats)."""
+    s = pd.Series(values, copy=False)
+    missing = s.isna()
+    if is_string_dtype(s.dtype) and not missing.any():
+        return s
+    # None (SQL NULL) and NaN (CSV/Parquet) must look up the same class
+    return s.astype(object).map(str).mask(missing, "nan")
+
+
+def distinct_codes(values):
+    """Distinct codes of a column, stringified the way `CodeEncoder.encode` looks them up."""
+    return set(pd.unique(_as_str(values)))
+
+
+def fit_label_encoder(codes):
+    """Fit a `LabelEncoder` on distinct code strings collected batch by batch."""
+    le = LabelEncoder()
+    le.fit(np.array(sorted(codes), dtype=object))
+    return le
+
+
+class CodeEncoder:
+    """Maps codes to the integer labels a `LabelEncoder` was fitted with."""
+
+    def __init__(self, label_encoder):
+        self.label_encoder = label_encoder
+        self._index = pd.Index(label_encoder.classes_)
+
+    def encode(self, values):
+        """Encode a column (Series, array or list) into an int64 array."""
+        return self._index.get_indexer(_as_str(values)).astype(np.int64)
+
+    def encode_one(self, value):
+        """Encode a single code, as used by the prediction form."""
+        return int(self.encode([value])[0])
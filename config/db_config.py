@@ -1,7 +1,39 @@
+"""
+MySQL credentials, plus the process-wide connection pools and SQLAlchemy
+engines every module connects through.
+
+    from config.db_config import connection
+    with connection() as conn:        # a pooled mysql.connector connection
+        ...                           # handed back to the pool on exit
+
+Dashboard sessions, loaders and scripts reuse open connections instead of
+paying a TCP + auth handshake per query. Pools are keyed by their extra
+connect options (e.g. `allow_local_infile=True` gets its own), engines by URL
+and pool settings. `pool_stats()` reports, per pool: connections created and
+reused, in use (now and peak), acquisition wait (average and max), pre-ping
+failures and timeouts.
+
+Pool settings come from the environment:
+- `DB_POOL_SIZE`      – open connections per pool (default 8)
+- `DB_POOL_TIMEOUT`   – seconds to wait for a free one (default 30)
+- `DB_POOL_PRE_PING`  – ping idle connections before reuse (default 1)
+- `DB_POOL_RECYCLE`   – reconnect connections older than this many seconds (default 3600)
+"""
+
+import atexit
 import streamlit as st
 import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    _has_secrets = "DB_CONFIG" in st.secrets
+except FileNotFoundError:
+    # No secrets.toml at all, e.g. command-line scripts and benchmarks
+    _has_secrets = False
 
-if "DB_CONFIG" in st.secrets:
+if _has_secrets:
     DB_CONFIG = dict(st.secrets["DB_CONFIG"])
 else:
     # fallback to environment variables for local dev
@@ -12,3 +44,278 @@ else:
         'database': os.getenv('DB_NAME'),
         'port': int(os.getenv('DB_PORT', 3306))
     }
+
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') != '0'
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))
+
+
+# 📈 Pool metrics
+class PoolMetrics:
+    """Counters shared by the DB-API pools and the SQLAlchemy engines."""
+
+    def __init__(self):
+        self.created = self.acquired = self.reused = 0
+        self.in_use = self.peak_in_use = 0
+        self.ping_failures = self.timeouts = 0
+        self.wait_seconds = self.max_wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_acquire(self, seconds, created):
+        with self._lock:
+            self.acquired += 1
+            if created:
+                self.created += 1
+            else:
+                self.reused += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def record_release(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def record(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "created": self.created,
+                "acquired": self.acquired,
+                "reused": self.reused,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "avg_wait_ms": round(1000 * self.wait_seconds / self.acquired, 3) if self.acquired else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait_seconds, 3),
+                "ping_failures": self.ping_failures,
+                "timeouts": self.timeouts,
+            }
+
+
+# 🔌 DB-API connection pool
+class ConnectionPool:
+    """
+    Thread-safe pool of at most `size` DB-API connections made by `connect()`.
+
+    Idle connections are reused most-recently-returned first. Before reuse
+    they are recycled when older than `recycle` seconds and, with `pre_ping`,
+    checked with `is_connected()` (a server round trip on mysql.connector).
+    Released connections are rolled back, which also drains unread results;
+    that includes connections released by a failed `with` block, so an
+    ordinary query error doesn't cost a reconnect. Only a connection whose
+    rollback fails, or one interrupted mid-use (KeyboardInterrupt, a closed
+    generator), is closed instead.
+    """
+
+    def __init__(self, connect, size=POOL_SIZE, timeout=POOL_TIMEOUT, pre_ping=POOL_PRE_PING, recycle=POOL_RECYCLE):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.recycle = recycle
+        self.metrics = PoolMetrics()
+        self._idle = []       # (conn, connected_at), most recently returned last
+        self._born = {}       # id(conn) -> connected_at, for connections checked out
+        self._open = 0
+        self._cond = threading.Condition()
+
+    def _usable(self, conn, born):
+        if self.recycle and time.monotonic() - born > self.recycle:
+            return False
+        if self.pre_ping and hasattr(conn, "is_connected") and not conn.is_connected():
+            self.metrics.record("ping_failures")
+            return False
+        return True
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def acquire(self, timeout=None):
+        start = time.perf_counter()
+        deadline = start + (self.timeout if timeout is None else timeout)
+        while True:
+            with self._cond:
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self.metrics.record("timeouts")
+                        raise TimeoutError(f"No pooled DB connection free after {time.perf_counter() - start:.1f}s "
+                                           f"({self.size} in use; raise DB_POOL_SIZE?)")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, born = self._idle.pop()
+                else:
+                    conn = born = None
+                    self._open += 1   # reserve the slot, connect outside the lock
+
+            if conn is None:
+                try:
+                    conn, born = self._connect(), time.monotonic()
+                except BaseException:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                created = True
+            elif self._usable(conn, born):
+                created = False
+            else:
+                self._close(conn)
+                continue
+
+            with self._cond:
+                self._born[id(conn)] = born
+            self.metrics.record_acquire(time.perf_counter() - start, created)
+            return conn
+
+    def release(self, conn, discard=False):
+        """Hand `conn` back; `discard` (or a failed rollback) closes it instead."""
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        self.metrics.record_release()
+        with self._cond:
+            born = self._born.pop(id(conn))
+            if not discard:
+                self._idle.append((conn, born))
+                self._cond.notify()
+                return
+        self._close(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except Exception:
+            # The rollback in release() ends the transaction and drains unread results
+            self.release(conn)
+            raise
+        except BaseException:
+            # Interrupted mid-statement: the protocol state is unknown, don't hand it to someone else
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+
+    def dispose(self):
+        """Close every idle connection (checked-out ones close when released)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            idle, size = len(self._idle), self.size
+        return {"size": size, "idle": idle, **self.metrics.as_dict()}
+
+
+# 🗂 Process-wide registry
+_pools = {}
+_engines = {}
+_registry_lock = threading.Lock()
+
+
+def _mysql_connect(options):
+    import mysql.connector
+    return mysql.connector.connect(**{**DB_CONFIG, **options})
+
+
+def get_pool(**options):
+    """The shared pool of MySQL connections to `DB_CONFIG` made with extra connect `options`."""
+    key = tuple(sorted(options.items()))
+    with _registry_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(lambda: _mysql_connect(options))
+        return pool
+
+
+def connection(**options):
+    """`with connection() as conn:` – a pooled MySQL connection, returned to its pool on exit."""
+    return get_pool(**options).connection()
+
+
+def get_engine(config=None, drivername="mysql+pymysql", pool_size=POOL_SIZE, max_overflow=0, **kwargs):
+    """
+    The shared SQLAlchemy engine for `config` (default `DB_CONFIG`), created
+    on first use with pre-ping, recycling and a QueuePool of `pool_size`
+    (+ `max_overflow`) connections. Checkouts feed the same metrics as `get_pool`.
+    """
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.engine import URL
+    from sqlalchemy.pool import QueuePool
+
+    config = DB_CONFIG if config is None else config
+    url = URL.create(
+        drivername=drivername,
+        username=config["user"],
+        password=config["password"],
+        host=config["host"],
+        port=config["port"],
+        database=config["database"],
+    )
+    key = (url.render_as_string(hide_password=False), pool_size, max_overflow, tuple(sorted(kwargs.items())))
+    with _registry_lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            return engine
+
+        metrics = PoolMetrics()
+
+        class TimedQueuePool(QueuePool):
+            def connect(self):
+                start = time.perf_counter()
+                fairy = super().connect()
+                # A connection made during this checkout has no checkout count yet
+                created = fairy.info.pop("medoptix_new", False)
+                metrics.record_acquire(time.perf_counter() - start, created)
+                return fairy
+
+        engine = create_engine(url, poolclass=TimedQueuePool, pool_size=pool_size, max_overflow=max_overflow,
+                               pool_timeout=POOL_TIMEOUT, pool_recycle=POOL_RECYCLE, pool_pre_ping=POOL_PRE_PING,
+                               **kwargs)
+        event.listen(engine, "connect", lambda dbapi_conn, record: record.info.__setitem__("medoptix_new", True))
+        event.listen(engine, "checkin", lambda dbapi_conn, record: metrics.record_release())
+        engine.pool_metrics = metrics
+        _engines[key] = engine
+        return engine
+
+
+def pool_stats():
+    """{pool name: stats} for every pool and engine created in this process."""
+    with _registry_lock:
+        pools, engines = list(_pools.items()), list(_engines.values())
+    stats = {}
+    for key, pool in pools:
+        name = "mysql" + "".join(f" {k}={v}" for k, v in key)
+        stats[name] = pool.stats()
+    for engine in engines:
+        stats[engine.url.render_as_string(hide_password=True)] = {
+            "size": engine.pool.size(), "idle": engine.pool.checkedin(), **engine.pool_metrics.as_dict(),
+        }
+    return stats
+
+
+@atexit.register
+def dispose_all():
+    """Close the idle connections of every pool and engine (scripts call this implicitly at exit)."""
+    with _registry_lock:
+        pools, engines = list(_pools.values()), list(_engines.values())
+    for pool in pools:
+        pool.dispose()
+    for engine in engines:
+        engine.dispose()
@@ -0,0 +1,157 @@
+"""
+Pre-aggregated cost cube for the dashboard.
+
+Built once per data refresh, the cube holds, for every
+(state_code, age_group, chronic condition) selection, including the "All" rollups:
+
+* `diag`    – per ICD9 code sums of medicare_payment, patient_deductible,
+              coinsurance_amount, patient_cost and the claim count
+* `chronic` – Medicare payment per chronic condition, for the pie chart
+
+so every sidebar combination is a dict lookup over a few hundred rows instead
+of a scan of the full claims frame.
+"""
+
+import pandas as pd
+from chronic_flags import BIT_TABLE, MASK_COL, has_condition, mask_sql, pack_flags
+from dashboard_queries import ALL, CLAIMS_JOIN
+from schema import AGE_LABELS, CHRONIC_COLS, age_group_birth_range
+
+MEASURES = ["medicare_payment", "patient_deductible", "coinsurance_amount", "patient_cost", "claim_count"]
+DIAG_COL = "icd9_diagnosis_code"
+
+
+def _base_from_frame(df):
+    """Collapse claim rows to one row per (state, age group, chronic mask, ICD9)."""
+    # Amounts may be float32 in the compact dashboard frame; sum in float64
+    amounts = df[["medicare_payment", "patient_deductible", "coinsurance_amount"]].astype("float64")
+    df = df.assign(
+        **amounts,
+        patient_cost=amounts["patient_deductible"] + amounts["coinsurance_amount"],
+        claim_count=1,
+        age_group=df["age_group"].astype(object),
+    )
+    if MASK_COL not in df.columns:
+        df[MASK_COL] = pack_flags(df)
+    keys = ["state_code", "age_group", MASK_COL, DIAG_COL]
+    agg = {m: "sum" for m in MEASURES}
+    return df.groupby(keys, dropna=False, observed=True).agg(agg).reset_index()
+
+
+def _age_case_sql():
+    whens = []
+    for label in AGE_LABELS:
+        start, end = age_group_birth_range(label)
+        whens.append(f"WHEN b.birth_date >= '{start}' AND b.birth_date < '{end}' THEN '{label}'")
+    return "CASE " + " ".join(whens) + " END"
+
+
+def _base_from_db(conn):
+    """Same collapse as `_base_from_frame`, done by the database with one GROUP BY."""
+    query = f"""
+        SELECT
+            b.state_code,
+            {_age_case_sql()} AS age_group,
+            {mask_sql()} AS {MASK_COL},
+            c.{DIAG_COL},
+            SUM(c.medicare_payment) AS medicare_payment,
+            SUM(c.patient_deductible) AS patient_deductible,
+            SUM(c.coinsurance_amount) AS coinsurance_amount,
+            SUM(c.patient_deductible + c.coinsurance_amount) AS patient_cost,
+            COUNT(*) AS claim_count
+        FROM {CLAIMS_JOIN}
+        GROUP BY b.state_code, age_group, {MASK_COL}, c.{DIAG_COL}
+    """
+    base = pd.read_sql(query, conn)
+    base[MEASURES] = base[MEASURES].fillna(0)
+    return base
+
+
+def _with_rollups(grouped, keys, measures):
+    """
+    Add "All" rows for state_code and age_group to an aggregate grouped by
+    `["state_code", "age_group"] + keys`.
+    """
+    frames = [grouped]
+    for rolled in (["state_code"], ["age_group"], ["state_code", "age_group"]):
+        by = [k for k in ["state_code", "age_group"] if k not in rolled] + keys
+        part = grouped.groupby(by, dropna=False)[measures].sum().reset_index() if by \
+            else grouped[measures].sum().to_frame().T
+        for k in rolled:
+            part[k] = ALL
+        frames.append(part)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _build(base):
+    base = base.astype({"state_code": object, "age_group": object})
+    selections = [(ALL, base)] + [(col, base[has_condition(base[MASK_COL], col)]) for col in CHRONIC_COLS]
+
+    diag, chronic = {}, {}
+    for chronic_key, sub in selections:
+        grouped = sub.groupby(["state_code", "age_group", DIAG_COL], dropna=False)[MEASURES].sum().reset_index()
+        cube = _with_rollups(grouped, [DIAG_COL], MEASURES)
+        for (state, age_group), part in cube.groupby(["state_code", "age_group"], dropna=False, sort=False):
+            diag[(state, age_group, chronic_key)] = part.set_index(DIAG_COL)[MEASURES]
+
+        flags = BIT_TABLE[sub[MASK_COL].to_numpy(dtype="int64")]
+        per_condition = pd.DataFrame(
+            flags * sub["medicare_payment"].to_numpy(dtype="float64")[:, None],
+            columns=CHRONIC_COLS, index=sub.index
+        )
+        per_condition[["state_code", "age_group"]] = sub[["state_code", "age_group"]]
+        grouped = per_condition.groupby(["state_code", "age_group"], dropna=False)[CHRONIC_COLS].sum().reset_index()
+        cube = _with_rollups(grouped, [], CHRONIC_COLS)
+        for row in cube.itertuples(index=False):
+            values = row._asdict()
+            chronic[(values["state_code"], values["age_group"], chronic_key)] = pd.Series(
+                {col: values[col] for col in CHRONIC_COLS}
+            )
+
+    states = sorted(s for s in base["state_code"].dropna().unique().tolist())
+    return {"diag": diag, "chronic": chronic, "states": states}
+
+
+def build_cube_from_frame(df):
+    """Build the cube from a merged claims frame that already has an `age_group` column."""
+    return _build(_base_from_frame(df))
+
+
+def build_cube_from_db(conn):
+    """Build the cube from MySQL/SQLite; only the grouped rows leave the database."""
+    return _build(_base_from_db(conn))
+
+
+def state_options(cube):
+    return cube["states"]
+
+
+def lookup_summary(cube, state=ALL, age_group=ALL, chronic=ALL, limit=10):
+    """
+    Totals, top diagnosis codes and chronic costs for one selection, in the same
+    shape as `dashboard_queries.fetch_cost_totals`, `fetch_top_diagnoses` and
+    `fetch_chronic_costs`.
+    """
+    key = (state, age_group, chronic)
+    diag = cube["diag"].get(key)
+    if diag is None:
+        diag = pd.DataFrame(columns=MEASURES, index=pd.Index([], name=DIAG_COL), dtype=float)
+
+    totals = {
+        "medicare_payment": float(diag["medicare_payment"].sum()),
+        "patient_cost": float(diag["patient_cost"].sum()),
+        "claim_count": int(diag["claim_count"].sum()),
+    }
+    top_diag = (
+        diag.loc[diag.index.notna(), "medicare_payment"]
+        .nlargest(limit)
+        .rename_axis(DIAG_COL)
+        .reset_index()
+    )
+
+    costs = cube["chronic"].get(key, pd.Series(0.0, index=CHRONIC_COLS))
+    chronic_df = pd.DataFrame(
+        [(col, float(costs[col])) for col in CHRONIC_COLS],
+        columns=["Condition", "Total Medicare Cost"]
+    )
+    return totals, top_diag, chronic_df[chronic_df["Total Medicare Cost"] > 0]
@@ -1,62 +1,365 @@
+#!/usr/bin/env python3
+"""
+cost_predictor.py  [--streaming] [--source db|snapshot] [--batch-size 200000] [--external-memory]
+                   [--no-cache | --rebuild]
+
+Train the XGBoost Medicare cost model and save it, with its ICD9/HCPCS
+LabelEncoders, to models/*.joblib (the layout `model_assets.py` loads).
+
+By default the whole `claims JOIN beneficiary_info` is loaded into pandas, as
+before. With --streaming the rows are read in batches (keyset pages from
+MySQL, or record batches from the Parquet snapshot) and fed through an
+`xgboost.DataIter` into a hist `QuantileDMatrix`, so only one batch plus the
+compressed quantile matrix is in memory; --external-memory pages that matrix
+to disk too. Training uses all cores. Wall time and memory are reported per
+stage.
+
+The encoded feature matrix is cached in the feature store (`feature_store.py`)
+under a fingerprint of the source watermark and feature definition; while
+neither changes, later runs load it instead of re-reading and re-encoding the
+source.
+"""
+
+import argparse
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+import joblib
+import numpy as np
 import pandas as pd
-import mysql.connector
-from config.db_config import DB_CONFIG
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
+import xgboost as xgb
 from sklearn.metrics import mean_absolute_error, r2_score
 from xgboost import XGBRegressor
-import matplotlib.pyplot as plt
-import joblib
 
-# --- Load Data from MySQL ---
-conn = mysql.connector.connect(**DB_CONFIG)
-df_claims = pd.read_sql("SELECT * FROM claims c JOIN beneficiary_info b ON c.bene_id = b.bene_id", conn)
-conn.close()
-
-# --- Feature Engineering ---
-df_claims['age'] = 2022 - pd.to_datetime(df_claims['birth_date']).dt.year
-chronic_cols = [col for col in df_claims.columns if col.startswith("SP_")]
-
-# Drop rows with missing target
-df_claims = df_claims.dropna(subset=['medicare_payment'])
-
-# --- Prepare Features and Target ---
-X = df_claims[['age', 'icd9_diagnosis_code', 'hcpcs_code'] + chronic_cols].copy()
-y = df_claims['medicare_payment']
-
-# --- Encode Categorical Features ---
-le_icd9 = LabelEncoder()
-le_hcpcs = LabelEncoder()
-X['icd9_diagnosis_code'] = le_icd9.fit_transform(X['icd9_diagnosis_code'].astype(str))
-X['hcpcs_code'] = le_hcpcs.fit_transform(X['hcpcs_code'].astype(str))
-
-# --- Train/Test Split ---
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# --- Train XGBoost Model ---
-model = XGBRegressor(n_estimators=100, max_depth=6, random_state=42)
-model.fit(X_train, y_train)
-
-# --- Evaluate Model ---
-y_pred = model.predict(X_test)
-mae = mean_absolute_error(y_test, y_pred)
-r2 = r2_score(y_test, y_pred)
-print(f"MAE: {mae:.2f}")
-print(f"R^2 Score: {r2:.2f}")
-
-# --- Plot Actual vs Predicted ---
-plt.figure(figsize=(8, 5))
-plt.scatter(y_test, y_pred, alpha=0.4)
-plt.xlabel("Actual Cost")
-plt.ylabel("Predicted Cost")
-plt.title("Actual vs Predicted Medicare Cost")
-plt.grid(True)
-plt.tight_layout()
-plt.savefig("actual_vs_predicted.png")
-print("📊 Saved plot as 'actual_vs_predicted.png'")
-
-# --- Save Model and LabelEncoders ---
-joblib.dump(model, "models/cost_model_xgb.joblib")
-joblib.dump(le_icd9, "models/le_icd9.joblib")
-joblib.dump(le_hcpcs, "models/le_hcpcs.joblib")
-print("✅ Model and encoders saved.")
+import feature_store as fs
+from db_utils import param_marker
+from feature_store import CODE_COLS, TARGET, TRAINING_COLUMNS
+from model_assets import MODELS_DIR
+from perf import peak_rss_mb, rss_mb
+from snapshot_cache import SNAPSHOT_DIR, iter_snapshot_batches, load_snapshot, snapshot_exists
+
+MODEL_PARAMS = {"n_estimators": 100, "max_depth": 6, "random_state": 42}
+BATCH_SIZE = 200_000
+CACHE_DIR = "data/xgb_cache"
+PLOT_SAMPLE = 10_000
+PLOT_PATH = "actual_vs_predicted.png"
+
+
+# 📏 Stage report
+class StageReport:
+    """Wall time, resident memory and peak memory after each training stage."""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        print(f"⏳ {name}...")
+        yield
+        self.stages.append((name, time.perf_counter() - start, rss_mb(), peak_rss_mb()))
+
+    def print(self):
+        print("\n📏 Stage report")
+        print(f"   {'stage':<28}{'wall s':>10}{'rss MB':>10}{'peak MB':>10}")
+        for name, seconds, rss, peak in self.stages:
+            print(f"   {name:<28}{seconds:>10.2f}{rss:>10.0f}{peak:>10.0f}")
+
+
+# 📊 Output
+def plot_actual_vs_predicted(y_true, y_pred, path=PLOT_PATH):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 5))
+    plt.scatter(y_true, y_pred, alpha=0.4)
+    plt.xlabel("Actual Cost")
+    plt.ylabel("Predicted Cost")
+    plt.title("Actual vs Predicted Medicare Cost")
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+    print(f"📊 Saved plot as '{path}'")
+
+
+def save_model(model, le_icd9, le_hcpcs, models_dir=MODELS_DIR):
+    os.makedirs(models_dir, exist_ok=True)
+    joblib.dump(model, os.path.join(models_dir, "cost_model_xgb.joblib"))
+    joblib.dump(le_icd9, os.path.join(models_dir, "le_icd9.joblib"))
+    joblib.dump(le_hcpcs, os.path.join(models_dir, "le_hcpcs.joblib"))
+    print("✅ Model and encoders saved.")
+
+
+# 📥 Sources
+def iter_db_batches(conn, batch_size=BATCH_SIZE):
+    """Keyset-paginate the training columns of the claims join by `claim_id`."""
+    p = param_marker(conn)
+    columns = ", ".join(f"c.{col}" if col in ("claim_id", TARGET) or col in CODE_COLS else f"b.{col}"
+                        for col in TRAINING_COLUMNS)
+    base = f"SELECT {columns} FROM claims c JOIN beneficiary_info b ON c.bene_id = b.bene_id"
+    last = None
+    while True:
+        if last is None:
+            sql, params = f"{base} ORDER BY c.claim_id LIMIT {int(batch_size)}", None
+        else:
+            sql, params = f"{base} WHERE c.claim_id > {p} ORDER BY c.claim_id LIMIT {int(batch_size)}", (last,)
+        batch = pd.read_sql(sql, conn, params=params)
+        if batch.empty:
+            return
+        yield batch
+        last = batch["claim_id"].iloc[-1]
+        last = last.item() if hasattr(last, "item") else last
+
+
+def fit_db_encoders(conn):
+    """Fit the code encoders from `SELECT DISTINCT`, without reading the join."""
+    distinct = {}
+    cur = conn.cursor()
+    try:
+        for col in CODE_COLS:
+            cur.execute(f"SELECT DISTINCT {col} FROM claims")
+            distinct[col] = [row[0] for row in cur.fetchall()]
+    finally:
+        cur.close()
+    return fs.fit_encoders([distinct])
+
+
+# 🧠 In-memory training
+def read_db_join(conn):
+    df_claims = pd.read_sql("SELECT * FROM claims c JOIN beneficiary_info b ON c.bene_id = b.bene_id", conn)
+    return df_claims.loc[:, ~df_claims.columns.duplicated()]
+
+
+def load_in_memory(read_frame, report):
+    """Load the claims join with `read_frame()` and encode it: `(X, y, holdout, le_icd9, le_hcpcs)`."""
+    with report.stage("load join"):
+        df_claims = read_frame()
+
+    with report.stage("feature engineering"):
+        le_icd9, le_hcpcs = fs.fit_encoders([df_claims])
+        X, y, holdout = fs.encode_frame(df_claims, le_icd9, le_hcpcs)
+    return X, pd.Series(y), holdout, le_icd9, le_hcpcs
+
+
+def train_in_memory(X, y, holdout, report, n_jobs=None, plot_path=PLOT_PATH):
+    """Fit on the training rows and evaluate on the holdout. Returns `(model, mae, r2)`."""
+    X_train, X_test, y_train, y_test = X[~holdout], X[holdout], y[~holdout], y[holdout]
+
+    with report.stage("train"):
+        model = XGBRegressor(**MODEL_PARAMS, n_jobs=n_jobs)
+        model.fit(X_train, y_train)
+
+    with report.stage("evaluate"):
+        y_pred = model.predict(X_test)
+        mae = mean_absolute_error(y_test, y_pred)
+        r2 = r2_score(y_test, y_pred)
+    if plot_path:
+        plot_actual_vs_predicted(y_test, y_pred, plot_path)
+    return model, mae, r2
+
+
+# 🌊 Streaming training
+class ClaimBatches(xgb.DataIter):
+    """Feeds the train or holdout rows of `make_encoded()` batches to XGBoost, one batch at a time."""
+
+    def __init__(self, make_encoded, test=False, cache_prefix=None):
+        self.make_encoded = make_encoded
+        self.test = test
+        self._batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def batches(self):
+        """(X, y) pairs for this side of the split."""
+        for X, y, holdout in self.make_encoded():
+            keep = holdout if self.test else ~holdout
+            if keep.any():
+                yield X[keep].reset_index(drop=True), y[keep]
+
+    def next(self, input_data):
+        if self._batches is None:
+            self._batches = self.batches()
+        for X, y in self._batches:
+            input_data(data=X, label=y)
+            return True
+        return False
+
+    def reset(self):
+        self._batches = None
+
+
+def train_streaming(make_encoded, report, n_jobs=None, external_memory=False, cache_dir=CACHE_DIR,
+                    plot_path=PLOT_PATH):
+    """
+    Train on `(X, y, holdout)` batches from `make_encoded()`, which is called
+    once per pass. Returns the same `(model, mae, r2)` as `train_in_memory`.
+    """
+    nthread = n_jobs or os.cpu_count()
+
+    with report.stage("build quantile matrix"):
+        if external_memory:
+            os.makedirs(cache_dir, exist_ok=True)
+            train_iter = ClaimBatches(make_encoded, cache_prefix=os.path.join(cache_dir, "train"))
+            dtrain = xgb.ExtMemQuantileDMatrix(train_iter, nthread=nthread)
+        else:
+            dtrain = xgb.QuantileDMatrix(ClaimBatches(make_encoded), nthread=nthread)
+        print(f"   {dtrain.num_row():,} training rows")
+
+    with report.stage("train"):
+        params = {
+            "objective": "reg:squarederror",
+            "tree_method": "hist",
+            "max_depth": MODEL_PARAMS["max_depth"],
+            "seed": MODEL_PARAMS["random_state"],
+            "nthread": nthread,
+        }
+        booster = xgb.train(params, dtrain, num_boost_round=MODEL_PARAMS["n_estimators"])
+        del dtrain
+
+    with report.stage("evaluate"):
+        # Streamed metrics: only running sums and a plot sample are kept
+        n = abs_err = sq_err = y_sum = y_sq = 0.0
+        sample_true, sample_pred = [], []
+        for X, y in ClaimBatches(make_encoded, test=True).batches():
+            pred = booster.inplace_predict(X)
+            n += len(y)
+            abs_err += float(np.abs(y - pred).sum(dtype=np.float64))
+            sq_err += float(np.square(y - pred, dtype=np.float64).sum())
+            y_sum += float(y.sum(dtype=np.float64))
+            y_sq += float(np.square(y, dtype=np.float64).sum())
+            room = PLOT_SAMPLE - sum(len(s) for s in sample_true)
+            if room > 0:
+                sample_true.append(y[:room])
+                sample_pred.append(pred[:room])
+        mae = abs_err / n if n else float("nan")
+        total = y_sq - y_sum * y_sum / n if n else 0.0
+        r2 = 1 - sq_err / total if total else float("nan")
+    if sample_true and plot_path:
+        plot_actual_vs_predicted(np.concatenate(sample_true), np.concatenate(sample_pred), plot_path)
+
+    # Same estimator type and feature names the app and batch scorer expect
+    model = XGBRegressor(**MODEL_PARAMS, tree_method="hist", n_jobs=n_jobs)
+    model._Booster = booster
+    return model, mae, r2
+
+
+# 🗂 Training data
+def connect_db():
+    """A pooled MySQL connection, as a context manager that hands it back on exit."""
+    from config.db_config import connection
+    return connection()
+
+
+def source_batches(source, conn=None, snapshot_dir=SNAPSHOT_DIR, batch_size=BATCH_SIZE):
+    """`make_batches(columns)` over the claims join from MySQL or the snapshot."""
+    if source == "snapshot":
+        return lambda columns: iter_snapshot_batches(snapshot_dir, columns, batch_size)
+    return lambda columns: (batch[columns] for batch in iter_db_batches(conn, batch_size))
+
+
+def source_fingerprint(source, report, conn=None, snapshot_dir=SNAPSHOT_DIR):
+    with report.stage("fingerprint source"):
+        watermark = fs.db_watermark(conn) if source == "db" else fs.snapshot_watermark(snapshot_dir)
+    return fs.fingerprint(watermark), watermark
+
+
+def load_training_data(source, report, conn=None, snapshot_dir=SNAPSHOT_DIR, use_cache=True, rebuild=False):
+    """In-memory `(X, y, holdout, le_icd9, le_hcpcs)`, from the feature store when it is current."""
+    fp = watermark = None
+    if use_cache:
+        fp, watermark = source_fingerprint(source, report, conn, snapshot_dir)
+        if fs.has_features(fp) and not rebuild:
+            print(f"♻️  Reusing feature matrix {fp}")
+            with report.stage("load feature store"):
+                return fs.load_features(fp)
+
+    if source == "db":
+        X, y, holdout, le_icd9, le_hcpcs = load_in_memory(lambda: read_db_join(conn), report)
+    else:
+        X, y, holdout, le_icd9, le_hcpcs = load_in_memory(
+            lambda: load_snapshot(snapshot_dir, columns=TRAINING_COLUMNS), report
+        )
+    if fp is not None:
+        with report.stage("write feature store"):
+            fs.write_features(fp, [(X, y.to_numpy(), holdout)], le_icd9, le_hcpcs, watermark)
+        print(f"💾 Stored {len(X):,} encoded rows as {fp}")
+    return X, y, holdout, le_icd9, le_hcpcs
+
+
+def streaming_training_data(source, report, conn=None, snapshot_dir=SNAPSHOT_DIR, batch_size=BATCH_SIZE,
+                            use_cache=True, rebuild=False):
+    """`(make_encoded, le_icd9, le_hcpcs)` for `train_streaming`, backed by the feature store when enabled."""
+    make_batches = source_batches(source, conn, snapshot_dir, batch_size)
+    fp = None
+    if use_cache:
+        fp, watermark = source_fingerprint(source, report, conn, snapshot_dir)
+    if fp is not None and fs.has_features(fp) and not rebuild:
+        print(f"♻️  Reusing feature matrix {fp}")
+        le_icd9, le_hcpcs = fs.load_encoders(fp)
+    else:
+        print(f"🌊 Streaming training from {source} in batches of {batch_size:,} rows")
+        with report.stage("fit code encoders"):
+            if source == "db":
+                le_icd9, le_hcpcs = fit_db_encoders(conn)
+            else:
+                le_icd9, le_hcpcs = fs.fit_encoders(make_batches(CODE_COLS))
+        if fp is not None:
+            with report.stage("write feature store"):
+                rows = fs.write_features(fp, fs.encoded_batches(make_batches, le_icd9, le_hcpcs),
+                                         le_icd9, le_hcpcs, watermark)
+            print(f"💾 Stored {rows:,} encoded rows as {fp}")
+
+    if fp is not None:
+        def make_encoded():
+            return fs.iter_features(fp, batch_size)
+    else:
+        def make_encoded():
+            return fs.encoded_batches(make_batches, le_icd9, le_hcpcs)
+    return make_encoded, le_icd9, le_hcpcs
+
+
+def main():
+    p = argparse.ArgumentParser(description="Train the XGBoost Medicare cost model.")
+    p.add_argument("--streaming", action="store_true", help="Train out-of-core from batches instead of one DataFrame")
+    p.add_argument("--source", choices=["db", "snapshot"],
+                   help="Where to read claims (default: MySQL; with --streaming the Parquet snapshot if present)")
+    p.add_argument("--snapshot-dir", default=str(SNAPSHOT_DIR), help=f"Snapshot directory (default: {SNAPSHOT_DIR})")
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Rows per streamed batch (default: {BATCH_SIZE})")
+    p.add_argument("--external-memory", action="store_true", help="Page the quantile matrix to --cache-dir")
+    p.add_argument("--cache-dir", default=CACHE_DIR, help=f"External-memory cache (default: {CACHE_DIR})")
+    p.add_argument("--threads", type=int, default=None, help="Training threads (default: all cores)")
+    p.add_argument("--models-dir", default=MODELS_DIR, help=f"Where to save the .joblib assets (default: {MODELS_DIR})")
+    cache = p.add_mutually_exclusive_group()
+    cache.add_argument("--no-cache", action="store_true", help="Don't read or write the feature store")
+    cache.add_argument("--rebuild", action="store_true", help="Rebuild the feature store entry even if it exists")
+    args = p.parse_args()
+
+    report = StageReport()
+    if args.source:
+        source = args.source
+    else:
+        source = "snapshot" if args.streaming and snapshot_exists(args.snapshot_dir) else "db"
+    with connect_db() if source == "db" else nullcontext() as conn:
+        if args.streaming:
+            make_encoded, le_icd9, le_hcpcs = streaming_training_data(
+                source, report, conn, args.snapshot_dir, args.batch_size, not args.no_cache, args.rebuild
+            )
+            model, mae, r2 = train_streaming(make_encoded, report, args.threads, args.external_memory, args.cache_dir)
+        else:
+            X, y, holdout, le_icd9, le_hcpcs = load_training_data(
+                source, report, conn, args.snapshot_dir, not args.no_cache, args.rebuild
+            )
+            model, mae, r2 = train_in_memory(X, y, holdout, report, args.threads)
+
+    print(f"MAE: {mae:.2f}")
+    print(f"R^2 Score: {r2:.2f}")
+
+    with report.stage("save"):
+        save_model(model, le_icd9, le_hcpcs, args.models_dir)
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
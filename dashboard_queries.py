@@ -0,0 +1,193 @@
+"""
+Parameterized SQL behind the dashboard filters.
+
+The sidebar selections (state, age group, chronic condition) become a WHERE
+clause over `claims JOIN beneficiary_info`, and the database does the GROUP BY
+for the metrics, the top diagnosis chart and the chronic pie. Only aggregated
+result sets (or a single beneficiary's claims) come back to the app.
+
+Every function takes an open DB-API connection (mysql.connector or sqlite3).
+"""
+
+import pandas as pd
+from bene_summary import SUMMARY_TABLE, summary_exists
+from chronic_flags import MASK_COL, has_condition, has_condition_sql
+from db_utils import param_marker
+from schema import CHRONIC_COLS, BENEFICIARY_COLUMNS, CLAIM_COLUMNS, age_group_birth_range, add_age_columns
+
+ALL = "All"
+
+CLAIMS_JOIN = "claims c JOIN beneficiary_info b ON c.bene_id = b.bene_id"
+
+EXPLORER_COLUMNS = [
+    "claim_id", "bene_id", "birth_date", "state_code", "age",
+    "icd9_diagnosis_code", "hcpcs_code",
+    "medicare_payment", "patient_deductible", "coinsurance_amount"
+]
+
+
+def build_where(conn, state=ALL, age_group=ALL, chronic=ALL, extra=(), use_mask=False):
+    """
+    Translate sidebar selections into a WHERE clause and its bound parameters.
+    With `use_mask`, the chronic condition is tested on `b.chronic_mask`
+    instead of the SP_* flag (for `beneficiary_summary`).
+    """
+    mark = param_marker(conn)
+    clauses, params = list(extra), []
+
+    if state != ALL:
+        clauses.append(f"b.state_code = {mark}")
+        params.append(state)
+    if age_group != ALL:
+        start, end = age_group_birth_range(age_group)
+        clauses.append(f"b.birth_date >= {mark} AND b.birth_date < {mark}")
+        params.extend([start, end])
+    if chronic != ALL:
+        # Column names can't be bound, so only accept the known flags
+        if chronic not in CHRONIC_COLS:
+            raise ValueError(f"Unknown chronic condition: {chronic}")
+        clauses.append(has_condition_sql(chronic, f"b.{MASK_COL}") if use_mask else f"b.{chronic} = 1")
+
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def fetch_data_version(conn):
+    """Highest claim_id loaded so far; changes whenever new claims are ingested."""
+    return pd.read_sql("SELECT MAX(claim_id) AS max_claim_id FROM claims", conn)["max_claim_id"].iloc[0]
+
+
+def fetch_cost_totals(conn, state=ALL, age_group=ALL, chronic=ALL):
+    """Total Medicare payment, total patient cost and claim count for the selection."""
+    where, params = build_where(conn, state, age_group, chronic)
+    query = f"""
+        SELECT
+            COALESCE(SUM(c.medicare_payment), 0) AS medicare_payment,
+            COALESCE(SUM(c.patient_deductible + c.coinsurance_amount), 0) AS patient_cost,
+            COUNT(*) AS claim_count
+        FROM {CLAIMS_JOIN}{where}
+    """
+    row = pd.read_sql(query, conn, params=params).iloc[0]
+    return {
+        "medicare_payment": float(row["medicare_payment"]),
+        "patient_cost": float(row["patient_cost"]),
+        "claim_count": int(row["claim_count"]),
+    }
+
+
+def fetch_top_diagnoses(conn, state=ALL, age_group=ALL, chronic=ALL, limit=10):
+    """Diagnosis codes with the largest total Medicare payment."""
+    where, params = build_where(
+        conn, state, age_group, chronic,
+        extra=["c.icd9_diagnosis_code IS NOT NULL", "c.medicare_payment IS NOT NULL"]
+    )
+    query = f"""
+        SELECT c.icd9_diagnosis_code, SUM(c.medicare_payment) AS medicare_payment
+        FROM {CLAIMS_JOIN}{where}
+        GROUP BY c.icd9_diagnosis_code
+        ORDER BY medicare_payment DESC
+        LIMIT {int(limit)}
+    """
+    return pd.read_sql(query, conn, params=params)
+
+
+def fetch_chronic_costs(conn, state=ALL, age_group=ALL, chronic=ALL):
+    """Total Medicare payment per chronic condition, dropping conditions with no cost."""
+    where, params = build_where(conn, state, age_group, chronic)
+    sums = ",\n            ".join(
+        f"COALESCE(SUM(CASE WHEN b.{col} = 1 THEN c.medicare_payment ELSE 0 END), 0) AS {col}"
+        for col in CHRONIC_COLS
+    )
+    query = f"""
+        SELECT
+            {sums}
+        FROM {CLAIMS_JOIN}{where}
+    """
+    row = pd.read_sql(query, conn, params=params).iloc[0]
+    chronic_df = pd.DataFrame(
+        [(col, float(row[col])) for col in CHRONIC_COLS],
+        columns=["Condition", "Total Medicare Cost"]
+    )
+    return chronic_df[chronic_df["Total Medicare Cost"] > 0]
+
+
+def prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with `prefix`, for `>= prefix AND < bound` range scans."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _bene_search_where(conn, state, age_group, chronic, prefix):
+    """
+    `(table, where, params)` for the Claim Explorer's beneficiary search.
+    All sidebar filters are beneficiary attributes, so the search runs on the
+    bene_id primary key of the per-beneficiary summary, which already knows who
+    has claims. A database whose summary was never built (loaded before it
+    existed, or by another tool) falls back to `beneficiary_info` with an
+    EXISTS over claims, slower but the same answer.
+    """
+    if summary_exists(conn):
+        table = SUMMARY_TABLE
+        where, params = build_where(conn, state, age_group, chronic, extra=["b.claim_count > 0"], use_mask=True)
+    else:
+        table = "beneficiary_info"
+        where, params = build_where(
+            conn, state, age_group, chronic,
+            extra=["EXISTS (SELECT 1 FROM claims c WHERE c.bene_id = b.bene_id)"]
+        )
+    if prefix:
+        mark = param_marker(conn)
+        where += f" AND b.bene_id >= {mark} AND b.bene_id < {mark}"
+        params += [prefix, prefix_upper_bound(prefix)]
+    return table, where, params
+
+
+def fetch_bene_count(conn, state=ALL, age_group=ALL, chronic=ALL, prefix=""):
+    """Number of beneficiaries with claims in the selection whose ID starts with `prefix`."""
+    table, where, params = _bene_search_where(conn, state, age_group, chronic, prefix)
+    query = f"SELECT COUNT(*) AS n FROM {table} b{where}"
+    return int(pd.read_sql(query, conn, params=params)["n"].iloc[0])
+
+
+def fetch_bene_page(conn, state=ALL, age_group=ALL, chronic=ALL, prefix="", limit=100, offset=0):
+    """One page of sorted beneficiary IDs with claims in the selection, starting with `prefix`."""
+    table, where, params = _bene_search_where(conn, state, age_group, chronic, prefix)
+    query = f"SELECT b.bene_id FROM {table} b{where} ORDER BY b.bene_id LIMIT {int(limit)} OFFSET {int(offset)}"
+    return pd.read_sql(query, conn, params=params)["bene_id"].tolist()
+
+
+def fetch_beneficiary_claims(conn, bene_id):
+    """All claims for one beneficiary, with the columns shown in the Claim Explorer."""
+    mark = param_marker(conn)
+    query = f"""
+        SELECT c.claim_id, c.bene_id, b.birth_date, b.state_code,
+               c.icd9_diagnosis_code, c.hcpcs_code,
+               c.medicare_payment, c.patient_deductible, c.coinsurance_amount
+        FROM {CLAIMS_JOIN}
+        WHERE c.bene_id = {mark}
+    """
+    df = add_age_columns(pd.read_sql(query, conn, params=[bene_id]))
+    return df[EXPLORER_COLUMNS]
+
+
+def filtered_claims_query(conn, state=ALL, age_group=ALL, chronic=ALL):
+    """`(query, params)` for the claim-level rows of the selection, joined with beneficiary attributes."""
+    where, params = build_where(conn, state, age_group, chronic)
+    columns = [f"c.{col}" for col in CLAIM_COLUMNS] + [f"b.{col}" for col in BENEFICIARY_COLUMNS if col != "bene_id"]
+    return f"SELECT {', '.join(columns)} FROM {CLAIMS_JOIN}{where}", params
+
+
+# ------------------------------
+# In-memory equivalents, used when the app runs from a local snapshot
+# ------------------------------
+def filter_frame(df, state=ALL, age_group=ALL, chronic=ALL):
+    """Apply the sidebar selections to a merged claims frame with an `age_group` column."""
+    if state != ALL:
+        df = df[df["state_code"] == state]
+    if age_group != ALL:
+        df = df[df["age_group"] == age_group]
+    if chronic != ALL:
+        if MASK_COL in df.columns:
+            df = df[has_condition(df[MASK_COL], chronic)]
+        else:
+            df = df[df[chronic] == 1]
+    return df
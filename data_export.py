@@ -0,0 +1,185 @@
+"""
+Chunked export of filtered claims as gzip CSV or Parquet.
+
+Rows are written a chunk at a time from whichever source holds them:
+
+* `export_frame`    – slices of an in-memory frame (small snapshot selections)
+* `export_query`    – a DB cursor, via `pd.read_sql(..., chunksize=...)`
+* `export_snapshot` – record batches of the Parquet snapshot, with the sidebar
+                      filters pushed down to the scan
+
+so memory holds one chunk plus the compressor state, never the whole file as
+a string. `sink` is a path or a binary file object.
+
+Every source goes through `export_columns`, so a selection exports with the
+same columns and types whichever path serves it (`EXPORT_DTYPES`: the
+dashboard layout with plain strings for its categoricals and float64 amounts).
+"""
+
+import gzip
+import tempfile
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import snapshot_cache
+from chronic_flags import MASK_COL, pack_flags
+from dashboard_queries import ALL, filtered_claims_query
+from schema import AGE_BINS, AGE_LABELS, AGE_REFERENCE_YEAR, CHRONIC_COLS, DASHBOARD_DTYPES, age_group_birth_range
+
+EXPORT_CHUNK = 100_000
+# Above this many rows the snapshot export re-reads the Parquet files instead of slicing the app's frame
+LARGE_EXPORT_ROWS = 1_000_000
+FORMATS = {
+    "csv.gz": ("CSV (gzip)", "application/gzip"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+}
+
+
+# Column order and dtypes of every export
+EXPORT_DTYPES = {
+    col: "string" if dtype == "category" else "float64" if dtype == "float32" else dtype
+    for col, dtype in DASHBOARD_DTYPES.items()
+}
+EXPORT_DTYPES["state_code"] = "Int16"
+
+
+# 🔧 Projection
+def export_columns(df):
+    """
+    `df` (snapshot batch, query chunk or the app's compact frame) as a new frame
+    with exactly the `EXPORT_DTYPES` columns, with `age`/`age_group` computed from `birth_date`.
+    """
+    out = {}
+    for col, dtype in EXPORT_DTYPES.items():
+        if col in ("age", "age_group"):
+            continue
+        if col not in df.columns:
+            if col == MASK_COL and set(CHRONIC_COLS) <= set(df.columns):
+                out[col] = pd.Series(pack_flags(df), index=df.index, dtype=dtype)
+            else:
+                out[col] = pd.Series(pd.NA, index=df.index, dtype=dtype)
+            continue
+        values = df[col]
+        if dtype == "string":
+            out[col] = values.astype(dtype)
+        elif dtype.startswith("datetime64"):
+            out[col] = pd.to_datetime(values, errors="coerce").astype(dtype)
+        elif dtype == "float64":
+            # Amounts are in cents; the compact frame's float32 would print as 12.340000152587891
+            rounded = values.dtype == "float32"
+            values = pd.to_numeric(values, errors="coerce").astype(dtype)
+            out[col] = values.round(2) if rounded else values
+        elif col in CHRONIC_COLS:
+            out[col] = pd.to_numeric(values, errors="coerce").fillna(0).astype(dtype)
+        else:
+            out[col] = pd.to_numeric(values, errors="coerce").astype(dtype)
+    out = pd.DataFrame(out, index=df.index)
+    age = AGE_REFERENCE_YEAR - out["birth_date"].dt.year
+    out["age"] = age.where(age.between(0, 255)).astype(EXPORT_DTYPES["age"])
+    out["age_group"] = pd.cut(out["age"], bins=AGE_BINS, labels=AGE_LABELS).astype(EXPORT_DTYPES["age_group"])
+    return out.reset_index(drop=True)
+
+
+# 🔧 Writers
+def _arrow_schema(frame):
+    # A column that is all-null in the first chunk would be typed `null` and
+    # reject later chunks, so write those as strings
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+    return schema
+
+
+def write_frames(frames, sink, fmt="csv.gz"):
+    """Write an iterable of DataFrames (at least one, possibly empty) to `sink`. Returns the row count."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    rows = 0
+    if fmt == "csv.gz":
+        with gzip.open(sink, "wt", newline="", compresslevel=6) as f:
+            for i, frame in enumerate(frames):
+                frame.to_csv(f, header=(i == 0), index=False)
+                rows += len(frame)
+        return rows
+
+    writer = None
+    try:
+        for frame in frames:
+            if writer is None:
+                writer = pq.ParquetWriter(sink, _arrow_schema(frame), compression="zstd")
+            writer.write_table(pa.Table.from_pandas(frame, schema=writer.schema, preserve_index=False))
+            rows += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _or_empty(frames, empty):
+    """`frames`, or just `empty()` when there are none, so the file still gets its header/schema."""
+    seen = False
+    for frame in frames:
+        seen = True
+        yield frame
+    if not seen:
+        yield empty()
+
+
+# 📂 Sources
+def export_frame(df, sink, fmt="csv.gz", chunk_rows=EXPORT_CHUNK):
+    chunks = (export_columns(df.iloc[start:start + chunk_rows]) for start in range(0, len(df), chunk_rows))
+    return write_frames(_or_empty(chunks, lambda: export_columns(df.iloc[:0])), sink, fmt)
+
+
+def export_query(conn, state=ALL, age_group=ALL, chronic=ALL, sink=None, fmt="csv.gz", chunk_rows=EXPORT_CHUNK):
+    """Stream the selection's claims from the database, with beneficiary attributes and `age`/`age_group` added."""
+    query, params = filtered_claims_query(conn, state, age_group, chronic)
+    chunks = (export_columns(chunk) for chunk in pd.read_sql(query, conn, params=params, chunksize=chunk_rows))
+    empty = lambda: export_columns(pd.read_sql(f"{query} LIMIT 0", conn, params=params))
+    return write_frames(_or_empty(chunks, empty), sink, fmt)
+
+
+def snapshot_filter(state=ALL, age_group=ALL, chronic=ALL):
+    """The sidebar selection as a pyarrow dataset expression (None when nothing is filtered)."""
+    conditions = []
+    if state != ALL:
+        conditions.append(ds.field("state_code") == int(state))
+    if age_group != ALL:
+        start, end = (date.fromisoformat(d) for d in age_group_birth_range(age_group))
+        conditions.append((ds.field("birth_date") >= pa.scalar(start)) & (ds.field("birth_date") < pa.scalar(end)))
+    if chronic != ALL:
+        if chronic not in CHRONIC_COLS:
+            raise ValueError(f"Unknown chronic condition: {chronic}")
+        conditions.append(ds.field(chronic) == 1)
+    expr = None
+    for condition in conditions:
+        expr = condition if expr is None else expr & condition
+    return expr
+
+
+def export_snapshot(state=ALL, age_group=ALL, chronic=ALL, sink=None, fmt="csv.gz",
+                    snapshot_dir=snapshot_cache.SNAPSHOT_DIR, chunk_rows=EXPORT_CHUNK):
+    """Stream the selection from the snapshot files, with `age`/`age_group` added as in the app."""
+    batches = snapshot_cache.iter_snapshot_batches(snapshot_dir, batch_size=chunk_rows,
+                                                   filter=snapshot_filter(state, age_group, chronic))
+    empty = lambda: export_columns(snapshot_cache.snapshot_dataset(snapshot_dir).schema.empty_table().to_pandas())
+    return write_frames(_or_empty((export_columns(b) for b in batches), empty), sink, fmt)
+
+
+def to_bytes(export, *args, **kwargs):
+    """
+    Run `export(*args, sink=<temp file>, **kwargs)` and return the file's bytes.
+
+    For `st.download_button`, which keeps every download in memory anyway:
+    compressing into a temp file bounds memory while the export runs, and the
+    file is closed (and deleted) as soon as its bytes have been read.
+    """
+    with tempfile.TemporaryFile() as f:
+        export(*args, sink=f, **kwargs)
+        f.seek(0)
+        return f.read()
@@ -0,0 +1,19 @@
+"""
+Small helpers for writing SQL that runs on both MySQL and a local SQLite stand-in.
+"""
+
+import sqlite3
+
+
+def is_sqlite(conn):
+    return isinstance(conn, sqlite3.Connection)
+
+
+def param_marker(conn):
+    """Placeholder for a bound parameter: `?` for sqlite3, `%s` for mysql.connector."""
+    return "?" if is_sqlite(conn) else "%s"
+
+
+def insert_ignore(conn):
+    """`INSERT IGNORE` (MySQL) / `INSERT OR IGNORE` (SQLite): skip rows whose key already exists."""
+    return "INSERT OR IGNORE" if is_sqlite(conn) else "INSERT IGNORE"
@@ -0,0 +1,213 @@
+"""
+Feature definitions and an on-disk cache of the engineered training matrix.
+
+`encode_batch` turns rows of `claims JOIN beneficiary_info` into the model's
+features (age, encoded ICD9/HCPCS codes, SP_* flags), its target and a
+deterministic holdout flag. The encoded matrix and the encoder classes are
+written to
+
+    data/features/<fingerprint>/matrix.parquet      features + target + holdout
+                               /encoders.parquet    code classes per column, in label order
+                               /manifest.json
+
+where the fingerprint hashes the source watermark together with
+`FEATURE_DEFINITION`. Training reuses an entry whenever neither the data nor
+the feature definition changed, so repeated runs skip the join, age
+computation and encoder fitting. Bump `FEATURE_VERSION` whenever
+`encode_batch` changes meaning.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from code_encoder import CodeEncoder, distinct_codes, fit_label_encoder
+from schema import AGE_REFERENCE_YEAR, CHRONIC_COLS
+
+FEATURE_STORE_DIR = Path(os.getenv("MEDOPTIX_FEATURE_DIR", "data/features"))
+FEATURE_VERSION = 1
+KEEP_ENTRIES = 3
+
+TARGET = "medicare_payment"
+HOLDOUT = "holdout"
+CODE_COLS = ["icd9_diagnosis_code", "hcpcs_code"]
+FEATURE_COLS = ["age"] + CODE_COLS + CHRONIC_COLS
+TRAINING_COLUMNS = ["claim_id", "birth_date"] + CODE_COLS + CHRONIC_COLS + [TARGET]
+TEST_PERCENT = 20
+
+FEATURE_DEFINITION = {
+    "version": FEATURE_VERSION,
+    "features": FEATURE_COLS,
+    "target": TARGET,
+    "age_reference_year": AGE_REFERENCE_YEAR,
+    "codes": "str(value), missing as 'nan', LabelEncoder order",
+    "holdout": f"hash(claim_id) % 100 < {TEST_PERCENT}",
+}
+
+MATRIX_SCHEMA = pa.schema(
+    [("age", pa.float32())]
+    + [(col, pa.int32()) for col in CODE_COLS]
+    + [(col, pa.float32()) for col in CHRONIC_COLS]
+    + [(TARGET, pa.float32()), (HOLDOUT, pa.bool_())]
+)
+
+
+# 🧮 Feature engineering
+def is_test_row(keys):
+    """Deterministic ~TEST_PERCENT% holdout by hashed key, identical on every pass over the data."""
+    return pd.util.hash_array(np.asarray(keys)) % 100 < TEST_PERCENT
+
+
+def fit_encoders(code_frames):
+    """Fit `(le_icd9, le_hcpcs)` from an iterable of frames holding the code columns."""
+    codes = {col: set() for col in CODE_COLS}
+    for frame in code_frames:
+        for col in CODE_COLS:
+            codes[col] |= distinct_codes(frame[col])
+    return tuple(fit_label_encoder(codes[col]) for col in CODE_COLS)
+
+
+def encode_batch(batch, icd9_encoder, hcpcs_encoder):
+    """
+    `(X, y, holdout)` for rows with a target, encoded with the same lookups the
+    app uses at prediction time.
+    """
+    batch = batch.dropna(subset=[TARGET])
+    birth_year = pd.to_datetime(batch["birth_date"], errors="coerce").dt.year
+    X = pd.DataFrame({
+        "age": (AGE_REFERENCE_YEAR - birth_year).to_numpy(dtype=np.float32),
+        "icd9_diagnosis_code": icd9_encoder.encode(batch["icd9_diagnosis_code"]).astype(np.int32),
+        "hcpcs_code": hcpcs_encoder.encode(batch["hcpcs_code"]).astype(np.int32),
+    })
+    for col in CHRONIC_COLS:
+        X[col] = batch[col].to_numpy(dtype=np.float32)
+    return X, batch[TARGET].to_numpy(dtype=np.float32), is_test_row(batch["claim_id"])
+
+
+def encode_frame(df, le_icd9, le_hcpcs):
+    """`encode_batch` for a whole frame, given the fitted LabelEncoders."""
+    return encode_batch(df, CodeEncoder(le_icd9), CodeEncoder(le_hcpcs))
+
+
+def encoded_batches(make_batches, le_icd9, le_hcpcs):
+    """Encode every batch from `make_batches(columns)`."""
+    icd9_encoder, hcpcs_encoder = CodeEncoder(le_icd9), CodeEncoder(le_hcpcs)
+    for batch in make_batches(TRAINING_COLUMNS):
+        yield encode_batch(batch, icd9_encoder, hcpcs_encoder)
+
+
+# 🔑 Fingerprints
+def db_watermark(conn):
+    """Row counts and high-water marks of the source tables."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*), MAX(claim_id), MAX(claim_thru) FROM claims")
+        claims, max_claim_id, max_claim_thru = cur.fetchone()
+        cur.execute("SELECT COUNT(*) FROM beneficiary_info")
+        beneficiaries = cur.fetchone()[0]
+    finally:
+        cur.close()
+    return {"source": "db", "claims": claims, "beneficiaries": beneficiaries,
+            "claim_id": str(max_claim_id), "claim_thru": str(max_claim_thru)}
+
+
+def snapshot_watermark(snapshot_dir):
+    from snapshot_cache import read_watermark
+    return {"source": "snapshot", **(read_watermark(snapshot_dir) or {})}
+
+
+def fingerprint(watermark, definition=FEATURE_DEFINITION):
+    payload = json.dumps({"data": watermark, "features": definition}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+# 💾 Store
+def entry_path(fp, root=FEATURE_STORE_DIR):
+    return Path(root) / fp
+
+
+def has_features(fp, root=FEATURE_STORE_DIR):
+    return (entry_path(fp, root) / "manifest.json").exists()
+
+
+def write_features(fp, batches, le_icd9, le_hcpcs, watermark=None, root=FEATURE_STORE_DIR):
+    """
+    Persist `(X, y, holdout)` batches and the encoders under `fp`, streaming
+    the matrix to Parquet. The entry is written to a temporary directory and
+    renamed, so a half-written entry is never picked up. Returns the row count.
+    """
+    root = Path(root)
+    tmp = root / f"_{fp}-{uuid.uuid4().hex[:8]}"
+    tmp.mkdir(parents=True)
+    start = time.perf_counter()
+    rows = 0
+    try:
+        with pq.ParquetWriter(tmp / "matrix.parquet", MATRIX_SCHEMA, compression="zstd") as writer:
+            for X, y, holdout in batches:
+                frame = X.assign(**{TARGET: y, HOLDOUT: holdout})
+                writer.write_table(pa.Table.from_pandas(frame, schema=MATRIX_SCHEMA, preserve_index=False))
+                rows += len(frame)
+        encoders = pd.DataFrame({
+            "column": np.repeat(CODE_COLS, [len(le_icd9.classes_), len(le_hcpcs.classes_)]),
+            "code": np.concatenate([le_icd9.classes_, le_hcpcs.classes_]).astype(str),
+        })
+        encoders.to_parquet(tmp / "encoders.parquet", index=False)
+        manifest = {
+            "fingerprint": fp,
+            "rows": rows,
+            "watermark": watermark,
+            "definition": FEATURE_DEFINITION,
+            "build_seconds": round(time.perf_counter() - start, 2),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2, default=str))
+        final = entry_path(fp, root)
+        if final.exists():
+            shutil.rmtree(final)
+        os.replace(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    prune(root)
+    return rows
+
+
+def load_encoders(fp, root=FEATURE_STORE_DIR):
+    """`(le_icd9, le_hcpcs)` rebuilt from the stored class tables."""
+    table = pd.read_parquet(entry_path(fp, root) / "encoders.parquet")
+    return tuple(fit_label_encoder(table.loc[table["column"] == col, "code"]) for col in CODE_COLS)
+
+
+def load_features(fp, root=FEATURE_STORE_DIR):
+    """Return `(X, y, holdout, le_icd9, le_hcpcs)` from a stored entry."""
+    matrix = pd.read_parquet(entry_path(fp, root) / "matrix.parquet")
+    le_icd9, le_hcpcs = load_encoders(fp, root)
+    return matrix[FEATURE_COLS], matrix[TARGET], matrix[HOLDOUT].to_numpy(), le_icd9, le_hcpcs
+
+
+def iter_features(fp, batch_size, root=FEATURE_STORE_DIR):
+    """Stream `(X, y, holdout)` batches from a stored entry."""
+    source = pq.ParquetFile(entry_path(fp, root) / "matrix.parquet", memory_map=True)
+    for batch in source.iter_batches(batch_size=batch_size):
+        frame = batch.to_pandas()
+        yield frame[FEATURE_COLS], frame[TARGET].to_numpy(), frame[HOLDOUT].to_numpy()
+
+
+def prune(root=FEATURE_STORE_DIR, keep=KEEP_ENTRIES):
+    """Drop all but the `keep` most recently written entries."""
+    entries = sorted(
+        (p for p in Path(root).iterdir() if (p / "manifest.json").exists()),
+        key=lambda p: (p / "manifest.json").stat().st_mtime,
+        reverse=True,
+    )
+    for old in entries[keep:]:
+        shutil.rmtree(old, ignore_errors=True)
@@ -1,13 +1,32 @@
 #!/usr/bin/env python
 """
 Migrate data from Docker MySQL to AWS RDS MySQL
+
+Destination tables are created with their primary keys up front, so range
+deletes and read-backs seek the index. They are then copied by primary-key
+ranges through a bounded read/write pipeline: reader threads fetch ranges
+from the source while writer threads insert earlier ones, and every written
+range is checked against the source rows by row count and an
+order-independent hash. Progress is kept in a checkpoint file so an
+interrupted run resumes where it stopped. Writers run at READ COMMITTED, so
+concurrent range DELETEs take no gap locks, and a range whose transaction
+loses a deadlock is retried:
+
+    python migrate_docker_to_rds.py [--workers 4] [--readers 2] [--queue-depth 4]
+                                    [--checkpoint migration_checkpoint.json] [--restart] [--no-verify]
 """
 
-import math
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import URL
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from config.db_config import get_engine
 
 # Configuration
 SRC_DB_CONFIG = {
@@ -27,25 +46,19 @@ DST_DB_CONFIG = {
 }
 
 TABLES_TO_MIGRATE = ["beneficiary_info", "claims"]
+PRIMARY_KEYS = {"beneficiary_info": "bene_id", "claims": "claim_id"}
 READ_CHUNK = 100_000
 WRITE_CHUNK = 2000
-
-def get_engine(config: dict):
-    url = URL.create(
-        drivername="mysql+pymysql",
-        username=config["user"],
-        password=config["password"],
-        host=config["host"],
-        port=config["port"],
-        database=config["database"],
-    )
-    return create_engine(url, pool_pre_ping=True)
-
-src_engine = get_engine(SRC_DB_CONFIG)
-dst_engine = get_engine(DST_DB_CONFIG)
+WORKERS = 4
+READERS = 2
+QUEUE_DEPTH = 4
+CHECKPOINT_FILE = "migration_checkpoint.json"
+# MySQL deadlock / lock wait timeout: the range transaction was rolled back and can simply be rerun
+RETRYABLE_ERRORS = {1213, 1205}
+WRITE_RETRIES = 3
 
 # 🔧 One-time: Create table with PRIMARY KEY in RDS
-def create_beneficiary_info_schema():
+def create_beneficiary_info_schema(dst_engine):
     ddl = """
     CREATE TABLE IF NOT EXISTS beneficiary_info (
         bene_id VARCHAR(50) PRIMARY KEY,
@@ -69,57 +82,281 @@ def create_beneficiary_info_schema():
         SP_ISCHMCHT BIGINT,
         SP_OSTEOPRS BIGINT,
         SP_RA_OA BIGINT,
-        SP_STRKETIA BIGINT
+        SP_STRKETIA BIGINT,
+        chronic_mask SMALLINT UNSIGNED
     );
     """
     with dst_engine.begin() as conn:
         conn.execute(text(ddl))
     print("✅ Created `beneficiary_info` table with PK")
 
+def create_claims_schema(dst_engine):
+    # Without the PK every range DELETE and verification read-back would scan the whole table
+    ddl = """
+    CREATE TABLE IF NOT EXISTS claims (
+        claim_id BIGINT PRIMARY KEY,
+        bene_id VARCHAR(50),
+        claim_from DATE,
+        claim_thru DATE,
+        icd9_diagnosis_code VARCHAR(10),
+        hcpcs_code VARCHAR(10),
+        medicare_payment DOUBLE,
+        patient_deductible DOUBLE,
+        coinsurance_amount DOUBLE
+    );
+    """
+    with dst_engine.begin() as conn:
+        conn.execute(text(ddl))
+    print("✅ Created `claims` table with PK")
+
+SCHEMAS = {"beneficiary_info": create_beneficiary_info_schema, "claims": create_claims_schema}
+
+# 📍 Checkpointing
+_checkpoint_lock = threading.Lock()
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(path, checkpoint):
+    # Write-then-rename so an interrupted save never leaves a truncated file
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, path)
+
+# 🗂 Key ranges
+def plan_key_ranges(engine, table: str, key: str, chunk: int = READ_CHUNK):
+    """
+    Split `table` into [lo, hi) primary-key ranges of ~`chunk` rows.
+
+    Each boundary is found by seeking the PK index from the previous one
+    (`WHERE key >= :lo ORDER BY key LIMIT 1 OFFSET :chunk`), so planning reads
+    the index once instead of rescanning earlier rows like LIMIT/OFFSET paging.
+    The last range is open-ended (hi is None).
+    """
+    starts = []
+    with engine.connect() as conn:
+        lo = conn.execute(text(f"SELECT MIN({key}) FROM {table}")).scalar()
+        while lo is not None:
+            starts.append(lo)
+            lo = conn.execute(
+                text(f"SELECT {key} FROM {table} WHERE {key} >= :lo ORDER BY {key} LIMIT 1 OFFSET :n"),
+                {"lo": lo, "n": chunk},
+            ).scalar()
+    return [[lo, hi] for lo, hi in zip(starts, starts[1:] + [None])]
+
+def range_clause(key: str, lo, hi):
+    if hi is None:
+        return f"{key} >= :lo", {"lo": lo}
+    return f"{key} >= :lo AND {key} < :hi", {"lo": lo, "hi": hi}
+
+def read_range(src_engine, table: str, key: str, lo, hi):
+    where, params = range_clause(key, lo, hi)
+    with src_engine.connect() as conn:
+        return pd.read_sql(text(f"SELECT * FROM {table} WHERE {where}"), conn, params=params)
+
+def _is_retryable(err):
+    return bool(getattr(err.orig, "args", None)) and err.orig.args[0] in RETRYABLE_ERRORS
+
+def _write_connection(dst_engine):
+    conn = dst_engine.connect()
+    if dst_engine.dialect.name == "mysql":
+        # Under the default REPEATABLE READ the range DELETE takes gap/next-key locks, which block
+        # (and deadlock with) other writers inserting into neighbouring, still-empty ranges.
+        # READ COMMITTED locks only the rows it deletes.
+        conn = conn.execution_options(isolation_level="READ COMMITTED")
+    return conn
+
+def write_range(dst_engine, table: str, key: str, lo, hi, df, write_chunk: int = WRITE_CHUNK,
+                retries: int = WRITE_RETRIES):
+    """
+    Write one key range. The destination range is cleared in the same
+    transaction as the insert, so re-running a range never duplicates rows.
+    A transaction that loses a deadlock is rolled back and retried up to
+    `retries` times.
+    """
+    where, params = range_clause(key, lo, hi)
+    for attempt in range(retries + 1):
+        try:
+            with _write_connection(dst_engine) as conn, conn.begin():
+                conn.execute(text(f"DELETE FROM {table} WHERE {where}"), params)
+                if not df.empty:
+                    df.to_sql(
+                        name=table,
+                        con=conn,
+                        if_exists="append",
+                        index=False,
+                        chunksize=write_chunk,
+                        method="multi"
+                    )
+            return len(df)
+        except OperationalError as err:
+            if attempt == retries or not _is_retryable(err):
+                raise
+            print(f"   🔁 {key} in [{lo}, {hi}): {err.orig.args[0]} {err.orig.args[-1]}; retrying")
+            time.sleep(0.1 * 2 ** attempt)
+
+# 🔍 Verification
+def frame_checksum(df):
+    """
+    `(row_count, hash)` of a range that doesn't depend on row or column order:
+    each row is hashed and the 64-bit row hashes are summed (mod 2**64).
+    """
+    if df.empty:
+        return 0, "0" * 16
+    row_hashes = pd.util.hash_pandas_object(df[sorted(df.columns)], index=False)
+    return len(df), f"{int(row_hashes.to_numpy().sum()):016x}"
+
+def verify_range(dst_engine, table: str, key: str, lo, hi, expected):
+    """
+    Compare the destination copy of a range with the checksum of the rows
+    read from the source. Only the range just written is read back, so the
+    source is never scanned twice.
+    """
+    actual = frame_checksum(read_range(dst_engine, table, key, lo, hi))
+    return actual == tuple(expected), actual
+
 # 🛠 Migration
-def migrate_table(table: str):
+def migrate_table(table: str, src_engine, dst_engine, workers: int = WORKERS,
+                  checkpoint_path: str = CHECKPOINT_FILE, read_chunk: int = READ_CHUNK,
+                  write_chunk: int = WRITE_CHUNK, readers: int = READERS,
+                  queue_depth: int = QUEUE_DEPTH, verify: bool = True):
+    """
+    Migrate `table` by primary-key ranges through a read/write pipeline.
+
+    `readers` threads fetch ranges from the source into a queue bounded at
+    `queue_depth` frames, while `workers` threads write them to the
+    destination, so reading one range overlaps writing the previous ones and
+    memory stays capped. With `verify`, each written range is read back and
+    its row count and order-independent hash compared to the source rows; a
+    mismatched range is rewritten once before the migration fails.
+
+    The planned ranges, the ones already committed and their checksums are
+    kept in `checkpoint_path`, so an interrupted run resumes with the
+    remaining ranges.
+    """
     print(f"\n🔄 Migrating `{table}`...")
-    with src_engine.connect() as conn:
-        total_rows = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+    key = PRIMARY_KEYS[table]
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    entry = checkpoint.get(table)
+    if entry is None:
+        entry = {"key": key, "ranges": plan_key_ranges(src_engine, table, key, read_chunk), "done": []}
+        checkpoint[table] = entry
+        save_checkpoint(checkpoint_path, checkpoint)
+    entry.setdefault("checksums", {})
 
-    if total_rows == 0:
+    ranges = entry["ranges"]
+    pending = [i for i in range(len(ranges)) if i not in set(entry["done"])]
+    if not ranges:
         print(f"⚠️  No rows in `{table}`")
         return
+    print(f"→ {len(ranges)} key ranges, {len(pending)} remaining, {readers} readers → {workers} writers")
+    # Keyed on the PK before any range is written, so range DELETEs and read-backs are index seeks
+    SCHEMAS[table](dst_engine)
 
-    offset = 0
-    total_chunks = math.ceil(total_rows / READ_CHUNK)
-    print(f"→ {total_rows:,} rows to migrate in {total_chunks} chunks")
+    def mark_done(i, df):
+        checksum = frame_checksum(df)
+        lo, hi = ranges[i]
+        if verify:
+            ok, actual = verify_range(dst_engine, table, key, lo, hi, checksum)
+            if not ok:
+                print(f"   ⚠️  Checksum mismatch for {key} in [{lo}, {hi}): "
+                      f"source {checksum}, destination {actual}; rewriting")
+                write_range(dst_engine, table, key, lo, hi, df, write_chunk)
+                ok, actual = verify_range(dst_engine, table, key, lo, hi, checksum)
+                if not ok:
+                    raise RuntimeError(f"`{table}` range [{lo}, {hi}) failed verification: "
+                                       f"source {checksum}, destination {actual}")
+        with _checkpoint_lock:
+            entry["done"].append(i)
+            entry["checksums"][str(i)] = list(checksum)
+            save_checkpoint(checkpoint_path, checkpoint)
+        print(f"   ✅ {len(df)} rows written to `{table}` for {key} in [{lo}, {hi})"
+              + (" (verified)" if verify else ""))
 
-    while offset < total_rows:
-        print(f"   📥 Reading rows {offset} to {offset + READ_CHUNK - 1}")
-        query = text(f"SELECT * FROM {table} LIMIT :limit OFFSET :offset")
-        with src_engine.connect() as conn:
-            df = pd.read_sql(query, conn, params={"limit": READ_CHUNK, "offset": offset})
+    frames = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
 
-        if df.empty:
-            break
+    def put(item):
+        # Blocks while the queue is full (backpressure on the readers) unless the pipeline is stopping
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
 
+    def produce(indices):
         try:
-            with dst_engine.begin() as conn:
-                df.to_sql(
-                    name=table,
-                    con=conn,
-                    if_exists="append",
-                    index=False,
-                    chunksize=WRITE_CHUNK,
-                    method="multi"
-                )
-            print(f"   ✅ {len(df)} rows written to `{table}`")
-        except SQLAlchemyError as err:
-            print(f"   ❌ Write error: {err}")
+            for i in indices:
+                if not put((i, read_range(src_engine, table, key, *ranges[i]))):
+                    return
+        except Exception as err:
+            lo, hi = ranges[i]
+            print(f"   ❌ Reading range [{lo}, {hi}) failed: {err}")
+            stop.set()
             raise
 
-        offset += READ_CHUNK
+    def consume():
+        while not stop.is_set():
+            try:
+                item = frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            i, df = item
+            try:
+                write_range(dst_engine, table, key, *ranges[i], df, write_chunk)
+                mark_done(i, df)
+            except Exception as err:
+                lo, hi = ranges[i]
+                print(f"   ❌ Range [{lo}, {hi}) failed: {err}")
+                stop.set()
+                raise
+
+    with ThreadPoolExecutor(max_workers=readers + workers) as pool:
+        # Readers take interleaved ranges so they advance through the key space together
+        producers = [pool.submit(produce, pending[r::readers]) for r in range(readers)]
+        consumers = [pool.submit(consume) for _ in range(workers)]
+        try:
+            for future in producers:
+                future.result()
+            for _ in consumers:
+                put(None)
+            for future in consumers:
+                future.result()
+        except BaseException:
+            stop.set()
+            raise
 
     print(f"✅ Migration done for `{table}`")
 
 # 🔁 Main
 def main():
+    p = argparse.ArgumentParser(description="Migrate beneficiary_info and claims from Docker MySQL to AWS RDS.")
+    p.add_argument("--workers", type=int, default=WORKERS, help=f"Concurrent range writers (default: {WORKERS})")
+    p.add_argument("--readers", type=int, default=READERS, help=f"Concurrent range readers (default: {READERS})")
+    p.add_argument("--queue-depth", type=int, default=QUEUE_DEPTH,
+                   help=f"Ranges buffered between readers and writers (default: {QUEUE_DEPTH})")
+    p.add_argument("--no-verify", action="store_true", help="Skip the per-range checksum comparison")
+    p.add_argument("--checkpoint", default=CHECKPOINT_FILE, help=f"Checkpoint file (default: {CHECKPOINT_FILE})")
+    p.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    args = p.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    # Shared engines from config.db_config: one pooled connection per reader/writer thread
+    pool_size = args.readers + args.workers
+    src_engine = get_engine(SRC_DB_CONFIG, pool_size=pool_size, max_overflow=args.workers)
+    dst_engine = get_engine(DST_DB_CONFIG, pool_size=pool_size, max_overflow=args.workers)
+
     try:
         with src_engine.connect() as conn:
             conn.execute(text("SELECT 1"))
@@ -136,11 +373,9 @@ def main():
         print("🔴 RDS DB error:", e)
         return
 
-    if "beneficiary_info" in TABLES_TO_MIGRATE:
-        create_beneficiary_info_schema()
-
     for table in TABLES_TO_MIGRATE:
-        migrate_table(table)
+        migrate_table(table, src_engine, dst_engine, args.workers, args.checkpoint,
+                      readers=args.readers, queue_depth=args.queue_depth, verify=not args.no_verify)
 
     print("\n🎉 All migrations complete")
 
@@ -0,0 +1,48 @@
+"""
+Loading of the XGBoost cost model and its ICD9/HCPCS encoders.
+
+Shared by the Streamlit app and the command-line/batch entry points, so the
+`models/*.joblib` layout written by `cost_predictor.py` is defined in one place.
+"""
+
+import os
+
+import joblib
+from code_encoder import CodeEncoder
+
+MODELS_DIR = "models"
+
+GDRIVE_MODELS = {
+    "cost_model_xgb": "https://drive.google.com/uc?id=1Z-3xB2tSRebrbgUjNO_68Bhiz9IiM1BD",
+    "le_icd9": "https://drive.google.com/uc?id=1VlHsM0Q8Qc7-DlLJkaij5Pa9XfeMjFLD",
+    "le_hcpcs": "https://drive.google.com/uc?id=16nYj5VHD2hqIM45GkeRV92zGYq2vtKge",
+}
+
+
+def asset_paths(models_dir=MODELS_DIR):
+    return {name: os.path.join(models_dir, f"{name}.joblib") for name in GDRIVE_MODELS}
+
+
+def load_model_assets(models_dir=MODELS_DIR, download=True):
+    """
+    Return `(model, icd9_encoder, hcpcs_encoder, chronic_cols)`.
+
+    Missing files are fetched from Google Drive when `download` is set.
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    paths = asset_paths(models_dir)
+
+    for name, path in paths.items():
+        if not os.path.exists(path):
+            if not download:
+                raise FileNotFoundError(f"Missing model asset: {path}")
+            import gdown
+            gdown.download(GDRIVE_MODELS[name], path, quiet=False)
+
+    model = joblib.load(paths["cost_model_xgb"])
+    le_icd9 = joblib.load(paths["le_icd9"])
+    le_hcpcs = joblib.load(paths["le_hcpcs"])
+
+    chronic_cols = [f for f in model.feature_names_in_ if f.startswith("SP_")]
+    # Hash lookups built once per model load; unknown codes encode to -1
+    return model, CodeEncoder(le_icd9), CodeEncoder(le_hcpcs), chronic_cols
@@ -0,0 +1,253 @@
+"""
+Lightweight timing spans for the app's hot paths and the command-line scripts.
+
+    with perf.span("load snapshot") as s:
+        df = snapshot_cache.load_snapshot()
+        s.rows = len(df)
+
+A span records wall time, the rows it processed (when set) and the change in
+resident memory. Spans are off unless `MEDOPTIX_PERF=1` or a recorder is
+enabled explicitly: a disabled `span()` returns one shared no-op object, so
+instrumented code pays a function call and nothing else.
+
+Recorded spans can be summarized per name, written as a Prometheus text file
+(for node_exporter's textfile collector; `MEDOPTIX_PERF_PROM`) or appended to
+a JSON-lines log (`MEDOPTIX_PERF_LOG`).
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+ENABLED = os.getenv("MEDOPTIX_PERF", "").lower() in ("1", "true", "yes")
+PROM_PATH = os.getenv("MEDOPTIX_PERF_PROM")
+LOG_PATH = os.getenv("MEDOPTIX_PERF_LOG")
+METRIC_PREFIX = "medoptix_span"
+MAX_SPANS = 10_000
+
+
+# 📏 Memory
+def rss_mb():
+    """Current resident set size in MB (NaN where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return float("nan")
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if os.uname().sysname == "Darwin" else peak / 1024
+
+
+# ⏱ Spans
+class Span:
+    __slots__ = ("recorder", "name", "rows", "depth", "started_at", "seconds", "rss_delta_mb", "_start", "_rss")
+
+    def __init__(self, recorder, name, rows=None):
+        self.recorder = recorder
+        self.name = name
+        self.rows = rows
+        self.seconds = self.rss_delta_mb = None
+
+    def __enter__(self):
+        stack = self.recorder._stack()
+        self.depth = len(stack)
+        stack.append(self)
+        self._rss = rss_mb()
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        self.rss_delta_mb = rss_mb() - self._rss
+        self.recorder._stack().pop()
+        self.recorder._add(self)
+        return False
+
+    def as_dict(self):
+        return {
+            "span": self.name,
+            "depth": self.depth,
+            "started_at": round(self.started_at, 3),
+            "seconds": round(self.seconds, 6),
+            "rows": self.rows,
+            "rss_delta_mb": round(self.rss_delta_mb, 2),
+        }
+
+
+class _NullSpan:
+    """What `span()` returns when recording is off: ignores everything."""
+    __slots__ = ()
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Recorder:
+    """Collects finished spans (the last `max_spans`) from any thread."""
+
+    def __init__(self, enabled=ENABLED, max_spans=MAX_SPANS):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def span(self, name, rows=None):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, rows)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def records(self):
+        with self._lock:
+            return [s.as_dict() for s in self.spans]
+
+    def summary(self):
+        """Per span name, in order of first appearance: calls, total/max seconds, rows and memory delta."""
+        totals = {}
+        for r in self.records():
+            t = totals.setdefault(r["span"], {"span": r["span"], "depth": r["depth"], "calls": 0, "seconds": 0.0,
+                                              "max_seconds": 0.0, "rows": 0, "rss_delta_mb": 0.0})
+            t["calls"] += 1
+            t["seconds"] += r["seconds"]
+            t["max_seconds"] = max(t["max_seconds"], r["seconds"])
+            t["rows"] += r["rows"] or 0
+            t["rss_delta_mb"] += r["rss_delta_mb"]
+        return list(totals.values())
+
+    # 📤 Export
+    def to_prometheus(self):
+        """Prometheus text exposition of the per-span totals."""
+        metrics = [
+            ("seconds_total", "counter", "Wall time spent in the span.", "seconds"),
+            ("calls_total", "counter", "Times the span was entered.", "calls"),
+            ("rows_total", "counter", "Rows processed inside the span.", "rows"),
+            ("seconds_max", "gauge", "Slowest single run of the span.", "max_seconds"),
+            ("rss_delta_megabytes", "gauge", "Net change in resident memory across the span.", "rss_delta_mb"),
+        ]
+        summary = self.summary()
+        lines = []
+        for suffix, kind, help_text, key in metrics:
+            name = f"{METRIC_PREFIX}_{suffix}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for t in summary:
+                label = t["span"].replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{name}{{span="{label}"}} {t[key]:.6g}')
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        return json.dumps({"spans": self.records(), "summary": self.summary()}, indent=2)
+
+    def write_prometheus(self, path=PROM_PATH):
+        """Atomically replace the textfile at `path` (no-op without a path)."""
+        if not path:
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def write_json(self, path=LOG_PATH):
+        """Append every recorded span to a JSON-lines log (no-op without a path)."""
+        if not path:
+            return
+        with open(path, "a") as f:
+            for r in self.records():
+                f.write(json.dumps(r) + "\n")
+
+    def flush(self):
+        """Write the configured Prometheus file and JSON log."""
+        self.write_prometheus()
+        self.write_json()
+
+    def print(self):
+        print("\n⏱ Performance")
+        print(f"   {'span':<36}{'calls':>7}{'wall s':>10}{'rows':>12}{'Δ MB':>9}")
+        for t in self.summary():
+            name = "  " * t["depth"] + t["span"]
+            print(f"   {name:<36}{t['calls']:>7}{t['seconds']:>10.3f}{t['rows']:>12,}{t['rss_delta_mb']:>9.1f}")
+
+
+# 🌐 Module-level API: the thread's active recorder, else the process-wide one
+RECORDER = Recorder()
+
+
+class _Active(threading.local):
+    # A class default avoids a slow getattr miss on every span() call
+    recorder = None
+
+
+_active = _Active()
+
+
+def activate(recorder):
+    """Send this thread's spans to `recorder` (e.g. one per Streamlit session run)."""
+    _active.recorder = recorder
+    return recorder
+
+
+def current():
+    return _active.recorder or RECORDER
+
+
+def span(name, rows=None):
+    return current().span(name, rows)
+
+
+def timed(name=None):
+    """Decorator: run the function inside a span named after it."""
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def enable(on=True):
+    current().enabled = on
+
+
+def report():
+    """For scripts at exit: print and export the recorded spans when recording is on."""
+    recorder = current()
+    if recorder.enabled and recorder.spans:
+        recorder.print()
+        recorder.flush()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+prediction_service.py  [--host 0.0.0.0] [--port 8000] [--window-ms 5] [--max-batch 256]
+
+Low-latency HTTP scoring service for the Medicare cost model.
+
+The model and encoders are loaded once. Concurrent single predictions are
+queued and coalesced into micro-batches: the first request opens a window of
+`--window-ms`, and everything that arrives before it closes (up to
+`--max-batch` rows) is scored with a single `model.predict` call.
+
+Endpoints (JSON):
+    POST /predict        {"age": 72, "icd9_diagnosis_code": "4019", "hcpcs_code": "99213", "SP_CHF": 1}
+    POST /predict/batch  {"rows": [{...}, {...}]}
+    GET  /metrics        request counts, batch sizes and p50/p99 latency
+    GET  /health
+
+Rows use the same columns as the CSV batch upload; missing SP_* flags are 0.
+The app is a plain ASGI callable, served with uvicorn.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from batch_predict import build_features, PREDICTION_COL
+from model_assets import MODELS_DIR, load_model_assets
+
+WINDOW_MS = float(os.getenv("MEDOPTIX_BATCH_WINDOW_MS", 5))
+MAX_BATCH = int(os.getenv("MEDOPTIX_MAX_BATCH", 256))
+LATENCY_SAMPLES = 10_000
+
+
+class LatencyStats:
+    """Rolling request latencies (last `LATENCY_SAMPLES`) and batch size counters."""
+
+    def __init__(self, maxlen=LATENCY_SAMPLES):
+        self.latencies = deque(maxlen=maxlen)
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.batched_rows = 0
+
+    def record_request(self, seconds, rows=1):
+        self.latencies.append(seconds)
+        self.requests += 1
+        self.rows += rows
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.batched_rows += size
+
+    def snapshot(self):
+        lat = np.fromiter(self.latencies, dtype=float) * 1000
+        p50, p99 = np.percentile(lat, [50, 99]) if len(lat) else (0.0, 0.0)
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "micro_batches": self.batches,
+            "avg_micro_batch_size": self.batched_rows / self.batches if self.batches else 0.0,
+            "latency_ms_p50": float(p50),
+            "latency_ms_p99": float(p99),
+        }
+
+
+class MicroBatcher:
+    """Coalesces single-row predictions into batches within a time window."""
+
+    def __init__(self, model, icd9_encoder, hcpcs_encoder, window_ms=WINDOW_MS, max_batch=MAX_BATCH, stats=None):
+        self.model = model
+        self.icd9_encoder = icd9_encoder
+        self.hcpcs_encoder = hcpcs_encoder
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.stats = stats or LatencyStats()
+        self._queue = None
+        self._task = None
+
+    def score(self, rows):
+        """Synchronous scoring of a list of row dicts."""
+        features = build_features(pd.DataFrame(rows), self.model, self.icd9_encoder, self.hcpcs_encoder)
+        return self.model.predict(features).astype(float).tolist()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def predict(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            rows = [row for row, _ in batch]
+            try:
+                # XGBoost releases the GIL, so new requests keep queueing while a batch scores
+                preds = await loop.run_in_executor(None, self.score, rows)
+            except Exception:
+                # One malformed row shouldn't fail its neighbours; rescore individually
+                await self._score_individually(batch)
+                continue
+            self.stats.record_batch(len(batch))
+            for (_, future), pred in zip(batch, preds):
+                if not future.done():
+                    future.set_result(pred)
+
+    async def _score_individually(self, batch):
+        loop = asyncio.get_running_loop()
+        for row, future in batch:
+            try:
+                pred = (await loop.run_in_executor(None, self.score, [row]))[0]
+            except Exception as err:
+                if not future.done():
+                    future.set_exception(err)
+            else:
+                self.stats.record_batch(1)
+                if not future.done():
+                    future.set_result(pred)
+
+
+async def _read_json(receive):
+    body = b""
+    more = True
+    while more:
+        message = await receive()
+        body += message.get("body", b"")
+        more = message.get("more_body", False)
+    return json.loads(body or b"{}")
+
+
+async def _respond(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_app(models_dir=MODELS_DIR, window_ms=WINDOW_MS, max_batch=MAX_BATCH, assets=None):
+    """
+    Build the ASGI application. `assets` may be a preloaded
+    `(model, icd9_encoder, hcpcs_encoder, chronic_cols)` tuple.
+    """
+    state = {}
+
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                model, icd9_encoder, hcpcs_encoder, _ = assets or load_model_assets(models_dir)
+                state["batcher"] = MicroBatcher(model, icd9_encoder, hcpcs_encoder, window_ms, max_batch)
+                await state["batcher"].start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await state["batcher"].stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await lifespan(receive, send)
+
+        batcher = state["batcher"]
+        route = (scope["method"], scope["path"])
+        start = time.perf_counter()
+
+        if route == ("GET", "/health"):
+            return await _respond(send, 200, {"status": "ok"})
+        if route == ("GET", "/metrics"):
+            return await _respond(send, 200, batcher.stats.snapshot())
+        if route not in {("POST", "/predict"), ("POST", "/predict/batch")}:
+            return await _respond(send, 404, {"error": f"No route for {scope['method']} {scope['path']}"})
+
+        try:
+            payload = await _read_json(receive)
+            if route == ("POST", "/predict"):
+                if not isinstance(payload, dict):
+                    raise ValueError("Expected a JSON object")
+                result = {PREDICTION_COL: await batcher.predict(payload)}
+                rows = 1
+            else:
+                rows_in = payload.get("rows") if isinstance(payload, dict) else None
+                if not isinstance(rows_in, list):
+                    raise ValueError("Expected {\"rows\": [...]}")
+                # Bulk requests are already batched; score them off the event loop directly
+                preds = await asyncio.get_running_loop().run_in_executor(None, batcher.score, rows_in) if rows_in else []
+                result = {"predictions": preds}
+                rows = len(rows_in)
+        except KeyError as err:
+            return await _respond(send, 400, {"error": f"Missing field {err}"})
+        except (ValueError, TypeError) as err:
+            return await _respond(send, 400, {"error": str(err)})
+
+        batcher.stats.record_request(time.perf_counter() - start, rows)
+        return await _respond(send, 200, result)
+
+    app.state = state
+    return app
+
+
+def main():
+    p = argparse.ArgumentParser(description="Serve the Medicare cost model over HTTP with request micro-batching.")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--window-ms", type=float, default=WINDOW_MS, help=f"Micro-batch window (default: {WINDOW_MS} ms)")
+    p.add_argument("--max-batch", type=int, default=MAX_BATCH, help=f"Max rows per micro-batch (default: {MAX_BATCH})")
+    p.add_argument("--models-dir", default=MODELS_DIR, help=f"Directory with the .joblib assets (default: {MODELS_DIR})")
+    args = p.parse_args()
+
+    import uvicorn
+    app = create_app(args.models_dir, args.window_ms, args.max_batch)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Size-bounded LRU cache for per-selection dashboard results.
+
+Every widget interaction reruns `app.py` from the top. The app keeps one
+`ResultCache` per process (shared by all sessions) and stores the derived
+results of each (state, age group, chronic condition) selection in it: the
+metrics, the plotly figures and, when exported, the filtered frame. Switching
+back to a recent selection is then a dict lookup.
+
+* Eviction – least recently used first, once there are more than
+  `max_entries` entries or their estimated size exceeds `max_bytes`
+* Invalidation – `sync(version)` drops everything when the data version
+  (snapshot watermark or DB version) changes
+* Counters – hits, misses, evictions and invalidations, for the Performance panel
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.getenv("MEDOPTIX_RESULT_CACHE_ENTRIES", "128"))
+MAX_BYTES = int(float(os.getenv("MEDOPTIX_RESULT_CACHE_MB", "512")) * 2**20)
+
+
+def frame_bytes(df):
+    """Shallow size of a DataFrame (categoricals count their codes and categories once)."""
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+
+class ResultCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def sync(self, version):
+        """Drop every entry if the underlying data changed since the last call."""
+        with self._lock:
+            if version == self.version:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self.version = version
+
+    def get(self, key, compute, size=None):
+        """
+        Return the cached value for `key`, or `compute()` it and cache it.
+
+        `size(value)` estimates the bytes the value keeps alive; values larger
+        than `max_bytes` on their own are returned but not kept.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            version = self.version
+
+        # Computed outside the lock: two sessions missing the same key both compute it
+        value = compute()
+        nbytes = size(value) if size else 0
+
+        with self._lock:
+            if version != self.version or nbytes > self.max_bytes:
+                return value
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "mb": round(self._bytes / 2**20, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
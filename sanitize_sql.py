@@ -1,47 +1,119 @@
 #!/usr/bin/env python3
 """
-sanitize_sql.py  input.sql  [output.sql]
+sanitize_sql.py  input.sql  [output.sql]  [--split [--rows-per-insert 500] [--workers N]]
 
 Strips BOMs, NULL bytes, and other control chars that can break MySQL imports.
-Keeps tabs/newlines/CR. Defaults to writing <input>_clean.sql if output not given.
+Keeps tabs/newlines and normalizes CRLF/CR to LF. Defaults to writing
+<input>_clean.sql if output not given; `-` reads stdin / writes stdout.
+
+The dump is processed in fixed-size byte blocks, so memory use doesn't grow
+with the file. With `--split` the sanitized text is fed straight into the
+INSERT splitter (`sql_splitter.py`), preparing a dump for import in one pass
+without an intermediate file.
 """
 
-import sys
+import argparse
 import codecs
-import re
+import sys
 from pathlib import Path
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python sanitize_sql.py dump.sql [dump_clean.sql]")
-        sys.exit(1)
+from sql_splitter import ROWS_PER_INSERT, split_stream
+
+BLOCK_SIZE = 1 << 20
+
+BOMS = (
+    codecs.BOM_UTF8,
+    codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE,
+    codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE
+)
+
+# NULs and control chars except \t \n \r. None of these bytes occur inside a
+# multi-byte UTF-8 sequence, so they can be deleted before decoding.
+CONTROL_BYTES = bytes(range(0x00, 0x09)) + b"\x0b\x0c" + bytes(range(0x0e, 0x20))
 
-    infile = Path(sys.argv[1])
-    outfile = Path(sys.argv[2]) if len(sys.argv) >= 3 else infile.with_name(infile.stem + "_clean.sql")
 
-    raw = infile.read_bytes()
+def iter_sanitized(fin, block_size=BLOCK_SIZE):
+    """Yield sanitized text blocks from a binary file object."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    first = True
+    carry = ""
+    while True:
+        block = fin.read(block_size)
+        last = not block
+        if first:
+            # Strip common BOMs if present (the longest one is 4 bytes)
+            while len(block) < 4 and not last:
+                more = fin.read(block_size)
+                if not more:
+                    break
+                block += more
+            for bom in BOMS:
+                if block.startswith(bom):
+                    block = block[len(bom):]
+                    break
+            first = False
 
-    # Strip common BOMs if present
-    for bom in (
-        codecs.BOM_UTF8,
-        codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE,
-        codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE
-    ):
-        if raw.startswith(bom):
-            raw = raw[len(bom):]
-            break
+        # Decode as UTF-8 (an incomplete character at the end of a block is held back)
+        text = carry + decoder.decode(block.translate(None, CONTROL_BYTES), final=last)
+        # A CR at the end of a block may be the first half of a CRLF
+        if not last and text.endswith("\r"):
+            text, carry = text[:-1], "\r"
+        else:
+            carry = ""
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        if text:
+            yield text
+        if last:
+            return
 
-    # Decode as UTF‑8, drop undecodable bytes
-    txt = raw.decode("utf-8", errors="ignore")
 
-    # Remove NULLs and control chars except \t \n \r
-    txt = re.sub(r"[\x00-\x08\x0B\x0C\x0E-\x1F]", "", txt)
+def _open_in(path):
+    return sys.stdin.buffer if path == "-" else open(path, "rb")
+
+
+def _open_out(path):
+    if path == "-":
+        return open(sys.stdout.fileno(), "w", encoding="utf-8", newline="", closefd=False)
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def sanitize(in_path, out_path, block_size=BLOCK_SIZE, split=False, rows_per_insert=ROWS_PER_INSERT, workers=1):
+    fin = _open_in(in_path)
+    try:
+        with _open_out(out_path) as fout:
+            blocks = iter_sanitized(fin, block_size)
+            if split:
+                split_stream(blocks, fout.write, rows_per_insert, workers)
+            else:
+                for text in blocks:
+                    fout.write(text)
+    finally:
+        if fin is not sys.stdin.buffer:
+            fin.close()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Strip BOMs, NULs and control chars from a SQL dump, optionally splitting INSERTs.")
+    p.add_argument("input", help="SQL dump to clean (`-` for stdin)")
+    p.add_argument("output", nargs="?", help="Where to write (default: <input>_clean.sql; `-` for stdout)")
+    p.add_argument("--split", action="store_true", help="Also split multi-row INSERTs in the same pass")
+    p.add_argument("--rows-per-insert", type=int, default=ROWS_PER_INSERT,
+                   help=f"Max rows per INSERT with --split (default: {ROWS_PER_INSERT})")
+    p.add_argument("--workers", type=int, default=1, help="Splitter processes with --split (default: 1)")
+    p.add_argument("--block-size", type=int, default=BLOCK_SIZE, help=f"Bytes read per block (default: {BLOCK_SIZE})")
+    args = p.parse_args()
 
-    # Normalize newlines to \n (optional)
-    txt = txt.replace("\r\n", "\n").replace("\r", "\n")
+    if args.output:
+        outfile = args.output
+    elif args.input == "-":
+        outfile = "-"
+    else:
+        infile = Path(args.input)
+        outfile = str(infile.with_name(infile.stem + "_clean.sql"))
 
-    outfile.write_text(txt, encoding="utf-8")
-    print(f"✅ Cleaned file written to: {outfile}")
+    sanitize(args.input, outfile, args.block_size, args.split, args.rows_per_insert, args.workers)
+    if outfile != "-":
+        print(f"✅ Cleaned file written to: {outfile}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,112 @@
+"""
+Shared column definitions for the `beneficiary_info` and `claims` tables.
+
+These mirror the frames built in `clean_claims_data.py` and the DDL in
+`migrate_docker_to_rds.py`, so every module derives ages and chronic flags
+the same way the dashboard does.
+"""
+
+import pandas as pd
+
+CHRONIC_COLS = [
+    'SP_ALZHDMTA', 'SP_CHF', 'SP_CHRNKIDN', 'SP_CNCR', 'SP_COPD',
+    'SP_DEPRESSN', 'SP_DIABETES', 'SP_ISCHMCHT', 'SP_OSTEOPRS', 'SP_RA_OA', 'SP_STRKETIA'
+]
+
+BENEFICIARY_COLUMNS = [
+    'bene_id', 'birth_date', 'death_date', 'sex_code', 'race_code',
+    'esrd_ind', 'state_code', 'county_code', 'hi_coverage_mos',
+    'smi_coverage_mos', 'hmo_coverage_mos',
+] + CHRONIC_COLS
+
+CLAIM_COLUMNS = [
+    'claim_id', 'bene_id', 'claim_from', 'claim_thru',
+    'icd9_diagnosis_code', 'hcpcs_code',
+    'medicare_payment', 'patient_deductible', 'coinsurance_amount'
+]
+
+# Ages are computed against a fixed reference year, as in the original dashboard
+AGE_REFERENCE_YEAR = 2022
+AGE_BINS = [0, 65, 75, 85, 100, 120]
+AGE_LABELS = ["<65", "65-74", "75-84", "85-99", "100+"]
+
+# In-memory layout of the merged claims frame the dashboard keeps for a whole
+# snapshot. Codes repeat heavily, so they are categoricals (int16/int32 codes
+# into one dictionary); small counts and flags use the narrowest integer that
+# holds them; amounts are float32 (round to the same cent up to $100k; sums
+# are upcast to float64 before aggregating). See README "Memory footprint" for sizes.
+DASHBOARD_DTYPES = {
+    "claim_id": "int64",
+    "bene_id": "category",
+    "claim_from": "datetime64[ms]",
+    "claim_thru": "datetime64[ms]",
+    "icd9_diagnosis_code": "category",
+    "hcpcs_code": "category",
+    "medicare_payment": "float32",
+    "patient_deductible": "float32",
+    "coinsurance_amount": "float32",
+    "birth_date": "datetime64[ms]",
+    "death_date": "datetime64[ms]",
+    "sex_code": "category",
+    "race_code": "Int8",
+    "esrd_ind": "category",
+    "state_code": "category",
+    "county_code": "Int16",
+    "hi_coverage_mos": "Int8",
+    "smi_coverage_mos": "Int8",
+    "hmo_coverage_mos": "Int8",
+    **{col: "int8" for col in CHRONIC_COLS},
+    "chronic_mask": "uint16",
+    "age": "UInt8",
+    "age_group": "category",
+}
+
+
+def age_group_birth_range(age_group):
+    """
+    Return the [start, end) birth-date range, as ISO strings, covered by an age group.
+
+    `pd.cut` bins are right-closed, so "65-74" means 65 < age <= 75, i.e. a birth
+    year in [REF - 75, REF - 65). Expressing the bucket as a date range keeps the
+    SQL portable and lets the database use an index on `birth_date`.
+    """
+    if age_group not in AGE_LABELS:
+        raise ValueError(f"Unknown age group: {age_group}")
+    i = AGE_LABELS.index(age_group)
+    lo, hi = AGE_BINS[i], AGE_BINS[i + 1]
+    return f"{AGE_REFERENCE_YEAR - hi}-01-01", f"{AGE_REFERENCE_YEAR - lo}-01-01"
+
+
+def add_age_columns(df):
+    """Add `age` and `age_group` columns computed from `birth_date`."""
+    df["age"] = AGE_REFERENCE_YEAR - pd.to_datetime(df["birth_date"], errors="coerce").dt.year
+    df["age_group"] = pd.cut(df["age"], bins=AGE_BINS, labels=AGE_LABELS)
+    return df
+
+
+def compact_frame(df):
+    """
+    Cast a merged claims frame to `DASHBOARD_DTYPES` in place, adding `age` and
+    `age_group` once. Columns not in the layout are left as they are.
+
+    A missing chronic flag becomes 0 (not flagged); other integers stay nullable.
+    """
+    for col, dtype in DASHBOARD_DTYPES.items():
+        if col not in df.columns or col in ("age", "age_group"):
+            continue
+        if dtype == "category":
+            # Sorted categories, so sorting/factorizing by code matches sorting by value
+            values = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype(dtype)
+            df[col] = values.cat.reorder_categories(values.cat.categories.sort_values())
+        elif df[col].dtype == dtype:
+            continue
+        elif dtype.startswith("datetime64"):
+            df[col] = pd.to_datetime(df[col], errors="coerce").astype(dtype)
+        elif col in CHRONIC_COLS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(dtype)
+        else:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+    age = AGE_REFERENCE_YEAR - df["birth_date"].dt.year
+    df["age"] = age.where(age.between(0, 255)).astype("UInt8")
+    df["age_group"] = pd.cut(df["age"], bins=AGE_BINS, labels=AGE_LABELS)
+    return df
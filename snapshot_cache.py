@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+snapshot_cache.py  [--full] [--dir data/snapshot]
+
+On-disk columnar snapshot of `claims JOIN beneficiary_info` for the dashboard.
+
+The snapshot is a Parquet dataset partitioned by `state_code`
+(data/snapshot/claims/state_code=<n>/part-*.parquet) plus a `watermark.json`
+recording the highest `claim_id` / `claim_thru` already pulled. A refresh only
+queries claims past that watermark, so the app can start from local files in
+seconds instead of re-scanning MySQL on every restart.
+
+Builds and refreshes are staged in a sibling directory (a refresh starts from
+hard links to the current files) and swapped in only after the watermark is
+saved, so a crash never leaves a partial snapshot behind.
+
+Beneficiary attributes are captured when a claim is pulled; run with --full to
+rebuild after bulk beneficiary updates.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from chronic_flags import MASK_COL, pack_flags
+from db_utils import param_marker
+from schema import CHRONIC_COLS, BENEFICIARY_COLUMNS, CLAIM_COLUMNS, DASHBOARD_DTYPES, compact_frame
+
+SNAPSHOT_DIR = Path(os.getenv("MEDOPTIX_SNAPSHOT_DIR", "data/snapshot"))
+READ_CHUNK = 200_000
+
+DATE_COLUMNS = ["claim_from", "claim_thru", "birth_date"]
+
+SNAPSHOT_SCHEMA = pa.schema(
+    [
+        ("claim_id", pa.int64()),
+        ("bene_id", pa.string()),
+        ("claim_from", pa.date32()),
+        ("claim_thru", pa.date32()),
+        ("icd9_diagnosis_code", pa.string()),
+        ("hcpcs_code", pa.string()),
+        ("medicare_payment", pa.float64()),
+        ("patient_deductible", pa.float64()),
+        ("coinsurance_amount", pa.float64()),
+        ("birth_date", pa.date32()),
+        ("death_date", pa.string()),
+        ("sex_code", pa.string()),
+        ("race_code", pa.int64()),
+        ("esrd_ind", pa.string()),
+        ("state_code", pa.int64()),
+        ("county_code", pa.int64()),
+        ("hi_coverage_mos", pa.int64()),
+        ("smi_coverage_mos", pa.int64()),
+        ("hmo_coverage_mos", pa.int64()),
+    ]
+    + [(col, pa.int64()) for col in CHRONIC_COLS]
+    + [(MASK_COL, pa.uint16())]
+)
+
+SNAPSHOT_QUERY = "SELECT {columns} FROM claims c JOIN beneficiary_info b ON c.bene_id = b.bene_id"
+
+
+def _claims_dir(snapshot_dir):
+    return Path(snapshot_dir) / "claims"
+
+
+def _watermark_path(snapshot_dir):
+    return Path(snapshot_dir) / "watermark.json"
+
+
+def read_watermark(snapshot_dir=SNAPSHOT_DIR):
+    """Return the stored watermark dict, or None if no snapshot has been built."""
+    path = _watermark_path(snapshot_dir)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def snapshot_exists(snapshot_dir=SNAPSHOT_DIR):
+    return read_watermark(snapshot_dir) is not None
+
+
+def snapshot_version(snapshot_dir=SNAPSHOT_DIR):
+    """Cheap token that changes on every refresh; use it as a cache key."""
+    watermark = read_watermark(snapshot_dir)
+    return watermark["refreshed_at"] if watermark else None
+
+
+def _select_columns():
+    columns = [f"c.{col}" for col in CLAIM_COLUMNS]
+    columns += [f"b.{col}" for col in BENEFICIARY_COLUMNS if col != "bene_id"]
+    return ", ".join(columns)
+
+
+def _to_arrow(chunk):
+    """Normalize driver-specific types (date objects, ISO strings, Decimals) to the snapshot schema."""
+    chunk = chunk.copy()
+    for col in DATE_COLUMNS:
+        chunk[col] = pd.to_datetime(chunk[col], errors="coerce").dt.date
+    for col in ["medicare_payment", "patient_deductible", "coinsurance_amount"]:
+        chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+    chunk[MASK_COL] = pack_flags(chunk)
+    for field in SNAPSHOT_SCHEMA:
+        if field.name == MASK_COL:
+            continue
+        if pa.types.is_integer(field.type):
+            chunk[field.name] = pd.to_numeric(chunk[field.name], errors="coerce").astype("Int64")
+        elif pa.types.is_string(field.type):
+            chunk[field.name] = chunk[field.name].astype("string")
+    return pa.Table.from_pandas(chunk[SNAPSHOT_SCHEMA.names], schema=SNAPSHOT_SCHEMA, preserve_index=False)
+
+
+def _write_chunks(chunks, snapshot_dir, watermark):
+    """Append each chunk to the partitioned dataset and advance the watermark."""
+    rows = 0
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        table = _to_arrow(chunk)
+        pq.write_to_dataset(
+            table,
+            root_path=str(_claims_dir(snapshot_dir)),
+            partition_cols=["state_code"],
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        )
+        rows += table.num_rows
+
+        max_id = int(pd.to_numeric(chunk["claim_id"]).max())
+        max_thru = pd.to_datetime(chunk["claim_thru"], errors="coerce").max()
+        watermark["claim_id"] = max(watermark.get("claim_id") or max_id, max_id)
+        if pd.notna(max_thru):
+            max_thru = max_thru.date().isoformat()
+            watermark["claim_thru"] = max(watermark.get("claim_thru") or max_thru, max_thru)
+    return rows
+
+
+def _save_watermark(snapshot_dir, watermark):
+    watermark["refreshed_at"] = datetime.now().isoformat()
+    path = _watermark_path(snapshot_dir)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(watermark, indent=2))
+    os.replace(tmp, path)
+
+
+def _staging_dir(snapshot_dir):
+    """A new empty sibling of `snapshot_dir`, on the same filesystem so it can be renamed over it."""
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.parent.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(prefix=f".{snapshot_dir.name}-", dir=snapshot_dir.parent))
+
+
+def _link_tree(src, dst):
+    """Mirror `src` into `dst` with hard links (copies where links aren't supported)."""
+    for path in Path(src).rglob("*"):
+        target = Path(dst) / path.relative_to(src)
+        if path.is_dir():
+            target.mkdir(parents=True, exist_ok=True)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copy2(path, target)
+
+
+def _swap_in(staging, snapshot_dir):
+    """Replace `snapshot_dir` with the finished `staging` directory."""
+    snapshot_dir = Path(snapshot_dir)
+    old = staging.with_name(f"{staging.name}-old")
+    # A directory can't be renamed over a non-empty one, so move the old snapshot aside first.
+    # Until the second rename the app sees no snapshot (and queries the database), never a partial one.
+    if snapshot_dir.exists():
+        os.replace(snapshot_dir, old)
+    os.replace(staging, snapshot_dir)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _drop_claims(path, claim_ids):
+    """Remove the rows of `claim_ids` from one Parquet file (a new file, so hard-linked copies keep theirs)."""
+    value_set = pa.array(claim_ids, pa.int64())
+    if not pc.any(pc.is_in(pq.read_table(path, columns=["claim_id"])["claim_id"], value_set=value_set)).as_py():
+        return
+    table = pq.read_table(path)
+    table = table.filter(pc.invert(pc.is_in(table["claim_id"], value_set=value_set)))
+    if table.num_rows == 0:
+        path.unlink()
+        return
+    tmp = path.with_name(f"_{path.name}")   # underscore-prefixed files are ignored by dataset readers
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def build_snapshot(conn, snapshot_dir=SNAPSHOT_DIR, chunksize=READ_CHUNK):
+    """Full rebuild: stream the whole join into a fresh snapshot."""
+    staging = _staging_dir(snapshot_dir)
+    try:
+        watermark = {"claim_id": None, "claim_thru": None}
+        query = SNAPSHOT_QUERY.format(columns=_select_columns())
+        rows = _write_chunks(pd.read_sql(query, conn, chunksize=chunksize), staging, watermark)
+        watermark["row_count"] = rows
+        _save_watermark(staging, watermark)
+        _swap_in(staging, snapshot_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return rows
+
+
+def refresh_snapshot(conn, snapshot_dir=SNAPSHOT_DIR, chunksize=READ_CHUNK):
+    """
+    Incremental refresh: pull only claims past the stored watermark.
+
+    Claims with a new `claim_id` are appended. Claims at or below the `claim_id`
+    watermark but with a later `claim_thru` are treated as updates: their old
+    rows are removed from every partition (the beneficiary may have moved
+    state), so each claim appears once.
+    """
+    watermark = read_watermark(snapshot_dir)
+    if watermark is None or watermark.get("claim_id") is None:
+        return build_snapshot(conn, snapshot_dir, chunksize)
+
+    mark = param_marker(conn)
+    query = SNAPSHOT_QUERY.format(columns=_select_columns())
+    params = [watermark["claim_id"]]
+    where = f"c.claim_id > {mark}"
+    if watermark.get("claim_thru"):
+        where += f" OR c.claim_thru > {mark}"
+        params.append(watermark["claim_thru"])
+    query += f" WHERE {where}"
+
+    previous_max_id = watermark["claim_id"]
+    updated_ids = set()
+
+    def chunks():
+        for chunk in pd.read_sql(query, conn, params=params, chunksize=chunksize):
+            ids = pd.to_numeric(chunk["claim_id"])
+            updated_ids.update(ids[ids <= previous_max_id].astype("int64").tolist())
+            yield chunk
+
+    staging = _staging_dir(snapshot_dir)
+    try:
+        _link_tree(_claims_dir(snapshot_dir), _claims_dir(staging))
+        previous_files = list(_claims_dir(staging).rglob("*.parquet"))
+        rows = _write_chunks(chunks(), staging, watermark)
+        if updated_ids:
+            claim_ids = sorted(updated_ids)
+            for path in previous_files:
+                _drop_claims(path, claim_ids)
+
+        watermark["row_count"] = ds.dataset(str(_claims_dir(staging)), format="parquet").count_rows()
+        _save_watermark(staging, watermark)
+        _swap_in(staging, snapshot_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return rows
+
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR, columns=None, state_code=None):
+    """Read the snapshot (memory-mapped) into a DataFrame, optionally for one state."""
+    filters = [("state_code", "=", int(state_code))] if state_code is not None else None
+    table = pq.read_table(
+        str(_claims_dir(snapshot_dir)),
+        columns=columns,
+        filters=filters,
+        memory_map=True,
+        partitioning=ds.partitioning(pa.schema([("state_code", pa.int64())]), flavor="hive"),
+    )
+    return table.to_pandas()
+
+
+def snapshot_dataset(snapshot_dir=SNAPSHOT_DIR):
+    """The snapshot as a lazily-read pyarrow dataset (`state_code` recovered from the partition paths)."""
+    return ds.dataset(
+        str(_claims_dir(snapshot_dir)),
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("state_code", pa.int64())]), flavor="hive"),
+    )
+
+
+def load_dashboard_frame(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Read the snapshot in the compact `DASHBOARD_DTYPES` layout. String codes are
+    read straight into dictionaries, so their values are never materialized
+    one Python/Arrow string per row.
+    """
+    categories = [col for col, dtype in DASHBOARD_DTYPES.items()
+                  if dtype == "category" and col in SNAPSHOT_SCHEMA.names and pa.types.is_string(SNAPSHOT_SCHEMA.field(col).type)]
+    table = pq.read_table(
+        str(_claims_dir(snapshot_dir)),
+        memory_map=True,
+        read_dictionary=categories,
+        partitioning=ds.partitioning(pa.schema([("state_code", pa.int64())]), flavor="hive"),
+    )
+    df = compact_frame(table.to_pandas(date_as_object=False, self_destruct=True))
+    # Hand the Arrow buffers freed during the conversion back to the OS
+    pa.default_memory_pool().release_unused()
+    return df
+
+
+def iter_snapshot_batches(snapshot_dir=SNAPSHOT_DIR, columns=None, batch_size=READ_CHUNK, filter=None):
+    """Stream the snapshot as DataFrames of at most `batch_size` rows, one batch in memory at a time."""
+    dataset = snapshot_dataset(snapshot_dir)
+    for batch in dataset.to_batches(columns=columns, filter=filter, batch_size=batch_size,
+                                    batch_readahead=1, fragment_readahead=1):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def main():
+    from config.db_config import connection
+
+    p = argparse.ArgumentParser(description="Build or incrementally refresh the dashboard snapshot.")
+    p.add_argument("--full", action="store_true", help="Rebuild the snapshot from scratch")
+    p.add_argument("--dir", default=str(SNAPSHOT_DIR), help=f"Snapshot directory (default: {SNAPSHOT_DIR})")
+    p.add_argument("--chunksize", type=int, default=READ_CHUNK, help=f"Rows per read (default: {READ_CHUNK})")
+    args = p.parse_args()
+
+    with connection() as conn:
+        if args.full:
+            rows = build_snapshot(conn, args.dir, args.chunksize)
+        else:
+            rows = refresh_snapshot(conn, args.dir, args.chunksize)
+    print(f"✅ Snapshot refreshed: {rows:,} new rows written to {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
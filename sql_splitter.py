@@ -0,0 +1,432 @@
+"""
+Streaming splitter for multi-row INSERT statements in SQL dumps.
+
+`InsertSplitter` is fed the dump as text blocks and rewrites every
+`INSERT ... VALUES (...), (...), ...;` into statements of at most
+`rows_per_insert` tuples; everything else passes through unchanged.
+Tuples are tokenized incrementally with quote/escape handling ('...', "...",
+`...`, backslash escapes and doubled quotes, comments), so literals
+containing `(`, `)` or `;` stay intact, and only the current block plus one
+output batch is ever held in memory.
+
+`split_file` runs the splitter over a file, optionally cutting the dump at
+statement boundaries and splitting the pieces on a process pool.
+"""
+
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+ROWS_PER_INSERT = 500
+BLOCK_SIZE = 1 << 20                # characters read per block
+PIECE_SIZE = 4 << 20                # characters per unit of work sent to a worker
+STATEMENT_LIMIT = 64 << 20          # statements longer than this are split in the main process
+
+# Quoted literals, written as "unrolled loops" so a failed match never backtracks exponentially
+_SQ = r"'[^'\\]*(?:(?:\\[\s\S]|'')[^'\\]*)*'"
+_DQ = r'"[^"\\]*(?:(?:\\[\s\S]|"")[^"\\]*)*"'
+_BQ = r"`[^`]*`"
+_COMMENT = r"--\s[^\n]*\n|#[^\n]*\n|/\*[\s\S]*?\*/"
+
+# Longest run of statement text that ends outside quotes and comments; stops at `;`,
+# at an unterminated literal/comment, or at the end of the buffer
+SCAN_RE = re.compile(
+    rf"[^;'\"`\-/#]*(?:(?:{_SQ}|{_DQ}|{_BQ}|{_COMMENT}|-(?!-\s)|/(?!\*))[^;'\"`\-/#]*)*"
+)
+LEAD_RE = re.compile(rf"(?:\s+|{_COMMENT})*")
+HEAD_RE = re.compile(r"INSERT\s[^;'\"]*?\bVALUES?\b", re.IGNORECASE)
+INSERT_RE = re.compile(r"INSERT\b", re.IGNORECASE)
+TUPLE_RE = re.compile(rf"\([^()'\"`]*(?:(?:{_SQ}|{_DQ}|{_BQ})[^()'\"`]*)*\)")
+SEP_RE = re.compile(r"\s*([,;]?)")
+ROW_RE = re.compile(rf"\s*({TUPLE_RE.pattern})\s*([,;]?)")
+WS_RE = re.compile(r"\s*")
+SPECIAL_RE = re.compile(r"[()'\"`]")
+QUOTED_RE = {"'": re.compile(_SQ), '"': re.compile(_DQ), "`": re.compile(_BQ)}
+HEAD_LIMIT = 64 << 10
+
+
+def _safe_end(buf, end, start=0):
+    """Back off trailing `-`/`/` that the next block could turn into a comment opener."""
+    if end == len(buf):
+        while end > start and buf[end - 1] in "-/":
+            end -= 1
+    return end
+
+
+def _open_comment(buf, pos):
+    """True if a comment (or what may become one) starts at `pos` but doesn't end in `buf`."""
+    tail = buf[pos:pos + 3]
+    return (tail in ("-", "/") or tail.startswith(("#", "/*"))
+            or (tail.startswith("--") and (len(tail) == 2 or tail[2].isspace())))
+
+
+def _scan_tuple(buf, pos, final):
+    """
+    End of the parenthesized tuple starting at `pos` (nested parentheses and
+    quoted literals allowed), or -1 if the buffer ends before it closes.
+    """
+    depth = 0
+    i = pos
+    while True:
+        m = SPECIAL_RE.search(buf, i)
+        if m is None:
+            return -1
+        ch = m.group()
+        if ch == "(":
+            depth += 1
+            i = m.end()
+        elif ch == ")":
+            depth -= 1
+            i = m.end()
+            if depth == 0:
+                return i
+        else:
+            q = QUOTED_RE[ch].match(buf, m.start())
+            # A literal closing at the very end of the buffer may continue with a doubled quote
+            if q is None or (q.end() == len(buf) and not final):
+                return -1
+            i = q.end()
+
+
+class InsertSplitter:
+    """
+    Incremental INSERT splitter. Call `feed(text)` with consecutive blocks and
+    `close()` at the end; both return the output text produced so far.
+
+    With `stop_after_statement`, processing stops after the first complete
+    statement: `done` becomes True and the unconsumed input is left in `rest`.
+    """
+
+    def __init__(self, rows_per_insert=ROWS_PER_INSERT, stop_after_statement=False):
+        if rows_per_insert < 1:
+            raise ValueError("rows_per_insert must be at least 1")
+        self.rows_per_insert = rows_per_insert
+        self.stop_after_statement = stop_after_statement
+        self.done = False
+        self.rest = ""
+        self.rows = 0
+        self.statements = 0
+        self._buf = ""
+        self._head = None           # INSERT ... VALUES of the statement being split
+        self._batch = []
+        self._passthrough = False   # inside a statement that is copied as-is
+
+    def feed(self, text):
+        if self.done:
+            self.rest += text
+            return ""
+        self._buf += text
+        return self._run(final=False)
+
+    def close(self):
+        if self.done:
+            return ""
+        out = self._run(final=True)
+        if self._batch:
+            # Dump ended inside an INSERT; keep the tuples we have
+            out += self._flush("\n")
+        return out
+
+    def _flush(self, end=""):
+        # The last batch ends at the original `;`, so the text after it passes through as-is
+        stmt = f"{self._head} {', '.join(self._batch)};{end}"
+        self.statements += 1
+        self._batch = []
+        return stmt
+
+    def _end_statement(self, pos):
+        if self.stop_after_statement:
+            self.done = True
+            self.rest = self._buf[pos:]
+            self._buf = ""
+            return True
+        return False
+
+    def _split_values(self, buf, pos, final, out):
+        """
+        Consume tuples of the current INSERT from `pos`. Returns the position
+        after the statement's `;`, or `-(pos + 1)` when more input is needed.
+        """
+        n = len(buf)
+        rows = self.rows_per_insert
+        batch = self._batch
+        row_match = ROW_RE.match
+        while True:
+            m = row_match(buf, pos)
+            if m is not None:
+                tuple_text, sep, nxt = m.group(1), m.group(2), m.end()
+            else:
+                # Nested parentheses, or a tuple cut off by the end of the block
+                start = WS_RE.match(buf, pos).end()
+                if start == n:
+                    return -(start + 1)
+                if buf[start] != "(":
+                    raise ValueError(f"Expected a tuple after `{self._head[:80]}`, got {buf[start:start + 40]!r}")
+                end = _scan_tuple(buf, start, final)
+                if end < 0:
+                    if not final:
+                        return -(start + 1)
+                    # Unterminated tuple: keep the text rather than drop it
+                    end = n
+                sm = SEP_RE.match(buf, end)
+                tuple_text, sep, nxt = buf[start:end].rstrip(), sm.group(1), sm.end()
+
+            if not sep and nxt == n and not final:
+                return -(pos + 1)   # separator not read yet
+            batch.append(tuple_text)
+            self.rows += 1
+            pos = nxt
+            if sep == ",":
+                if len(batch) >= rows:
+                    out.append(self._flush("\n"))
+                    batch = self._batch
+            elif sep == ";" or pos == n:
+                out.append(self._flush())
+                self._head = None
+                return pos
+            else:
+                raise ValueError(f"Unsupported clause after VALUES in `{self._head[:80]}`: {buf[pos:pos + 40]!r}")
+
+    def _run(self, final):
+        buf = self._buf
+        out = []
+        pos = 0
+        n = len(buf)
+
+        while pos < n and not self.done:
+            if self._head is not None:
+                pos = self._split_values(buf, pos, final, out)
+                if pos < 0:
+                    pos = -pos - 1
+                    break
+                if self._head is None and self._end_statement(pos):
+                    break
+
+            elif self._passthrough:
+                # --- copying a non-INSERT statement up to its `;` ---
+                end = SCAN_RE.match(buf, pos).end()
+                if end < n and buf[end] == ";":
+                    out.append(buf[pos:end + 1])
+                    pos = end + 1
+                    self._passthrough = False
+                    if self._end_statement(pos):
+                        break
+                    continue
+                end = n if final else _safe_end(buf, end, pos)
+                out.append(buf[pos:end])
+                pos = end
+                break
+
+            else:
+                # --- statement start: whitespace/comments, then INSERT or something else ---
+                lead = LEAD_RE.match(buf, pos).end()
+                if lead == n and not final:
+                    # Whitespace only so far, or a comment that may not be complete
+                    out.append(buf[pos:lead])
+                    pos = lead
+                    break
+                out.append(buf[pos:lead])
+                pos = lead
+                if pos == n or (not final and (n - pos < 7 or _open_comment(buf, pos))):
+                    break   # not enough text yet to tell what the statement is
+                if INSERT_RE.match(buf, pos):
+                    head = HEAD_RE.match(buf, pos)
+                    if head is not None and head.end() == n and not final:
+                        break   # `VALUE` may be the start of `VALUES`
+                    if head is not None:
+                        self._head = " ".join(head.group().split())
+                        pos = LEAD_RE.match(buf, head.end()).end()
+                        continue
+                    tail = buf[pos:pos + HEAD_LIMIT]
+                    if not final and len(tail) < HEAD_LIMIT and not any(c in tail for c in ";'\""):
+                        break   # VALUES keyword may still arrive
+                self._passthrough = True
+
+        self._buf = buf[pos:] if pos < n else ""
+        if self.done:
+            self._buf = ""
+        elif final:
+            if self._buf:
+                out.append(self._buf)
+            self._buf = ""
+        return "".join(out)
+
+
+def split_text(text, rows_per_insert=ROWS_PER_INSERT):
+    """Split every INSERT in a self-contained piece of SQL; used by pool workers."""
+    splitter = InsertSplitter(rows_per_insert)
+    return splitter.feed(text) + splitter.close()
+
+
+class StatementCutter:
+    """
+    Cuts a stream of SQL text into pieces of about `piece_size` characters
+    that end on statement boundaries (a `;` outside quotes and comments).
+    """
+
+    def __init__(self, piece_size=PIECE_SIZE):
+        self.piece_size = piece_size
+        self._buf = ""
+        self._scan = 0        # position known to be outside literals/comments
+        self._boundary = 0    # end of the last complete statement in _buf
+
+    @property
+    def pending(self):
+        """Characters of the statement currently being read."""
+        return len(self._buf) - self._boundary
+
+    def feed(self, text):
+        self._buf += text
+        pieces = []
+        buf = self._buf
+        while True:
+            end = SCAN_RE.match(buf, self._scan).end()
+            if end < len(buf) and buf[end] == ";":
+                self._boundary = self._scan = end + 1
+                if self._boundary >= self.piece_size:
+                    pieces.append(buf[:self._boundary])
+                    buf = buf[self._boundary:]
+                    self._boundary = self._scan = 0
+                continue
+            self._scan = _safe_end(buf, end, self._scan)
+            break
+        self._buf = buf
+        return pieces
+
+    def release(self):
+        """Return `(complete_statements, partial_statement)` and reset."""
+        buf, boundary = self._buf, self._boundary
+        self._buf, self._scan, self._boundary = "", 0, 0
+        return buf[:boundary], buf[boundary:]
+
+    def close(self):
+        complete, partial = self.release()
+        return complete + partial
+
+
+def iter_blocks(path, block_size=BLOCK_SIZE):
+    """Decode a file as UTF-8 in blocks, dropping undecodable bytes like the original splitter."""
+    with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def split_stream(blocks, write, rows_per_insert=ROWS_PER_INSERT, workers=1,
+                 piece_size=PIECE_SIZE, statement_limit=STATEMENT_LIMIT):
+    """
+    Split INSERTs in an iterable of text blocks, passing output to `write`.
+
+    With `workers > 1` the text is cut into statement-aligned pieces that are
+    split on a process pool; output order is preserved and at most
+    `2 * workers` pieces are in flight. A statement longer than
+    `statement_limit` is split in the main process while it streams in, so it
+    is never held in memory whole.
+    """
+    blocks = iter(blocks)
+    if workers <= 1:
+        splitter = InsertSplitter(rows_per_insert)
+        for block in blocks:
+            write(splitter.feed(block))
+        write(splitter.close())
+        return
+
+    cutter = StatementCutter(piece_size)
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        def submit(piece):
+            if len(in_flight) >= 2 * workers:
+                write(in_flight.popleft().result())
+            in_flight.append(pool.submit(split_text, piece, rows_per_insert))
+
+        def drain():
+            while in_flight:
+                write(in_flight.popleft().result())
+
+        for block in blocks:
+            for piece in cutter.feed(block):
+                submit(piece)
+            while cutter.pending > statement_limit:
+                complete, partial = cutter.release()
+                if complete:
+                    submit(complete)
+                drain()
+                splitter = InsertSplitter(rows_per_insert, stop_after_statement=True)
+                write(splitter.feed(partial))
+                while not splitter.done:
+                    block = next(blocks, None)
+                    if block is None:
+                        write(splitter.close())
+                        break
+                    write(splitter.feed(block))
+                for piece in cutter.feed(splitter.rest):
+                    submit(piece)
+
+        rest = cutter.close()
+        if rest:
+            submit(rest)
+        drain()
+
+
+def split_file(in_path, out_path, rows_per_insert=ROWS_PER_INSERT, workers=1,
+               block_size=BLOCK_SIZE, piece_size=PIECE_SIZE):
+    """Split `in_path` into `out_path`. Returns the number of bytes read."""
+    with open(out_path, "w", encoding="utf-8", newline="") as fout:
+        split_stream(iter_blocks(in_path, block_size), fout.write, rows_per_insert, workers, piece_size)
+    return os.path.getsize(in_path)
+
+
+# 📈 Benchmark
+def write_synthetic_dump(path, size_mb, rows_per_statement=50_000):
+    """
+    Write a mysqldump-style claims dump of roughly `size_mb` MB, with string
+    literals that contain parentheses, semicolons and escaped quotes.
+    Returns the number of tuples written.
+    """
+    notes = ["plain", "f/u (post-op); recheck", "pt\\'s \\\"own\\\" pharmacy", "it''s; fine)", "a,b,(c)"]
+    target = size_mb * (1 << 20)
+    rows = written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("-- MySQL dump (synthetic)\n/*!40101 SET NAMES utf8mb4 */;\n")
+        f.write("CREATE TABLE `claims` (`claim_id` BIGINT PRIMARY KEY, `bene_id` VARCHAR(50), "
+                "`icd9_diagnosis_code` VARCHAR(10), `medicare_payment` DOUBLE, `note` TEXT) COMMENT='x;(y)';\n")
+        while written < target:
+            values = ",".join(
+                f"({rows + i},'{(rows + i) * 7919 % 100003:016X}','{4000 + i % 997}',"
+                f"{(i * 37 % 50000) / 100:.2f},'{notes[i % len(notes)]}')"
+                for i in range(rows_per_statement)
+            )
+            stmt = f"INSERT INTO `claims` VALUES {values};\n"
+            f.write(stmt)
+            rows += rows_per_statement
+            written += len(stmt)
+    return rows
+
+
+def benchmark(size_mb=256, rows_per_insert=ROWS_PER_INSERT, workers=(1, os.cpu_count() or 1), tmp_dir="."):
+    """Split a synthetic dump with each worker count and report throughput in MB/s."""
+    src = os.path.join(tmp_dir, "_split_bench_input.sql")
+    dst = os.path.join(tmp_dir, "_split_bench_output.sql")
+    results = []
+    try:
+        rows = write_synthetic_dump(src, size_mb)
+        mb = os.path.getsize(src) / (1 << 20)
+        for n in dict.fromkeys(workers):
+            start = time.perf_counter()
+            split_file(src, dst, rows_per_insert, workers=n)
+            seconds = time.perf_counter() - start
+            with open(dst, encoding="utf-8") as f:
+                statements = sum(1 for line in f if line.startswith("INSERT"))
+            expected = sum(-(-min(50_000, rows - i) // rows_per_insert) for i in range(0, rows, 50_000))
+            results.append({"workers": n, "mb": round(mb, 1), "seconds": round(seconds, 2),
+                            "mb_per_s": round(mb / seconds, 1), "ok": statements == expected})
+    finally:
+        for path in (src, dst):
+            if os.path.exists(path):
+                os.remove(path)
+    return results
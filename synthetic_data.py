@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+synthetic_data.py  SIZE  [--out data/synthetic_SIZE.csv] [--seed 42]
+
+Generate a DE-SynPUF-shaped claims CSV with exactly the columns
+`clean_claims_data.py` reads (`SOURCE_DTYPES`), so ingestion, the dashboard,
+training and batch scoring can be exercised without the real
+`data/medicare_claims.csv`. SIZE is a row count or one of 100k / 1m / 10m /
+100m.
+
+Rows are grouped by beneficiary as in the real files, with a geometric number
+of claims each. ICD9 and HCPCS codes are drawn from fixed pools with Zipf
+weights, so a few codes dominate and there is a long tail; payments depend on
+the codes, age and chronic conditions, so the cost model has signal to learn.
+Output is produced chunk by chunk with a per-chunk seed, so memory stays
+bounded and a given (size, seed) always yields the same file.
+"""
+
+import argparse
+import gzip
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from clean_claims_data import CHRONIC_SOURCE_COLUMNS, SOURCE_DTYPES
+
+SIZES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000, "100m": 100_000_000}
+CHUNK_ROWS = 500_000
+CLAIMS_PER_BENE = 8
+SEED = 42
+
+ICD9_POOL = 12_000
+HCPCS_POOL = 6_000
+ZIPF_EXPONENT = 1.1
+HCPCS_MISSING = 0.02
+
+# Share of beneficiaries with each condition (DE-SynPUF codes 1 = yes, 2 = no)
+CHRONIC_PREVALENCE = {
+    'SP_ALZHDMTA': 0.20, 'SP_CHF': 0.29, 'SP_CHRNKIDN': 0.16, 'SP_CNCR': 0.06, 'SP_COPD': 0.14,
+    'SP_DEPRESSN': 0.21, 'SP_DIABETES': 0.38, 'SP_ISCHMCHT': 0.43, 'SP_OSTEOPRS': 0.17,
+    'SP_RA_OA': 0.15, 'SP_STRKETIA': 0.04,
+}
+STATE_CODES = np.array([c for c in range(1, 55) if c not in (40, 48)])
+
+
+def parse_size(size):
+    """Row count from `100k`-style labels or a plain integer."""
+    size = str(size).lower().replace("_", "")
+    if size in SIZES:
+        return SIZES[size]
+    return int(size)
+
+
+def _zipf_weights(n, exponent=ZIPF_EXPONENT):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+class CodePools:
+    """Code vocabularies, their Zipf weights and per-code cost effects, fixed by the seed."""
+
+    def __init__(self, seed=SEED):
+        rng = np.random.default_rng([seed, 0])
+        numeric = rng.choice(np.arange(1000, 100_000), ICD9_POOL - ICD9_POOL // 10, replace=False)
+        v_codes = rng.choice(np.arange(100, 10_000), ICD9_POOL // 10, replace=False)
+        self.icd9 = np.concatenate([numeric.astype(str), np.char.add("V", v_codes.astype(str))])
+        rng.shuffle(self.icd9)
+
+        cpt = rng.choice(np.arange(10_000, 100_000), HCPCS_POOL - HCPCS_POOL // 5, replace=False).astype(str)
+        level2 = np.char.add(rng.choice(list("ABEGJKLQ"), HCPCS_POOL // 5),
+                             np.char.zfill(rng.integers(0, 10_000, HCPCS_POOL // 5).astype(str), 4))
+        self.hcpcs = np.concatenate([cpt, level2])
+        rng.shuffle(self.hcpcs)
+
+        self.icd9_p = _zipf_weights(ICD9_POOL)
+        self.hcpcs_p = _zipf_weights(HCPCS_POOL)
+        self.icd9_effect = rng.normal(0, 0.3, ICD9_POOL)
+        self.hcpcs_effect = rng.normal(0, 0.9, HCPCS_POOL)
+
+
+def _dates(rng, n, start_year, end_year):
+    """YYYYMMDD integers, as in the DE-SynPUF files."""
+    return (rng.integers(start_year, end_year + 1, n) * 10_000
+            + rng.integers(1, 13, n) * 100
+            + rng.integers(1, 29, n))
+
+
+def _yyyymmdd(dates):
+    # Arithmetic on the components; strftime is ~40x slower
+    return dates.year * 10_000 + dates.month * 100 + dates.day
+
+
+def _bene_ids(index):
+    """16-hex-digit DESYNPUF_IDs, scrambled but unique per beneficiary index."""
+    # hash_array is a bijection on uint64 that maps 0 to 0, so start from 1
+    hashed = pd.util.hash_array(np.asarray(index, dtype=np.uint64) + 1)
+    return pd.Series(hashed).map("{:016X}".format).to_numpy()
+
+
+def _beneficiaries(rng, first, n):
+    birth = _dates(rng, n, 1909, 1983)
+    dead = rng.random(n) < 0.015
+    bene = {
+        'DESYNPUF_ID': _bene_ids(np.arange(first, first + n)),
+        'BENE_BIRTH_DT': birth,
+        'BENE_DEATH_DT': pd.array(np.where(dead, _dates(rng, n, 2008, 2010), 0), dtype="Int64"),
+        'BENE_SEX_IDENT_CD': rng.choice([1, 2], n, p=[0.45, 0.55]),
+        'BENE_RACE_CD': rng.choice([1, 2, 3, 5], n, p=[0.83, 0.10, 0.03, 0.04]),
+        'BENE_ESRD_IND': np.where(rng.random(n) < 0.07, "Y", "0"),
+        'SP_STATE_CODE': rng.choice(STATE_CODES, n, p=_zipf_weights(len(STATE_CODES), 0.8)),
+        'BENE_COUNTY_CD': rng.integers(0, 1000, n),
+        'BENE_HI_CVRAGE_TOT_MONS': np.where(rng.random(n) < 0.9, 12, rng.integers(0, 12, n)),
+        'BENE_SMI_CVRAGE_TOT_MONS': np.where(rng.random(n) < 0.85, 12, rng.integers(0, 12, n)),
+        'BENE_HMO_CVRAGE_TOT_MONS': np.where(rng.random(n) < 0.7, 0, rng.integers(1, 13, n)),
+    }
+    bene['BENE_DEATH_DT'][~dead] = pd.NA
+    for col in CHRONIC_SOURCE_COLUMNS:
+        bene[col] = np.where(rng.random(n) < CHRONIC_PREVALENCE[col], 1, 2)
+    return pd.DataFrame(bene)
+
+
+def _claims_per_bene(rng, n_rows, claims_per_bene):
+    """Geometric claim counts covering at least `n_rows` rows, the last one trimmed to fit."""
+    counts = rng.geometric(1 / claims_per_bene, math.ceil(n_rows / claims_per_bene * 1.2) + 1)
+    while counts.sum() < n_rows:
+        counts = np.concatenate([counts, rng.geometric(1 / claims_per_bene, len(counts))])
+    ends = np.cumsum(counts)
+    last = int(np.searchsorted(ends, n_rows))
+    counts = counts[:last + 1]
+    counts[-1] -= ends[last] - n_rows
+    return counts
+
+
+def _chunk(rng, pools, first_bene, first_claim, n_rows, claims_per_bene):
+    counts = _claims_per_bene(rng, n_rows, claims_per_bene)
+    bene = _beneficiaries(rng, first_bene, len(counts))
+    df = bene.iloc[np.repeat(np.arange(len(counts)), counts)].reset_index(drop=True)
+
+    icd9 = rng.choice(ICD9_POOL, n_rows, p=pools.icd9_p)
+    hcpcs = rng.choice(HCPCS_POOL, n_rows, p=pools.hcpcs_p)
+    claim_from = pd.to_datetime(_dates(rng, n_rows, 2008, 2010).astype(str), format="%Y%m%d")
+    claim_thru = claim_from + pd.to_timedelta(rng.geometric(0.6, n_rows) - 1, unit="D")
+
+    age = 2010 - df['BENE_BIRTH_DT'].to_numpy() // 10_000
+    n_chronic = (df[CHRONIC_SOURCE_COLUMNS].to_numpy() == 1).sum(axis=1)
+    log_mean = 3.8 + pools.hcpcs_effect[hcpcs] + pools.icd9_effect[icd9] + 0.004 * (age - 70) + 0.06 * n_chronic
+    payment = np.round(np.exp(log_mean + rng.normal(0, 0.6, n_rows)), -1)
+    deductible = np.where(rng.random(n_rows) < 0.12, np.minimum(payment, rng.choice([50, 100, 135], n_rows)), 0.0)
+
+    hcpcs_codes = pools.hcpcs[hcpcs].astype(object)
+    hcpcs_codes[rng.random(n_rows) < HCPCS_MISSING] = None
+
+    df['CLM_ID'] = first_claim + np.arange(n_rows)
+    df['CLM_FROM_DT'] = _yyyymmdd(claim_from)
+    df['CLM_THRU_DT'] = _yyyymmdd(claim_thru)
+    df['ICD9_DGNS_CD_1'] = pools.icd9[icd9]
+    df['HCPCS_CD_1'] = hcpcs_codes
+    df['LINE_NCH_PMT_AMT_1'] = payment
+    df['LINE_BENE_PTB_DDCTBL_AMT_1'] = deductible
+    df['LINE_COINSRNC_AMT_1'] = np.round(payment * rng.uniform(0.15, 0.25, n_rows), -1)
+    return df[list(SOURCE_DTYPES)], len(counts)
+
+
+def iter_synthetic_chunks(n_rows, seed=SEED, chunk_rows=CHUNK_ROWS, claims_per_bene=CLAIMS_PER_BENE):
+    """Yield DataFrames of at most `chunk_rows` claims with the `SOURCE_DTYPES` columns."""
+    pools = CodePools(seed)
+    first_bene, done = 0, 0
+    for i in range(math.ceil(n_rows / chunk_rows)):
+        rng = np.random.default_rng([seed, i + 1])
+        n = min(chunk_rows, n_rows - done)
+        df, n_bene = _chunk(rng, pools, first_bene, 100_000_000_000 + done, n, claims_per_bene)
+        first_bene += n_bene
+        done += n
+        yield df
+
+
+def write_synthetic_csv(path, n_rows, seed=SEED, chunk_rows=CHUNK_ROWS, claims_per_bene=CLAIMS_PER_BENE):
+    """Write `n_rows` synthetic claims to `path` (gzipped if it ends in .gz). Returns the row count."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    rows = 0
+    with opener(path, "wt", newline="") as f:
+        for df in iter_synthetic_chunks(n_rows, seed, chunk_rows, claims_per_bene):
+            df.to_csv(f, header=(rows == 0), index=False)
+            rows += len(df)
+    return rows
+
+
+def main():
+    p = argparse.ArgumentParser(description="Generate a synthetic DE-SynPUF-shaped claims CSV.")
+    p.add_argument("size", help=f"Row count or one of {', '.join(SIZES)}")
+    p.add_argument("--out", help="Output CSV, .gz to compress (default: data/synthetic_<size>.csv)")
+    p.add_argument("--seed", type=int, default=SEED, help=f"Random seed (default: {SEED})")
+    p.add_argument("--claims-per-bene", type=float, default=CLAIMS_PER_BENE,
+                   help=f"Mean claims per beneficiary (default: {CLAIMS_PER_BENE})")
+    args = p.parse_args()
+
+    n_rows = parse_size(args.size)
+    out = args.out or f"data/synthetic_{args.size.lower()}.csv"
+    start = time.perf_counter()
+    rows = write_synthetic_csv(out, n_rows, args.seed, claims_per_bene=args.claims_per_bene)
+    print(f"✅ Wrote {rows:,} synthetic claims to {out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
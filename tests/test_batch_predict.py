@@ -0,0 +1,68 @@
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from xgboost import XGBRegressor
+
+from batch_predict import PREDICTION_COL, score_csv, score_frame
+from code_encoder import CodeEncoder, fit_label_encoder
+from schema import CHRONIC_COLS
+
+ICD9 = ["4019", "25000", "V5869", "nan"]
+HCPCS = ["99213", "99214", "G0008", "nan"]
+
+
+@pytest.fixture(scope="module")
+def assets():
+    rng = np.random.default_rng(0)
+    n = 2000
+    X = pd.DataFrame({
+        "age": rng.integers(65, 95, n),
+        "icd9_diagnosis_code": rng.integers(-1, len(ICD9), n),
+        "hcpcs_code": rng.integers(-1, len(HCPCS), n),
+        **{col: rng.integers(0, 2, n) for col in CHRONIC_COLS},
+    })
+    y = 50 + X["age"] + 100 * X["SP_CHF"] + 10 * X["hcpcs_code"] + 5 * X["icd9_diagnosis_code"]
+    model = XGBRegressor(n_estimators=20, max_depth=3).fit(X, y)
+    return model, CodeEncoder(fit_label_encoder(ICD9)), CodeEncoder(fit_label_encoder(HCPCS))
+
+
+def upload_csv(n=1000):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        "age": rng.integers(65, 95, n),
+        "icd9_diagnosis_code": rng.choice(["4019", "25000", "99999", ""], n),
+        "hcpcs_code": rng.choice(["99213", "99214", "G0008", ""], n),
+        **{col: rng.integers(0, 2, n) for col in CHRONIC_COLS[:5]},
+    })
+    # Some chunks see only numeric-looking codes, so read_csv infers a different dtype per chunk
+    df.loc[:399, "icd9_diagnosis_code"] = rng.choice(["4019", "25000"], 400)
+    df.loc[400:, "icd9_diagnosis_code"] = df.loc[400:, "icd9_diagnosis_code"].replace("4019", "V5869")
+    df.loc[:299, "hcpcs_code"] = rng.choice(["99213", "99214", ""], 300)
+    # Blank flag cells in some rows, a flag column left out entirely
+    df.loc[rng.choice(n, 100, replace=False), "SP_CHF"] = np.nan
+    return df.to_csv(index=False).encode()
+
+
+@pytest.mark.parametrize("chunksize", [7, 128, 999, 5000])
+@pytest.mark.parametrize("suffix", [".csv", ".csv.gz"])
+def test_chunked_scoring_matches_the_whole_frame(assets, tmp_path, chunksize, suffix):
+    data = upload_csv()
+    whole = score_frame(pd.read_csv(io.BytesIO(data)), *assets)
+
+    out = tmp_path / f"scored{suffix}"
+    seen = []
+    rows, preview = score_csv(io.BytesIO(data), out, *assets, chunksize=chunksize,
+                              progress=lambda done, fraction: seen.append((done, fraction)))
+    assert rows == len(whole)
+    assert [done for done, _ in seen][-1] == rows and seen[-1][1] == 1.0
+
+    raw = gzip.decompress(out.read_bytes()) if suffix == ".csv.gz" else out.read_bytes()
+    scored = pd.read_csv(io.BytesIO(raw))
+    assert list(scored.columns) == list(whole.columns)
+    # Same rows, same order, same codes and predictions
+    pd.testing.assert_frame_equal(scored, whole, check_dtype=False, atol=1e-4)
+    pd.testing.assert_frame_equal(preview, whole.head(len(preview)), check_dtype=False)
+    assert whole[PREDICTION_COL].nunique() > 10
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bene_index import BeneficiaryIndex
+from chronic_flags import MASK_COL, pack_flags
+from dashboard_queries import ALL, filter_frame
+from schema import CHRONIC_COLS, add_age_columns
+
+# Ids that are prefixes of one another, and one past the "b0" range
+IDS = ["b01", "b010", "b0100", "b011", "b02", "b1"] + [f"b{i:03d}" for i in range(20, 260)]
+
+
+@pytest.fixture(scope="module", params=["mask", "flags"])
+def frame(request):
+    rng = np.random.default_rng(7)
+    benes = pd.DataFrame({
+        "bene_id": IDS,
+        "state_code": rng.choice([1, 5, 10], len(IDS)),
+        "birth_date": [f"{year}-06-15" for year in rng.integers(1915, 1961, len(IDS))],
+        **{col: rng.integers(1, 3, len(IDS)) for col in CHRONIC_COLS},
+    })
+    n = 3000
+    claims = pd.DataFrame({"claim_id": rng.permutation(n), "bene_id": rng.choice(IDS, n)})
+    df = add_age_columns(claims.merge(benes, on="bene_id", how="left"))
+    if request.param == "mask":
+        df[MASK_COL] = pack_flags(df)
+        df = df.drop(columns=CHRONIC_COLS)
+    return df
+
+
+def matching(df, prefix, selection=(ALL, ALL, ALL)):
+    ids = filter_frame(df, *selection)["bene_id"].unique()
+    return sorted(b for b in ids if b.startswith(prefix))
+
+
+@pytest.mark.parametrize("prefix", ["", "b", "b0", "b01", "b010", "b0100", "b01000", "b02", "b1", "b2", "c"])
+def test_prefix_search_pages_through_every_match(frame, prefix):
+    index = BeneficiaryIndex(frame)
+    expected = matching(frame, prefix)
+    assert index.count(index.ids, prefix) == len(expected)
+
+    page_size = 7
+    pages, page = [], 0
+    while True:
+        ids, total = index.search(index.ids, prefix, page, page_size)
+        assert total == len(expected)
+        if not ids:
+            break
+        assert len(ids) <= page_size
+        pages.append(ids)
+        page += 1
+    # Every page but the last is full, and together they are the matches in order without repeats
+    assert all(len(ids) == page_size for ids in pages[:-1])
+    assert sum(pages, []) == expected
+    assert len(pages) == -(-len(expected) // page_size)
+
+
+@pytest.mark.parametrize("selection", [(5, ALL, ALL), (ALL, "75-84", ALL), (ALL, ALL, "SP_CHF"), (1, ALL, "SP_COPD")])
+def test_selection_search_and_pages(frame, selection):
+    index = BeneficiaryIndex(frame)
+    ids = index.select(*selection)
+    assert list(ids) == matching(frame, "", selection)
+    assert index.select(*selection) is ids
+    for prefix in ["b0", "b01", "b2"]:
+        expected = matching(frame, prefix, selection)
+        got = [index.search(ids, prefix, page, 5)[0] for page in range(len(expected) // 5 + 2)]
+        assert sum(got, []) == expected
+
+
+def test_claims_of_a_beneficiary(frame):
+    index = BeneficiaryIndex(frame)
+    for bene_id in ["b01", "b010", "b1", IDS[-1]]:
+        expected = frame[frame["bene_id"] == bene_id]
+        pd.testing.assert_frame_equal(index.claims(bene_id), expected)
+    assert index.claims("b0").empty and index.claims("zzz").empty
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from chronic_flags import condition_count, has_condition, pack_flags, rollup, unpack_flags
+from schema import CHRONIC_COLS
+
+
+@pytest.fixture
+def claims():
+    # DE-SynPUF codes flags 1 = yes, 2 = no; NaN flags and costs show up too
+    rng = np.random.default_rng(4)
+    n = 5000
+    flags = rng.choice([1.0, 2.0, 0.0, np.nan], size=(n, len(CHRONIC_COLS)), p=[0.35, 0.55, 0.05, 0.05])
+    df = pd.DataFrame(flags, columns=CHRONIC_COLS)
+    df["total_cost"] = rng.gamma(2.0, 300.0, n).round(2)
+    df.loc[rng.choice(n, 50, replace=False), "total_cost"] = np.nan
+    return df
+
+
+def test_pack_and_unpack_round_trip(claims):
+    mask = pack_flags(claims)
+    assert mask.dtype == np.uint16
+    expected = (claims[CHRONIC_COLS] == 1).astype(np.int8)
+    pd.testing.assert_frame_equal(unpack_flags(mask), expected)
+    for col in CHRONIC_COLS:
+        np.testing.assert_array_equal(has_condition(mask, col), claims[col] == 1)
+    np.testing.assert_array_equal(condition_count(mask), expected.sum(axis=1))
+
+
+def test_rollup_matches_the_per_flag_loop(claims):
+    by_condition, by_count = rollup(pack_flags(claims), claims["total_cost"])
+
+    # What analyze_chronic_costs computed with one pass per SP_* column
+    for col in CHRONIC_COLS:
+        assert by_condition[col] == pytest.approx(claims.loc[claims[col] == 1, "total_cost"].sum())
+
+    counts = (claims[CHRONIC_COLS] == 1).sum(axis=1)
+    for n in range(len(CHRONIC_COLS) + 1):
+        assert by_count.loc[n, "total"] == pytest.approx(claims.loc[counts == n, "total_cost"].sum())
+        assert by_count.loc[n, "rows"] == (counts == n).sum()
+    high_risk = claims[counts >= 3]
+    assert by_count.loc[3:, "total"].sum() / by_count.loc[3:, "rows"].sum() == pytest.approx(
+        high_risk["total_cost"].sum() / len(high_risk))
+
+
+def test_rollup_of_grouped_input_matches_row_level(claims):
+    mask = pack_flags(claims)
+    grouped = claims.assign(mask=mask).groupby("mask")["total_cost"].agg(["sum", "size"])
+    by_condition, by_count = rollup(grouped.index, grouped["sum"], rows=grouped["size"])
+    expected_condition, expected_count = rollup(mask, claims["total_cost"])
+    pd.testing.assert_series_equal(by_condition, expected_condition)
+    pd.testing.assert_frame_equal(by_count, expected_count)
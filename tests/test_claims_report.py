@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bene_summary
+from analysis.claims_report import run
+from schema import CHRONIC_COLS
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    rng = np.random.default_rng(9)
+    n_bene, n_claims = 400, 6000
+    benes = pd.DataFrame({
+        "bene_id": [f"b{i:04d}" for i in range(n_bene)],
+        "state_code": rng.choice([1, 5, 10], n_bene),
+        "birth_date": "1940-01-01",
+        **{col: rng.choice([1, 2], n_bene, p=[0.4, 0.6]) for col in CHRONIC_COLS},
+    })
+    claims = pd.DataFrame({
+        "claim_id": np.arange(1, n_claims + 1),
+        # The last 50 beneficiaries have no claims
+        "bene_id": rng.choice(benes["bene_id"][:-50], n_claims),
+        "icd9_diagnosis_code": rng.choice(np.array([f"{c}" for c in range(4000, 4040)] + [None], dtype=object), n_claims),
+        "medicare_payment": rng.uniform(0, 2000, n_claims).round(2),
+        "patient_deductible": rng.uniform(0, 200, n_claims).round(2),
+        "coinsurance_amount": rng.uniform(0, 50, n_claims).round(2),
+    })
+    claims.loc[::97, "medicare_payment"] = np.nan
+    claims.loc[::89, "coinsurance_amount"] = np.nan
+    path = tmp_path_factory.mktemp("report") / "claims.db"
+    with sqlite3.connect(path) as conn:
+        benes.to_sql("beneficiary_info", conn, index=False)
+        claims.to_sql("claims", conn, index=False)
+        bene_summary.rebuild(conn)
+    return path
+
+
+def report(db_path, capsys, mode, **kwargs):
+    with sqlite3.connect(db_path) as conn:
+        aggregates = run(conn, mode, **kwargs)
+    return capsys.readouterr().out, aggregates
+
+
+@pytest.mark.parametrize("chunk_size", [1000, 777, 10_000])
+def test_stream_and_sql_print_the_same_reports(db_path, capsys, chunk_size):
+    sql_out, sql = report(db_path, capsys, "sql")
+    stream_out, stream = report(db_path, capsys, "stream", chunk_size=chunk_size)
+    assert stream_out == sql_out
+    assert "Top 10" in sql_out and "High-Risk" in sql_out
+
+    assert stream.rows == sql.rows == 6000
+    pd.testing.assert_frame_equal(stream.diag.sort_index(), sql.diag.sort_index(), check_index_type=False)
+    for col in ["medicare_sum", "medicare_n", "patient_sum", "patient_n"]:
+        assert getattr(stream, col) == pytest.approx(getattr(sql, col))
+    for col in ["mask_cost", "mask_patients", "mask_claims"]:
+        np.testing.assert_allclose(getattr(stream, col), getattr(sql, col))
+    assert sql.mask_patients.sum() == 350
+
+
+@pytest.mark.parametrize("reports", [["costs"], ["chronic"]])
+def test_single_report(db_path, capsys, reports):
+    sql_out, _ = report(db_path, capsys, "sql", reports=reports, top_n=5, high_risk=4)
+    stream_out, _ = report(db_path, capsys, "stream", reports=reports, top_n=5, high_risk=4)
+    assert stream_out == sql_out
+    assert ("Top 5" in sql_out) == (reports == ["costs"])
+    assert ("4+ chronic conditions" in sql_out) == (reports == ["chronic"])
+
+
+@pytest.mark.parametrize("script, heading", [("analyze_claims.py", "Top 10"), ("chronic_analysis.py", "High-Risk")])
+def test_report_scripts_run_by_path(db_path, tmp_path, script, heading):
+    # From another directory, as `python analysis/<script>` with nothing on PYTHONPATH
+    result = subprocess.run([sys.executable, str(ROOT / "analysis" / script), "--sqlite", str(db_path)],
+                            cwd=tmp_path, capture_output=True, text=True,
+                            env={k: v for k, v in os.environ.items() if k != "PYTHONPATH"})
+    assert result.returncode == 0, result.stderr
+    assert heading in result.stdout
@@ -0,0 +1,152 @@
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from clean_claims_data import (CHRONIC_SOURCE_COLUMNS, SOURCE_DTYPES, clean_beneficiaries, clean_claims,
+                               ensure_unique_keys, insert_to_mysql, iter_clean_chunks, load_infile_to_mysql)
+
+UNESCAPES = {"\\\\": "\\", "\\t": "\t", "\\n": "\n", "\\r": "\r", "\\0": "\0"}
+
+
+def source_chunk():
+    rows = [
+        # One beneficiary alive, one dead; the second claim has no dates or HCPCS code
+        {"DESYNPUF_ID": "B1", "BENE_BIRTH_DT": "19300101", "BENE_DEATH_DT": None, "CLM_ID": 1,
+         "CLM_FROM_DT": "20090105", "CLM_THRU_DT": "20090106", "HCPCS_CD_1": "99213",
+         "LINE_NCH_PMT_AMT_1": 12.5},
+        {"DESYNPUF_ID": "B2", "BENE_BIRTH_DT": "19280704", "BENE_DEATH_DT": "20100301", "CLM_ID": 2,
+         "CLM_FROM_DT": None, "CLM_THRU_DT": None, "HCPCS_CD_1": None, "LINE_NCH_PMT_AMT_1": np.nan},
+    ]
+    df = pd.DataFrame(rows).reindex(columns=list(SOURCE_DTYPES))
+    df["ICD9_DGNS_CD_1"] = ["4019\ttab", "V58\\69"]
+    df["SP_STATE_CODE"] = [1, 5]
+    df[CHRONIC_SOURCE_COLUMNS] = 2
+    return df.astype(SOURCE_DTYPES)
+
+
+class StagingCursor:
+    """Stands in for a MySQL cursor and keeps the TSV LOAD DATA was pointed at."""
+
+    def __init__(self):
+        self.sql, self.staged, self.rowcount = None, None, 0
+
+    def execute(self, sql):
+        path = re.search(r"LOCAL INFILE '([^']+)'", sql)
+        if path:
+            self.sql = sql
+            with open(path.group(1), encoding="utf-8", newline="") as f:
+                self.staged = f.read()
+            self.rowcount = self.staged.count("\n")
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class StagingConnection:
+    def __init__(self):
+        self.cursor_ = StagingCursor()
+
+    def cursor(self):
+        return self.cursor_
+
+    def commit(self):
+        pass
+
+
+def stage(df, table):
+    conn = StagingConnection()
+    assert load_infile_to_mysql(df, table, conn) == []
+    lines = conn.cursor_.staged.split("\n")
+    assert lines.pop() == ""
+    return [dict(zip(df.columns, line.split("\t"))) for line in lines], conn.cursor_.sql
+
+
+def unescape(field):
+    return None if field == "\\N" else re.sub(r"\\.", lambda m: UNESCAPES[m.group()], field)
+
+
+def test_missing_values_are_staged_as_null_markers():
+    chunk = source_chunk()
+    benes, sql = stage(clean_beneficiaries(chunk), "beneficiary_info")
+    assert "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'" in sql
+    assert [b["death_date"] for b in benes] == ["\\N", "2010-03-01"]
+    assert benes[0]["birth_date"] == "1930-01-01"
+
+    claims, _ = stage(clean_claims(chunk, {"B1", "B2"}), "claims")
+    assert claims[0]["medicare_payment"] == "12.5"
+    assert [claims[1][col] for col in ["claim_from", "claim_thru", "hcpcs_code", "medicare_payment"]] == ["\\N"] * 4
+
+
+def test_tabs_and_backslashes_are_escaped():
+    chunk = source_chunk()
+    claims_df = clean_claims(chunk, {"B1", "B2"})
+    claims, _ = stage(claims_df, "claims")
+    assert [c["icd9_diagnosis_code"] for c in claims] == ["4019\\ttab", "V58\\\\69"]
+    assert [unescape(c["icd9_diagnosis_code"]) for c in claims] == list(claims_df["icd9_diagnosis_code"])
+
+    df = pd.DataFrame({"note": ["a\nb\rc\0d", "\\N", None]})
+    rows, _ = stage(df, "notes")
+    # A value that happens to read \N stays text; only the missing one is NULL
+    assert [r["note"] for r in rows] == ["a\\nb\\rc\\0d", "\\\\N", "\\N"]
+    assert [unescape(r["note"]) for r in rows] == ["a\nb\rc\0d", "\\N", None]
+
+
+def source_csv(path, n=60):
+    """A source CSV whose beneficiaries and claims repeat, with different values, in later rows."""
+    rng = np.random.default_rng(8)
+    df = pd.DataFrame({col: [pd.NA] * n for col in SOURCE_DTYPES})
+    df["DESYNPUF_ID"] = [f"B{i % 13:02d}" for i in range(n)]
+    df["BENE_BIRTH_DT"] = [f"19{30 + i % 40}0101" for i in range(n)]
+    df["SP_STATE_CODE"] = np.arange(n) % 50
+    df[CHRONIC_SOURCE_COLUMNS] = rng.integers(1, 3, (n, len(CHRONIC_SOURCE_COLUMNS)))
+    df["CLM_ID"] = [i % 41 for i in range(n)]
+    df["CLM_FROM_DT"] = "20090105"
+    df["ICD9_DGNS_CD_1"] = "4019"
+    df["LINE_NCH_PMT_AMT_1"] = np.arange(n, dtype=float)
+    df.to_csv(path, index=False)
+    return df
+
+
+def load(csv_path, chunksize):
+    conn = sqlite3.connect(":memory:")
+    # Tables as a bare loader would find them: no keys yet
+    beneficiary_df, claims_df = next(iter_clean_chunks(csv_path, 1))
+    beneficiary_df.iloc[:0].to_sql("beneficiary_info", conn, index=False)
+    claims_df.iloc[:0].to_sql("claims", conn, index=False)
+    ensure_unique_keys(conn)
+    for beneficiary_df, claims_df in iter_clean_chunks(csv_path, chunksize):
+        insert_to_mysql(beneficiary_df, "beneficiary_info", "bene_id", conn=conn)
+        insert_to_mysql(claims_df, "claims", "claim_id", conn=conn)
+    tables = {table: pd.read_sql(f"SELECT * FROM {table} ORDER BY {key}", conn)
+              for table, key in [("beneficiary_info", "bene_id"), ("claims", "claim_id")]}
+    return conn, tables
+
+
+@pytest.mark.parametrize("chunksize", [1, 7, 40])
+def test_keys_repeated_across_chunks_are_loaded_once(tmp_path, chunksize):
+    source = source_csv(tmp_path / "claims.csv")
+    conn, tables = load(tmp_path / "claims.csv", chunksize)
+    _, whole = load(tmp_path / "claims.csv", 10_000)
+
+    for table in tables:
+        pd.testing.assert_frame_equal(tables[table], whole[table])
+    assert len(tables["beneficiary_info"]) == 13 and len(tables["claims"]) == 41
+    # The first row of each key wins, as when the file was deduplicated in one piece
+    first = source.drop_duplicates("CLM_ID").set_index("CLM_ID")["LINE_NCH_PMT_AMT_1"]
+    assert tables["claims"].set_index("claim_id")["medicare_payment"].to_dict() == first.to_dict()
+    assert conn.execute("SELECT COUNT(*) FROM pragma_index_list('claims') WHERE \"unique\" = 1").fetchone()[0] == 1
+
+
+def test_existing_keys_are_left_alone():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE beneficiary_info (bene_id TEXT PRIMARY KEY, birth_date DATE)")
+    conn.execute("CREATE TABLE claims (claim_id INTEGER PRIMARY KEY, bene_id TEXT)")
+    ensure_unique_keys(conn)
+    indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+    assert indexes == []
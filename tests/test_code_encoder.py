@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from code_encoder import UNKNOWN, CodeEncoder, distinct_codes, fit_label_encoder
+
+TRAINING = pd.Series(["4019", "25000", "V5869", None, "4019", np.nan, "42731"], dtype=object)
+# Seen and unseen codes, a missing value and non-string values
+VALUES = ["4019", "V5869", "99999", "", np.nan, "nan", 4019, 4019.0, 25000, "25000", "4019.0", "v5869"]
+
+
+def encode_or_unknown(le, val):
+    """The per-row lookup the app used before `CodeEncoder`."""
+    try:
+        return int(le.transform([str(val)])[0])
+    except Exception:
+        return UNKNOWN
+
+
+def fitted(kind):
+    if kind == "astype_str":
+        # What cost_predictor.py fits; pandas 3 keeps the missing codes as a float NaN class
+        return LabelEncoder().fit(TRAINING.astype(str))
+    if kind == "nan_string":
+        # Encoders pickled under pandas 2, where missing codes became the string "nan"
+        return LabelEncoder().fit(TRAINING.map(str))
+    if kind == "mixed":
+        # Classes loaded from an encoder fitted on raw values: ints next to strings
+        le = LabelEncoder()
+        le.classes_ = np.array([25000, "4019", "V5869", 4019, "nan"], dtype=object)
+        return le
+    return fit_label_encoder(distinct_codes(TRAINING))
+
+
+@pytest.mark.parametrize("kind", ["astype_str", "nan_string", "mixed", "streamed"])
+@pytest.mark.parametrize("container", [list, np.array, pd.Series])
+def test_encode_matches_the_per_row_lookup(kind, container):
+    le = fitted(kind)
+    encoder = CodeEncoder(le)
+    values = container(np.array(VALUES, dtype=object)) if container is not list else list(VALUES)
+
+    expected = [encode_or_unknown(le, val) for val in VALUES]
+    got = encoder.encode(values)
+    assert got.dtype == np.int64
+    assert got.tolist() == expected
+    assert [encoder.encode_one(val) for val in VALUES] == expected
+    assert UNKNOWN in expected and any(code != UNKNOWN for code in expected)
+    # str(None) is "None", but a SQL NULL is deliberately the same missing code as a CSV NaN
+    assert encoder.encode(container(np.array([None, np.nan], dtype=object))).tolist() == [expected[4]] * 2
+
+
+@pytest.mark.parametrize("dtype", [object, "string"])
+def test_known_codes_match_transform(dtype):
+    le = fitted("streamed")
+    codes = pd.Series(["4019", "V5869", "42731", "25000"] * 3, dtype=dtype)
+    np.testing.assert_array_equal(CodeEncoder(le).encode(codes), le.transform(codes.astype(object)))
+    # None and NaN both look up the training rows that had no code
+    missing = pd.Series([None, np.nan], dtype=dtype)
+    assert CodeEncoder(le).encode(missing).tolist() == le.transform(["nan", "nan"]).tolist()
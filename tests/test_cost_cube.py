@@ -0,0 +1,103 @@
+import itertools
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dashboard_queries as dq
+from cost_cube import DIAG_COL, build_cube_from_db, build_cube_from_frame, lookup_summary, state_options
+from dashboard_queries import ALL, filter_frame
+from schema import AGE_LABELS, CHRONIC_COLS, add_age_columns, compact_frame
+
+CODES = [f"{code}" for code in range(4000, 4030)] + [None]
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    n_bene, n_claims = 200, 3000
+    benes = pd.DataFrame({
+        "bene_id": [f"b{i:04d}" for i in range(n_bene)],
+        "state_code": rng.choice([1, 5, 10], n_bene),
+        "birth_date": [f"{year}-{month:02d}-15" for year, month in
+                       zip(rng.integers(1915, 1961, n_bene), rng.integers(1, 13, n_bene))],
+        **{col: (rng.random(n_bene) < 0.3).astype(int) for col in CHRONIC_COLS},
+    })
+    claims = pd.DataFrame({
+        "claim_id": np.arange(1, n_claims + 1),
+        "bene_id": rng.choice(benes["bene_id"], n_claims),
+        DIAG_COL: rng.choice(np.array(CODES, dtype=object), n_claims),
+        "medicare_payment": rng.uniform(0, 1000, n_claims).round(2),
+        "patient_deductible": rng.uniform(0, 100, n_claims).round(2),
+        "coinsurance_amount": rng.uniform(0, 50, n_claims).round(2),
+    })
+    conn = sqlite3.connect(":memory:")
+    benes.to_sql("beneficiary_info", conn, index=False)
+    claims.to_sql("claims", conn, index=False)
+    frame = add_age_columns(claims.merge(benes, on="bene_id"))
+    yield frame, conn
+    conn.close()
+
+
+def selections(states):
+    return itertools.product([ALL] + states, [ALL] + AGE_LABELS, [ALL] + CHRONIC_COLS)
+
+
+def full_scan(df, state, age_group, chronic, limit=10):
+    """The per-selection scan the cube replaces."""
+    df = filter_frame(df, state, age_group, chronic)
+    totals = {
+        "medicare_payment": df["medicare_payment"].sum(),
+        "patient_cost": (df["patient_deductible"] + df["coinsurance_amount"]).sum(),
+        "claim_count": len(df),
+    }
+    top_diag = df.groupby(DIAG_COL)["medicare_payment"].sum().nlargest(limit)
+    costs = {col: df.loc[df[col] == 1, "medicare_payment"].sum() for col in CHRONIC_COLS}
+    return totals, top_diag.to_dict(), {col: cost for col, cost in costs.items() if cost > 0}
+
+
+def as_dicts(summary):
+    totals, top_diag, chronic_df = summary
+    return (totals, dict(zip(top_diag[DIAG_COL], top_diag["medicare_payment"])),
+            dict(zip(chronic_df["Condition"], chronic_df["Total Medicare Cost"])))
+
+
+def assert_same(actual, expected, rel=1e-9):
+    for got, want in zip(actual, expected):
+        assert got.keys() == want.keys()
+        for key in want:
+            assert got[key] == pytest.approx(want[key], rel=rel, abs=1e-6), key
+
+
+@pytest.mark.parametrize("layout", ["merged", "compact"])
+def test_cube_lookups_match_a_full_scan_for_every_selection(data, layout):
+    frame, _ = data
+    if layout == "compact":
+        # The app's layout: categorical codes/states, float32 amounts
+        cube, rel = build_cube_from_frame(compact_frame(frame.drop(columns=["age", "age_group"]))), 1e-6
+    else:
+        cube, rel = build_cube_from_frame(frame), 1e-9
+    assert state_options(cube) == [1, 5, 10]
+    for selection in selections(state_options(cube)):
+        assert_same(as_dicts(lookup_summary(cube, *selection)), full_scan(frame, *selection), rel)
+
+
+def test_cube_from_db_matches_the_sql_aggregates(data):
+    frame, conn = data
+    cube = build_cube_from_db(conn)
+    assert state_options(cube) == state_options(build_cube_from_frame(frame))
+    for selection in selections(state_options(cube)):
+        sql = (
+            dq.fetch_cost_totals(conn, *selection),
+            dq.fetch_top_diagnoses(conn, *selection),
+            dq.fetch_chronic_costs(conn, *selection),
+        )
+        assert_same(as_dicts(lookup_summary(cube, *selection)), as_dicts(sql))
+
+
+def test_unknown_selection_is_empty(data):
+    frame, _ = data
+    totals, top_diag, chronic_df = lookup_summary(build_cube_from_frame(frame), 99, ALL, ALL)
+    assert totals == {"medicare_payment": 0.0, "patient_cost": 0.0, "claim_count": 0}
+    assert top_diag.empty and chronic_df.empty
@@ -0,0 +1,74 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bene_summary
+from dashboard_queries import ALL, fetch_bene_count, fetch_bene_page
+from schema import CHRONIC_COLS, add_age_columns
+
+SELECTIONS = [(ALL, ALL, ALL, ""), (5, ALL, ALL, "b0"), (ALL, "75-84", "SP_CHF", ""), (ALL, ALL, "SP_COPD", "b01")]
+
+
+@pytest.fixture
+def db():
+    rng = np.random.default_rng(2)
+    n_bene, n_claims = 300, 900
+    benes = pd.DataFrame({
+        "bene_id": [f"b{i:03d}" for i in range(n_bene)],
+        "state_code": rng.choice([1, 5, 10], n_bene),
+        "birth_date": [f"{year}-06-15" for year in rng.integers(1915, 1961, n_bene)],
+        **{col: rng.integers(1, 3, n_bene) for col in CHRONIC_COLS},
+    })
+    # Only the first 200 beneficiaries have claims
+    claims = pd.DataFrame({
+        "claim_id": np.arange(1, n_claims + 1),
+        "bene_id": rng.choice(benes["bene_id"][:200], n_claims),
+        "medicare_payment": rng.uniform(0, 1000, n_claims).round(2),
+        "patient_deductible": 0.0,
+        "coinsurance_amount": 0.0,
+    })
+    conn = sqlite3.connect(":memory:")
+    benes.to_sql("beneficiary_info", conn, index=False)
+    claims.to_sql("claims", conn, index=False)
+    yield conn, add_age_columns(benes[benes["bene_id"].isin(claims["bene_id"])])
+    conn.close()
+
+
+def expected_ids(benes, state, age_group, chronic, prefix):
+    if state != ALL:
+        benes = benes[benes["state_code"] == state]
+    if age_group != ALL:
+        benes = benes[benes["age_group"] == age_group]
+    if chronic != ALL:
+        benes = benes[benes[chronic] == 1]
+    return sorted(b for b in benes["bene_id"] if b.startswith(prefix))
+
+
+def assert_search_matches(conn, benes):
+    for state, age_group, chronic, prefix in SELECTIONS:
+        expected = expected_ids(benes, state, age_group, chronic, prefix)
+        assert fetch_bene_count(conn, state, age_group, chronic, prefix) == len(expected)
+        pages = [fetch_bene_page(conn, state, age_group, chronic, prefix, limit=7, offset=offset)
+                 for offset in range(0, len(expected) + 7, 7)]
+        assert sum(pages, []) == expected
+
+
+def test_search_without_a_summary_table_falls_back_to_claims(db):
+    conn, benes = db
+    assert not bene_summary.summary_exists(conn)
+    assert_search_matches(conn, benes)
+    # Reading never creates the table behind the loader's back
+    assert not bene_summary.summary_exists(conn)
+
+
+def test_search_reads_the_summary_table_once_built(db):
+    conn, benes = db
+    bene_summary.rebuild(conn)
+    assert bene_summary.summary_exists(conn)
+    assert_search_matches(conn, benes)
+
+    # The summary, not the claims join, decides who is listed
+    conn.execute(f"UPDATE {bene_summary.SUMMARY_TABLE} SET claim_count = 0 WHERE bene_id = 'b000'")
+    assert "b000" not in fetch_bene_page(conn, prefix="b00")
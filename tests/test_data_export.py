@@ -0,0 +1,92 @@
+import gzip
+import io
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from data_export import EXPORT_DTYPES, export_frame, export_query, export_snapshot
+from dashboard_queries import ALL, filter_frame
+from schema import BENEFICIARY_COLUMNS, CHRONIC_COLS, CLAIM_COLUMNS
+from snapshot_cache import build_snapshot, load_dashboard_frame
+
+SELECTIONS = [(ALL, ALL, ALL), (5, ALL, ALL), (ALL, "75-84", "SP_CHF"), (99, ALL, ALL)]
+
+
+@pytest.fixture(scope="module")
+def sources(tmp_path_factory):
+    rng = np.random.default_rng(3)
+    n_bene, n_claims = 60, 900
+    benes = pd.DataFrame({col: [None] * n_bene for col in BENEFICIARY_COLUMNS})
+    benes["bene_id"] = [f"b{i:03d}" for i in range(n_bene)]
+    benes["birth_date"] = [f"{year}-03-15" for year in rng.integers(1915, 1960, n_bene)]
+    benes["death_date"] = [None if i % 4 else "2010-02-01" for i in range(n_bene)]
+    benes["sex_code"] = rng.choice(["1", "2"], n_bene)
+    benes["state_code"] = rng.choice([1, 5, 10], n_bene)
+    benes["county_code"] = rng.integers(0, 900, n_bene)
+    benes[CHRONIC_COLS] = rng.integers(1, 3, (n_bene, len(CHRONIC_COLS)))
+    claims = pd.DataFrame({
+        "claim_id": np.arange(1, n_claims + 1),
+        "bene_id": rng.choice(benes["bene_id"], n_claims),
+        "claim_from": "2009-02-01",
+        "claim_thru": "2009-02-03",
+        "icd9_diagnosis_code": rng.choice(["4019", "25000", None], n_claims),
+        "hcpcs_code": rng.choice(["99213", None], n_claims),
+        # Cents that float32 can't hold exactly
+        "medicare_payment": rng.uniform(0, 90_000, n_claims).round(2),
+        "patient_deductible": rng.uniform(0, 100, n_claims).round(2),
+        "coinsurance_amount": 0.1,
+    })[CLAIM_COLUMNS]
+    conn = sqlite3.connect(":memory:")
+    benes.to_sql("beneficiary_info", conn, index=False)
+    claims.to_sql("claims", conn, index=False)
+    snap = tmp_path_factory.mktemp("export") / "snapshot"
+    build_snapshot(conn, snap)
+    yield conn, snap, load_dashboard_frame(snap)
+    conn.close()
+
+
+def read(data, fmt):
+    if fmt == "parquet":
+        table = pq.read_table(io.BytesIO(data))
+        return table.schema, table.to_pandas().sort_values("claim_id", ignore_index=True)
+    lines = gzip.decompress(data).decode().splitlines()
+    return lines[0], sorted(lines[1:])
+
+
+def export(fn, *args, **kwargs):
+    sink = io.BytesIO()
+    fn(*args, sink=sink, **kwargs)
+    return sink.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["csv.gz", "parquet"])
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_frame_snapshot_and_query_exports_are_identical(sources, selection, fmt):
+    conn, snap, frame = sources
+    from_frame = export(export_frame, filter_frame(frame, *selection), fmt=fmt, chunk_rows=97)
+    from_snapshot = export(export_snapshot, *selection, fmt=fmt, snapshot_dir=snap, chunk_rows=89)
+    from_query = export(export_query, conn, *selection, fmt=fmt, chunk_rows=101)
+
+    header, rows = read(from_frame, fmt)
+    for other in (from_snapshot, from_query):
+        other_header, other_rows = read(other, fmt)
+        if fmt == "parquet":
+            assert other_header.equals(header)
+            pd.testing.assert_frame_equal(other_rows, rows)
+        else:
+            assert (other_header, other_rows) == (header, rows)
+
+
+def test_export_layout(sources):
+    conn, snap, frame = sources
+    schema, df = read(export(export_frame, frame, fmt="parquet"), "parquet")
+    assert schema.names == list(EXPORT_DTYPES)
+    assert df["medicare_payment"].tolist() == pd.read_sql(
+        "SELECT medicare_payment FROM claims ORDER BY claim_id", conn)["medicare_payment"].tolist()
+
+    header, rows = read(export(export_frame, frame.iloc[:5]), "csv.gz")
+    assert header.split(",") == list(EXPORT_DTYPES)
+    assert all(",2009-02-01,2009-02-03," in row for row in rows)
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+from config import db_config
+from config.db_config import ConnectionPool, get_engine, get_pool
+
+
+class FakeConnection:
+    opened = 0
+
+    def __init__(self, fail_rollback=False):
+        FakeConnection.opened += 1
+        self.id = FakeConnection.opened
+        self.connected, self.closed = True, False
+        self.rollbacks = 0
+        self.fail_rollback = fail_rollback
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise OSError("server has gone away")
+        self.rollbacks += 1
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool():
+    return ConnectionPool(FakeConnection, size=2, timeout=5, pre_ping=True, recycle=0)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(db_config, "_pools", {})
+    monkeypatch.setattr(db_config, "_engines", {})
+
+
+def test_released_connection_is_reused(pool):
+    with pool.connection() as first:
+        pass
+    assert first.rollbacks == 1 and not first.closed
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert (stats["created"], stats["reused"], stats["in_use"], stats["idle"]) == (1, 1, 0, 1)
+
+
+def test_pool_is_bounded_and_waiters_get_the_released_connection(pool):
+    a, b = pool.acquire(), pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()["timeouts"] == 1
+
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=5)))
+    waiter.start()
+    pool.release(a)
+    waiter.join(5)
+    assert got == [a]
+    assert pool.stats()["peak_in_use"] == 2
+    pool.release(a)
+    pool.release(b)
+
+
+def test_connection_goes_back_to_the_pool_on_exception(pool):
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError("bad row")
+    assert conn.rollbacks == 1 and not conn.closed
+    assert pool.stats()["in_use"] == 0
+    with pool.connection() as again:
+        assert again is conn
+
+
+def test_connection_is_closed_when_it_cannot_be_rolled_back(pool):
+    pool._connect = lambda: FakeConnection(fail_rollback=True)
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError("lost connection")
+    assert conn.closed
+    assert pool.stats()["idle"] == 0 and pool._open == 0
+
+
+def test_interrupted_connection_is_closed(pool):
+    with pytest.raises(KeyboardInterrupt):
+        with pool.connection() as conn:
+            raise KeyboardInterrupt
+    assert conn.closed and conn.rollbacks == 0
+    with pool.connection() as again:
+        assert again is not conn
+
+
+def test_dead_idle_connection_is_replaced(pool):
+    with pool.connection() as conn:
+        pass
+    conn.connected = False
+    with pool.connection() as again:
+        assert again is not conn
+    assert conn.closed and pool.stats()["ping_failures"] == 1
+
+
+def test_registry_returns_one_pool_per_connect_options(registry):
+    assert get_pool() is get_pool()
+    infile = get_pool(allow_local_infile=True, autocommit=False)
+    assert get_pool(autocommit=False, allow_local_infile=True) is infile
+    assert infile is not get_pool()
+
+
+def test_registry_returns_one_engine_per_config(registry):
+    config = {"user": "u", "password": "p", "host": "db", "port": 3306, "database": "medoptix"}
+    engine = get_engine(config)
+    assert get_engine(dict(config)) is engine
+    assert get_engine({**config, "database": "other"}) is not engine
+    assert get_engine(config, pool_size=2) is not engine
+    assert set(db_config.pool_stats()) == {e.url.render_as_string(hide_password=True)
+                                          for e in db_config._engines.values()}
+    db_config.dispose_all()
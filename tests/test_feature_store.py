@@ -0,0 +1,118 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cost_predictor
+import feature_store as fs
+from schema import CHRONIC_COLS
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # The store lives at the relative FEATURE_STORE_DIR
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(5)
+    n_bene, n_claims = 50, 400
+    benes = pd.DataFrame({
+        "bene_id": [f"b{i:02d}" for i in range(n_bene)],
+        "birth_date": [f"{year}-01-01" for year in rng.integers(1920, 1960, n_bene)],
+        **{col: rng.integers(1, 3, n_bene) for col in CHRONIC_COLS},
+    })
+    claims = pd.DataFrame({
+        "claim_id": np.arange(1, n_claims + 1),
+        "bene_id": rng.choice(benes["bene_id"], n_claims),
+        "claim_thru": "2009-05-01",
+        "icd9_diagnosis_code": rng.choice(["4019", "25000", None], n_claims),
+        "hcpcs_code": rng.choice(["99213", "G0008", None], n_claims),
+        "medicare_payment": rng.uniform(0, 500, n_claims).round(2),
+    })
+    claims.loc[::37, "medicare_payment"] = np.nan
+    conn = sqlite3.connect(tmp_path / "claims.db")
+    benes.to_sql("beneficiary_info", conn, index=False)
+    claims.to_sql("claims", conn, index=False)
+    yield conn
+    conn.close()
+
+
+def load(conn, monkeypatch, expect_hit):
+    read_db_join = cost_predictor.read_db_join
+    reads = []
+
+    def counting_read(conn):
+        reads.append(1)
+        return read_db_join(conn)
+
+    monkeypatch.setattr(cost_predictor, "read_db_join", counting_read)
+    data = cost_predictor.load_training_data("db", cost_predictor.StageReport(), conn)
+    assert reads == ([] if expect_hit else [1])
+    return data
+
+
+def assert_same_features(cached, fresh):
+    X, y, holdout, le_icd9, le_hcpcs = cached
+    fresh_X, fresh_y, fresh_holdout, fresh_icd9, fresh_hcpcs = fresh
+    pd.testing.assert_frame_equal(X.reset_index(drop=True), fresh_X)
+    np.testing.assert_array_equal(y, fresh_y)
+    np.testing.assert_array_equal(holdout, fresh_holdout)
+    assert list(le_icd9.classes_) == list(fresh_icd9.classes_)
+    assert list(le_hcpcs.classes_) == list(fresh_hcpcs.classes_)
+
+
+def entries():
+    return sorted(p.name for p in fs.FEATURE_STORE_DIR.iterdir())
+
+
+def test_cache_hit_returns_what_was_stored(db, monkeypatch):
+    fresh = load(db, monkeypatch, expect_hit=False)
+    assert len(fresh[0]) == 400 - len(range(0, 400, 37))
+    assert len(entries()) == 1
+
+    cached = load(db, monkeypatch, expect_hit=True)
+    assert_same_features(cached, fresh)
+    assert cached[0].dtypes.to_dict() == fresh[0].dtypes.to_dict()
+
+    # The streaming path reads the same entry batch by batch
+    make_encoded, le_icd9, _ = cost_predictor.streaming_training_data("db", cost_predictor.StageReport(), db,
+                                                                       batch_size=64)
+    batches = list(make_encoded())
+    assert len(batches) > 1
+    pd.testing.assert_frame_equal(pd.concat([X for X, _, _ in batches], ignore_index=True), fresh[0])
+    assert list(le_icd9.classes_) == list(fresh[3].classes_)
+
+
+def test_new_claims_change_the_data_fingerprint(db, monkeypatch):
+    first = load(db, monkeypatch, expect_hit=False)
+    db.execute("INSERT INTO claims (claim_id, bene_id, claim_thru, icd9_diagnosis_code, hcpcs_code, medicare_payment) "
+               "VALUES (401, 'b00', '2009-06-01', 'V5869', '99213', 12.5)")
+    db.commit()
+
+    second = load(db, monkeypatch, expect_hit=False)
+    assert len(second[0]) == len(first[0]) + 1
+    assert "V5869" in second[3].classes_ and "V5869" not in first[3].classes_
+    assert len(entries()) == 2
+    assert_same_features(load(db, monkeypatch, expect_hit=True), second)
+
+
+def test_changed_feature_definition_is_a_miss(db, monkeypatch):
+    fresh = load(db, monkeypatch, expect_hit=False)
+    monkeypatch.setitem(fs.FEATURE_DEFINITION, "version", fs.FEATURE_VERSION + 1)
+    assert_same_features(load(db, monkeypatch, expect_hit=False), fresh)
+    assert len(entries()) == 2
+    load(db, monkeypatch, expect_hit=True)
+
+
+def test_rebuild_and_no_half_written_entries(db, monkeypatch):
+    load(db, monkeypatch, expect_hit=False)
+    fp = entries()[0]
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(fs.pq.ParquetWriter, "write_table", fail)
+    with pytest.raises(OSError):
+        cost_predictor.load_training_data("db", cost_predictor.StageReport(), db, rebuild=True)
+    # The previous entry survives and nothing staged is left behind
+    assert entries() == [fp]
+    assert fs.has_features(fp)
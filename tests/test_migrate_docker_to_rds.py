@@ -0,0 +1,157 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import OperationalError
+
+import migrate_docker_to_rds as migrate
+from migrate_docker_to_rds import frame_checksum, migrate_table, range_clause, read_range, verify_range, write_range
+
+ROWS = 1000
+
+
+def claims_frame(n=ROWS):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "claim_id": np.arange(n),
+        "bene_id": [f"b{i % 97:03d}" for i in range(n)],
+        "claim_from": [f"2009-{i % 12 + 1:02d}-{i % 28 + 1:02d}" for i in range(n)],
+        "claim_thru": [f"2009-{i % 12 + 1:02d}-{i % 28 + 1:02d}" for i in range(n)],
+        "icd9_diagnosis_code": [f"{4000 + i % 37}" for i in range(n)],
+        "hcpcs_code": [None if i % 5 == 0 else f"{99200 + i % 15}" for i in range(n)],
+        "medicare_payment": rng.uniform(0, 500, n).round(2),
+        "patient_deductible": rng.uniform(0, 50, n).round(2),
+        "coinsurance_amount": rng.uniform(0, 20, n).round(2),
+    })
+
+
+def sqlite_engine(path):
+    # Writers wait for SQLite's single write lock instead of failing
+    return create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+
+
+def table(engine, name="claims"):
+    with engine.connect() as conn:
+        return pd.read_sql(text(f"SELECT * FROM {name} ORDER BY claim_id"), conn)
+
+
+@pytest.fixture
+def engines(tmp_path):
+    src, dst = sqlite_engine(tmp_path / "src.db"), sqlite_engine(tmp_path / "dst.db")
+    migrate.create_claims_schema(src)
+    claims_frame().to_sql("claims", src, if_exists="append", index=False)
+    yield src, dst
+    src.dispose()
+    dst.dispose()
+
+
+def test_frame_checksum_ignores_row_and_column_order():
+    df = claims_frame(50)
+    shuffled = df.sample(frac=1, random_state=1)[df.columns[::-1]]
+    assert frame_checksum(shuffled) == frame_checksum(df)
+
+    changed = df.copy()
+    changed.loc[7, "medicare_payment"] += 0.01
+    assert frame_checksum(changed) != frame_checksum(df)
+    assert frame_checksum(df.iloc[:-1]) != frame_checksum(df)
+    assert frame_checksum(df.iloc[:0]) == (0, "0" * 16)
+
+
+def test_parallel_migration_copies_and_checkpoints_every_range(engines, tmp_path):
+    src, dst = engines
+    checkpoint = tmp_path / "checkpoint.json"
+    migrate_table("claims", src, dst, workers=3, readers=2, read_chunk=90, write_chunk=40,
+                  checkpoint_path=str(checkpoint))
+
+    pd.testing.assert_frame_equal(table(dst), table(src))
+    entry = json.loads(checkpoint.read_text())["claims"]
+    assert sorted(entry["done"]) == list(range(len(entry["ranges"])))
+    assert sum(count for count, _ in entry["checksums"].values()) == ROWS
+
+
+def test_destination_claims_is_keyed_before_ranges_are_written(engines, tmp_path):
+    src, dst = engines
+    migrate_table("claims", src, dst, workers=2, readers=1, read_chunk=300, checkpoint_path=str(tmp_path / "c.json"))
+    assert inspect(dst).get_pk_constraint("claims")["constrained_columns"] == ["claim_id"]
+
+    # Range deletes and verification read-backs seek the key instead of scanning the table
+    where, params = range_clause("claim_id", 300, 600)
+    with dst.connect() as conn:
+        for sql in (f"DELETE FROM claims WHERE {where}", f"SELECT * FROM claims WHERE {where}"):
+            plan = " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params))
+            assert "USING INDEX" in plan and "claim_id>? AND claim_id<?" in plan.replace("=", ""), plan
+
+
+def test_resume_rewrites_unfinished_ranges_without_duplicates(engines, tmp_path):
+    src, dst = engines
+    checkpoint = tmp_path / "checkpoint.json"
+    migrate_table("claims", src, dst, workers=2, readers=1, read_chunk=200, checkpoint_path=str(checkpoint))
+
+    # Simulate a run interrupted while the last two ranges were half written
+    state = json.loads(checkpoint.read_text())
+    entry = state["claims"]
+    unfinished = sorted(entry["done"])[-2:]
+    entry["done"] = [i for i in entry["done"] if i not in unfinished]
+    checkpoint.write_text(json.dumps(state))
+    lo = entry["ranges"][unfinished[0]][0]
+    with dst.begin() as conn:
+        conn.execute(text("DELETE FROM claims WHERE claim_id >= :lo AND rowid % 2 = 0"), {"lo": lo})
+
+    migrate_table("claims", src, dst, workers=2, readers=1, read_chunk=200, checkpoint_path=str(checkpoint))
+    pd.testing.assert_frame_equal(table(dst), table(src))
+
+
+def test_verify_range_detects_a_changed_row(engines, tmp_path):
+    src, dst = engines
+    migrate_table("claims", src, dst, workers=1, readers=1, read_chunk=ROWS, checkpoint_path=str(tmp_path / "c.json"))
+    expected = frame_checksum(read_range(src, "claims", "claim_id", 0, None))
+    assert verify_range(dst, "claims", "claim_id", 0, None, expected)[0]
+
+    with dst.begin() as conn:
+        conn.execute(text("UPDATE claims SET medicare_payment = medicare_payment + 1 WHERE claim_id = 42"))
+    assert not verify_range(dst, "claims", "claim_id", 0, None, expected)[0]
+
+
+def _mysql_error(code):
+    return OperationalError("INSERT ...", {}, Exception(code, "simulated"))
+
+
+def test_write_range_retries_a_deadlocked_transaction(engines, monkeypatch):
+    src, dst = engines
+    df = read_range(src, "claims", "claim_id", 0, 100)
+    real_to_sql = pd.DataFrame.to_sql
+    calls = []
+
+    def deadlock_once(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            real_to_sql(self.iloc[:10], *args, **kwargs)  # rolled back with the failed attempt
+            raise _mysql_error(1213)
+        return real_to_sql(self, *args, **kwargs)
+
+    monkeypatch.setattr(pd.DataFrame, "to_sql", deadlock_once)
+    monkeypatch.setattr(migrate.time, "sleep", lambda seconds: None)
+    migrate.create_claims_schema(dst)
+
+    assert write_range(dst, "claims", "claim_id", 0, 100, df) == 100
+    assert len(calls) == 2
+    pd.testing.assert_frame_equal(table(dst), df.sort_values("claim_id", ignore_index=True))
+
+
+def test_write_range_does_not_retry_other_errors(engines, monkeypatch):
+    src, dst = engines
+    df = read_range(src, "claims", "claim_id", 0, 10)
+
+    calls = []
+
+    def fail(self, *args, **kwargs):
+        calls.append(1)
+        raise _mysql_error(1045)
+
+    monkeypatch.setattr(pd.DataFrame, "to_sql", fail)
+    migrate.create_claims_schema(dst)
+    with pytest.raises(OperationalError):
+        write_range(dst, "claims", "claim_id", 0, 10, df)
+    assert len(calls) == 1
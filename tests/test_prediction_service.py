@@ -0,0 +1,63 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+from xgboost import XGBRegressor
+
+from code_encoder import CodeEncoder, fit_label_encoder
+from prediction_service import MicroBatcher
+from schema import CHRONIC_COLS
+
+ICD9 = ["4019", "25000", "V5869"]
+HCPCS = ["99213", "99214"]
+
+
+@pytest.fixture(scope="module")
+def batcher():
+    rng = np.random.default_rng(0)
+    n = 2000
+    X = pd.DataFrame({
+        "age": rng.integers(65, 95, n),
+        "icd9_diagnosis_code": rng.integers(0, len(ICD9), n),
+        "hcpcs_code": rng.integers(0, len(HCPCS), n),
+        **{col: rng.integers(0, 2, n) for col in CHRONIC_COLS},
+    })
+    # SP_CHF moves the target a lot, so a flag read as "missing" instead of 0 shows up
+    y = 50 + X["age"] + 100 * X["SP_CHF"] + 10 * X["hcpcs_code"]
+    model = XGBRegressor(n_estimators=20, max_depth=3).fit(X, y)
+    return MicroBatcher(model, CodeEncoder(fit_label_encoder(ICD9)), CodeEncoder(fit_label_encoder(HCPCS)))
+
+
+ROW = {"age": 72, "icd9_diagnosis_code": "4019", "hcpcs_code": "99213"}
+FLAGGED = {"age": 80, "icd9_diagnosis_code": "25000", "hcpcs_code": "99214", "SP_CHF": 1, "SP_COPD": 1}
+
+
+def test_missing_flags_score_as_zero(batcher):
+    explicit = {**ROW, **{col: 0 for col in CHRONIC_COLS}}
+    assert batcher.score([ROW]) == batcher.score([explicit])
+
+
+def test_row_scores_the_same_alone_and_in_a_mixed_batch(batcher):
+    alone = batcher.score([ROW])[0]
+    first, flagged = batcher.score([ROW, FLAGGED])
+    assert first == alone
+    assert flagged == batcher.score([FLAGGED])[0]
+
+
+def test_micro_batched_requests_match_single_scoring(batcher):
+    rows = [ROW, FLAGGED, {**ROW, "SP_DIABETES": 1}, {**FLAGGED, "icd9_diagnosis_code": "unknown"}]
+    expected = [batcher.score([row])[0] for row in rows]
+
+    async def run():
+        # A long window so every request lands in one micro-batch
+        live = MicroBatcher(batcher.model, batcher.icd9_encoder, batcher.hcpcs_encoder, window_ms=200)
+        await live.start()
+        try:
+            return await asyncio.gather(*(live.predict(row) for row in rows)), live.stats
+        finally:
+            await live.stop()
+
+    preds, stats = asyncio.run(run())
+    assert preds == expected
+    assert stats.batches == 1
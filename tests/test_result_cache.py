@@ -0,0 +1,83 @@
+import pandas as pd
+
+from result_cache import ResultCache, frame_bytes
+
+
+def cached(cache, key, value=None, nbytes=0):
+    """`cache.get` that records whether `compute` ran."""
+    calls = []
+
+    def compute():
+        calls.append(key)
+        return key if value is None else value
+
+    return cache.get(key, compute, size=lambda _: nbytes), bool(calls)
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = ResultCache(max_entries=3)
+    for key in "abc":
+        cached(cache, key)
+    assert cached(cache, "a") == ("a", False)   # a is now the most recent
+    cached(cache, "d")
+    assert len(cache) == 3
+    assert cached(cache, "b")[1]                 # b was the least recent
+    assert not cached(cache, "a")[1] and not cached(cache, "d")[1]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_size_bound_evicts_until_the_entries_fit():
+    cache = ResultCache(max_entries=100, max_bytes=1000)
+    for key in "abcd":
+        cached(cache, key, nbytes=300)
+    assert len(cache) == 3 and cache.stats()["evictions"] == 1
+    cached(cache, "b")
+    cached(cache, "big", nbytes=700)
+    # Room for 700 bytes: c and d go, b (recently used) stays
+    assert [key for key in "abcd" if not cached(cache, key)[1]] == ["b"]
+
+    cache = ResultCache(max_bytes=1000)
+    cached(cache, "small", nbytes=10)
+    # A value bigger than the whole cache is returned but neither kept nor evicting others
+    assert cached(cache, "huge", nbytes=5000) == ("huge", True)
+    assert cached(cache, "huge")[1] and not cached(cache, "small")[1]
+
+
+def test_frames_are_sized_by_their_memory():
+    df = pd.DataFrame({"x": range(100_000)})
+    cache = ResultCache(max_bytes=frame_bytes(df) * 2)
+    for key in "abc":
+        cache.get(key, lambda: df.copy(), size=frame_bytes)
+    assert len(cache) == 2 and cache.stats()["mb"] > 0
+
+
+def test_new_data_version_invalidates_everything():
+    cache = ResultCache()
+    cache.sync("v1")
+    cached(cache, "a")
+    cached(cache, "b")
+    cache.sync("v1")
+    assert not cached(cache, "a")[1]
+
+    cache.sync("v2")
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1
+    assert cached(cache, "a")[1]
+    cache.sync("v2")
+    assert not cached(cache, "a")[1]
+
+
+def test_result_computed_against_an_old_version_is_not_kept():
+    cache = ResultCache()
+    cache.sync("v1")
+    # The data is refreshed while a session is still computing from the old version
+    value = cache.get("a", lambda: cache.sync("v2") or "stale")
+    assert value == "stale" and len(cache) == 0
+    assert cached(cache, "a")[1]
+
+
+def test_stats_count_hits_and_misses():
+    cache = ResultCache()
+    for key in "abab":
+        cached(cache, key)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 2, 0.5)
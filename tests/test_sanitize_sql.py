@@ -0,0 +1,52 @@
+import codecs
+import io
+import random
+import re
+
+import pytest
+
+from sanitize_sql import BOMS, iter_sanitized, sanitize
+from sql_splitter import split_file, write_synthetic_dump
+
+
+def sanitize_whole(raw):
+    """The original single-shot sanitizer: the whole dump in memory, one regex."""
+    for bom in BOMS:
+        if raw.startswith(bom):
+            raw = raw[len(bom):]
+            break
+    txt = raw.decode("utf-8", errors="ignore")
+    txt = re.sub(r"[\x00-\x08\x0B\x0C\x0E-\x1F]", "", txt)
+    return txt.replace("\r\n", "\n").replace("\r", "\n")
+
+
+# Whole characters only: a control byte inside an invalid multi-byte sequence is
+# the one case where deleting before decoding differs from the regex after it
+PIECES = [b"a", b"\r", b"\n", b"\r\n", b"\x00", b"\x01", b"\x1f", b"\t", "é".encode(), "€".encode(),
+          "\U0001F600".encode(), b"\xff", b"'", b";"]
+PREFIXES = [b"", codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF32_BE]
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 5, 7, 64])
+def test_blocks_match_single_shot_sanitizer(block_size):
+    rng = random.Random(block_size)
+    for _ in range(200):
+        raw = rng.choice(PREFIXES) + b"".join(rng.choice(PIECES) for _ in range(rng.randint(0, 60)))
+        assert "".join(iter_sanitized(io.BytesIO(raw), block_size)) == sanitize_whole(raw), raw
+
+
+def test_sanitize_then_split_in_one_pass(tmp_path):
+    dump = tmp_path / "dump.sql"
+    write_synthetic_dump(dump, 1, rows_per_statement=2000)
+    dirty = tmp_path / "dirty.sql"
+    raw = dump.read_bytes().replace(b"\n", b"\r\n").replace(b"plain", b"pl\x00ain\x07")
+    dirty.write_bytes(codecs.BOM_UTF8 + raw)
+
+    clean = tmp_path / "clean.sql"
+    sanitize(str(dirty), str(clean), block_size=4096)
+    assert clean.read_text(encoding="utf-8") == sanitize_whole(dirty.read_bytes())
+
+    two_step, fused = tmp_path / "two_step.sql", tmp_path / "fused.sql"
+    split_file(clean, two_step, 100)
+    sanitize(str(dirty), str(fused), block_size=4097, split=True, rows_per_insert=100)
+    assert fused.read_text(encoding="utf-8") == two_step.read_text(encoding="utf-8")
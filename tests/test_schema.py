@@ -0,0 +1,106 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_queries import ALL, filter_frame
+from schema import AGE_LABELS, CHRONIC_COLS, DASHBOARD_DTYPES, add_age_columns, compact_frame
+
+CODES = np.array(["4019", "25000", "V5869", "42731", "78650", None], dtype=object)
+
+
+@pytest.fixture(scope="module")
+def frames():
+    """The merged frame as read from SQL (strings, float64, nullable ints) and its compact copy."""
+    rng = np.random.default_rng(11)
+    n_bene, n_claims = 150, 4000
+    benes = pd.DataFrame({
+        "bene_id": [f"b{i:04d}" for i in range(n_bene)],
+        "birth_date": [f"{year}-{month:02d}-01" for year, month in
+                       zip(rng.integers(1905, 1965, n_bene), rng.integers(1, 13, n_bene))],
+        "sex_code": rng.choice(["1", "2"], n_bene),
+        "state_code": rng.choice([1, 5, 10, 52], n_bene).astype(float),
+        "county_code": rng.integers(0, 999, n_bene),
+        **{col: rng.choice([1.0, 2.0, np.nan], n_bene, p=[0.3, 0.65, 0.05]) for col in CHRONIC_COLS},
+    })
+    benes.loc[3, "birth_date"] = None
+    benes.loc[4, "state_code"] = np.nan
+    claims = pd.DataFrame({
+        "claim_id": np.arange(1, n_claims + 1),
+        "bene_id": rng.choice(benes["bene_id"], n_claims),
+        "claim_from": [f"2009-{m:02d}-{d:02d}" for m, d in zip(rng.integers(1, 13, n_claims), rng.integers(1, 29, n_claims))],
+        "icd9_diagnosis_code": rng.choice(CODES, n_claims),
+        "hcpcs_code": rng.choice(CODES[::-1], n_claims),
+        "medicare_payment": rng.uniform(0, 100_000, n_claims).round(2),
+        "patient_deductible": rng.uniform(0, 1_000, n_claims).round(2),
+        "coinsurance_amount": rng.uniform(0, 100, n_claims).round(2),
+    })
+    claims.loc[::50, "medicare_payment"] = np.nan
+    original = add_age_columns(claims.merge(benes, on="bene_id"))
+    compact = compact_frame(original.drop(columns=["age", "age_group"]))
+    return original, compact
+
+
+def selections(frame):
+    states = sorted(frame["state_code"].dropna().unique())
+    return itertools.product([ALL] + states, [ALL] + AGE_LABELS, [ALL] + CHRONIC_COLS[:4])
+
+
+def aggregates(df):
+    amounts = df[["medicare_payment", "patient_deductible", "coinsurance_amount"]].astype("float64")
+    by_code = amounts["medicare_payment"].groupby(df["icd9_diagnosis_code"].astype(object)).sum()
+    return {
+        "claims": len(df),
+        "benes": df["bene_id"].nunique(),
+        "medicare_payment": amounts["medicare_payment"].sum(),
+        "patient_cost": (amounts["patient_deductible"] + amounts["coinsurance_amount"]).sum(),
+        "mean_age": df["age"].astype("float64").mean(),
+        "first_claim": pd.Timestamp(df["claim_from"].min()) if len(df) else None,
+        "by_code": by_code.to_dict(),
+        "by_age_group": df["age_group"].value_counts().to_dict(),
+        "chronic": {col: amounts.loc[df[col] == 1, "medicare_payment"].sum() for col in CHRONIC_COLS},
+    }
+
+
+def assert_close(got, want):
+    assert got.keys() == want.keys()
+    for key, value in want.items():
+        if isinstance(value, dict):
+            assert_close(got[key], value)
+        elif isinstance(value, float) and not np.isnan(value):
+            assert got[key] == pytest.approx(value, rel=1e-6, abs=1e-2), key
+        elif isinstance(value, float):
+            assert np.isnan(got[key]), key
+        else:
+            assert got[key] == value, key
+
+
+def test_compact_layout(frames):
+    original, compact = frames
+    for col in compact.columns:
+        assert str(compact[col].dtype) == DASHBOARD_DTYPES[col], col
+    assert compact.memory_usage(deep=True).sum() < original.memory_usage(deep=True).sum() / 2
+    # Missing flags read as "not flagged", the same as the 2 ("no") they stand beside
+    assert compact[CHRONIC_COLS].isin([0, 1, 2]).all().all()
+
+
+def test_compact_frame_filters_and_aggregates_like_the_original(frames):
+    original, compact = frames
+    for selection in selections(original):
+        want = filter_frame(original, *selection)
+        got = filter_frame(compact, *selection)
+        np.testing.assert_array_equal(got["claim_id"].to_numpy(), want["claim_id"].to_numpy())
+        assert_close(aggregates(got), aggregates(want))
+
+
+def test_compact_groupbys_and_sorting(frames):
+    original, compact = frames
+    want = original.groupby(["state_code", "age_group"], observed=True)["medicare_payment"].sum()
+    got = compact.groupby(["state_code", "age_group"], observed=True)["medicare_payment"].sum()
+    assert {(int(s), a): v for (s, a), v in got.items()} == pytest.approx(
+        {(int(s), a): v for (s, a), v in want.items()}, rel=1e-6)
+    # Categoricals have sorted categories, so sorting by code sorts by value
+    for col in ["bene_id", "hcpcs_code"]:
+        order = compact.sort_values([col, "claim_id"], kind="stable")["claim_id"].to_numpy()
+        np.testing.assert_array_equal(order, original.sort_values([col, "claim_id"], kind="stable")["claim_id"].to_numpy())
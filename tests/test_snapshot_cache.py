@@ -0,0 +1,139 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import snapshot_cache
+from schema import BENEFICIARY_COLUMNS, CHRONIC_COLS, CLAIM_COLUMNS
+from snapshot_cache import build_snapshot, load_snapshot, read_watermark, refresh_snapshot
+
+N_BENE, N_CLAIMS = 40, 500
+
+
+def beneficiaries():
+    rng = np.random.default_rng(1)
+    benes = pd.DataFrame({col: [None] * N_BENE for col in BENEFICIARY_COLUMNS})
+    benes["bene_id"] = [f"b{i:03d}" for i in range(N_BENE)]
+    benes["birth_date"] = "1940-06-01"
+    benes["state_code"] = rng.choice([1, 5, 10], N_BENE)
+    benes[CHRONIC_COLS] = rng.integers(1, 3, (N_BENE, len(CHRONIC_COLS)))
+    return benes
+
+
+def claims(start, n, claim_thru="2009-03-01"):
+    rng = np.random.default_rng(start)
+    return pd.DataFrame({
+        "claim_id": np.arange(start, start + n),
+        "bene_id": [f"b{i % N_BENE:03d}" for i in range(start, start + n)],
+        "claim_from": claim_thru,
+        "claim_thru": claim_thru,
+        "icd9_diagnosis_code": rng.choice(["4019", "25000", "V5869"], n),
+        "hcpcs_code": None,
+        "medicare_payment": rng.uniform(0, 500, n).round(2),
+        "patient_deductible": 0.0,
+        "coinsurance_amount": 0.0,
+    })[CLAIM_COLUMNS]
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    beneficiaries().to_sql("beneficiary_info", conn, index=False)
+    claims(1, N_CLAIMS).to_sql("claims", conn, index=False)
+    yield conn
+    conn.close()
+
+
+def expected(conn):
+    return pd.read_sql("SELECT c.claim_id, c.medicare_payment, b.state_code FROM claims c "
+                       "JOIN beneficiary_info b ON c.bene_id = b.bene_id ORDER BY c.claim_id", conn)
+
+
+def assert_matches_db(snapshot_dir, conn):
+    got = load_snapshot(snapshot_dir, columns=["claim_id", "medicare_payment", "state_code"])
+    got = got.sort_values("claim_id", ignore_index=True)
+    got["state_code"] = got["state_code"].astype("int64")
+    pd.testing.assert_frame_equal(got, expected(conn), check_dtype=False)
+
+
+def test_build_writes_partitions_and_watermark(db, tmp_path):
+    snap = tmp_path / "snapshot"
+    assert build_snapshot(db, snap, chunksize=120) == N_CLAIMS
+    assert_matches_db(snap, db)
+    assert sorted(p.name for p in (snap / "claims").iterdir()) == ["state_code=1", "state_code=10", "state_code=5"]
+    watermark = read_watermark(snap)
+    assert (watermark["claim_id"], watermark["claim_thru"], watermark["row_count"]) == (N_CLAIMS, "2009-03-01", N_CLAIMS)
+    # Nothing staged is left next to the snapshot
+    assert [p.name for p in tmp_path.iterdir()] == ["snapshot"]
+
+
+def test_refresh_appends_new_claims_and_replaces_updated_ones(db, tmp_path):
+    snap = tmp_path / "snapshot"
+    build_snapshot(db, snap)
+    version = read_watermark(snap)["refreshed_at"]
+
+    claims(N_CLAIMS + 1, 60, claim_thru="2009-04-01").to_sql("claims", db, index=False, if_exists="append")
+    db.execute("UPDATE claims SET medicare_payment = 9999, claim_thru = '2009-05-01' WHERE claim_id IN (3, 7)")
+    assert refresh_snapshot(db, snap, chunksize=25) == 62
+    assert_matches_db(snap, db)
+
+    watermark = read_watermark(snap)
+    assert (watermark["claim_id"], watermark["claim_thru"]) == (N_CLAIMS + 60, "2009-05-01")
+    assert watermark["row_count"] == N_CLAIMS + 60
+    assert watermark["refreshed_at"] != version
+    assert [p.name for p in tmp_path.iterdir()] == ["snapshot"]
+
+
+def test_refresh_drops_the_old_row_of_a_claim_whose_beneficiary_moved(db, tmp_path):
+    snap = tmp_path / "snapshot"
+    build_snapshot(db, snap)
+    bene_id, old_state = db.execute("SELECT bene_id, state_code FROM beneficiary_info LIMIT 1").fetchone()
+    new_state = 1 if old_state != 1 else 5
+    db.execute("UPDATE beneficiary_info SET state_code = ? WHERE bene_id = ?", (new_state, bene_id))
+    db.execute("UPDATE claims SET claim_thru = '2009-06-01' WHERE bene_id = ?", (bene_id,))
+
+    refresh_snapshot(db, snap)
+    assert_matches_db(snap, db)
+    moved = load_snapshot(snap, columns=["claim_id", "bene_id", "state_code"])
+    moved = moved[moved["bene_id"] == bene_id]
+    assert len(moved) == db.execute("SELECT COUNT(*) FROM claims WHERE bene_id = ?", (bene_id,)).fetchone()[0]
+    assert set(moved["state_code"].astype(int)) == {new_state}
+
+
+def test_refresh_leaves_the_previous_snapshot_untouched(db, tmp_path):
+    snap = tmp_path / "snapshot"
+    build_snapshot(db, snap)
+    before = {p: pq.read_table(p).num_rows for p in (snap / "claims").rglob("*.parquet")}
+    # An open reader of the old snapshot holds on to the old files, which a refresh replaces instead of editing
+    kept = {p: p.stat().st_ino for p in before}
+    db.execute("UPDATE claims SET claim_thru = '2009-06-01' WHERE claim_id <= 100")
+    refresh_snapshot(db, snap)
+    assert_matches_db(snap, db)
+    assert not any(p.exists() and p.stat().st_ino == ino and pq.read_table(p).num_rows != before[p]
+                   for p, ino in kept.items())
+
+
+def test_failed_build_keeps_the_previous_snapshot(db, tmp_path, monkeypatch):
+    snap = tmp_path / "snapshot"
+    build_snapshot(db, snap)
+    watermark = read_watermark(snap)
+    claims(N_CLAIMS + 1, 300).to_sql("claims", db, index=False, if_exists="append")
+
+    real_write = pq.write_to_dataset
+    calls = []
+
+    def crash_on_second_chunk(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        return real_write(*args, **kwargs)
+
+    monkeypatch.setattr(snapshot_cache.pq, "write_to_dataset", crash_on_second_chunk)
+    with pytest.raises(OSError):
+        build_snapshot(db, snap, chunksize=200)
+
+    assert read_watermark(snap) == watermark
+    assert len(load_snapshot(snap, columns=["claim_id"])) == N_CLAIMS
+    assert [p.name for p in tmp_path.iterdir()] == ["snapshot"]
@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from sql_splitter import InsertSplitter, iter_blocks, split_file, split_stream, split_text, write_synthetic_dump
+
+DUMP = """-- MySQL dump 10.13  Distrib 8.0; it's a comment
+/*!40101 SET NAMES utf8mb4 */;
+DROP TABLE IF EXISTS t;
+CREATE TABLE t (id INTEGER, note TEXT, v REAL) /* it's; (weird) */;
+INSERT INTO t VALUES (1,'a(b',1.5),(2,'c);d',-2),(3,'it''s; )',3),
+(4,'x',4e3) , (5, 'semi;colon', -0.5);
+# hash comment with ' quote
+INSERT INTO t (id, note, v) VALUES (6,'--not a comment',6),(7,'/* nope */',7),(8,'#no',8);
+insert into t values (9,"dq 'x' ;)",9),(10,'n',abs(-10)),(11,'(',11);
+-- trailing comment
+"""
+
+
+def split_in_blocks(text, block_size, rows_per_insert=2):
+    splitter = InsertSplitter(rows_per_insert)
+    out = [splitter.feed(text[i:i + block_size]) for i in range(0, len(text), block_size)]
+    out.append(splitter.close())
+    return "".join(out), splitter
+
+
+def load(sql):
+    # SQLite has no `#` comments; everything else in DUMP is valid SQLite too
+    db = sqlite3.connect(":memory:")
+    db.executescript("\n".join(line for line in sql.splitlines() if not line.startswith("#")))
+    return db.execute("SELECT id, note, v FROM t ORDER BY id").fetchall()
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 5, 7, 13, 64, 200])
+def test_block_boundaries_do_not_change_output(block_size):
+    out, _ = split_in_blocks(DUMP, block_size)
+    assert out == split_text(DUMP, 2)
+
+
+def test_split_keeps_literals_and_rows():
+    out, splitter = split_in_blocks(DUMP, len(DUMP))
+    assert splitter.rows == 11
+    # 5 + 3 + 3 rows at 2 per INSERT
+    assert splitter.statements == 3 + 2 + 2
+    rows = load(out)
+    assert rows == load(DUMP)
+    assert [note for _, note, _ in rows[:3]] == ["a(b", "c);d", "it's; )"]
+
+
+def test_parallel_split_matches_single_pass(tmp_path):
+    dump = tmp_path / "dump.sql"
+    rows = write_synthetic_dump(dump, 1, rows_per_statement=3000)
+    single, parallel = tmp_path / "single.sql", tmp_path / "parallel.sql"
+    split_file(dump, single, 333, workers=1, block_size=65536)
+    split_file(dump, parallel, 333, workers=2, block_size=65536, piece_size=100_000)
+    expected = single.read_text(encoding="utf-8")
+    assert parallel.read_text(encoding="utf-8") == expected
+    assert sum(line.startswith("INSERT") for line in expected.splitlines()) == sum(
+        -(-min(3000, rows - i) // 333) for i in range(0, rows, 3000))
+
+    # Statements over the limit are split in the main process while they stream in
+    chunks = []
+    split_stream(iter_blocks(dump, 50_000), chunks.append, 333, workers=2,
+                 piece_size=100_000, statement_limit=150_000)
+    assert "".join(chunks) == expected
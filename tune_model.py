@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+tune_model.py  [--search grid|random] [--trials 20] [--folds 5] [--workers N]
+               [--source db|snapshot] [--results tuning_results.csv] [--max-latency US] [--no-export]
+
+Hyperparameter search for the XGBoost cost model.
+
+Each trial is a parameter set scored by k-fold cross-validation over the
+training rows (the feature store's holdout rows are kept out of the search).
+Trials run in parallel on a process pool; every worker builds the fold
+`QuantileDMatrix`es once and reuses them for all of its trials. Boosting uses
+early stopping on each validation fold, and a trial is pruned as soon as one
+fold scores worse than the best mean MAE so far by more than `PRUNE_MARGIN`.
+
+MAE/R² per trial, the number of boosting rounds, training time, model size
+and prediction latency are written to a CSV. The best trial (optionally the
+best under a latency budget) is refit on all training rows, evaluated on the
+holdout and saved to models/*.joblib like `cost_predictor.py`, so the app and
+`batch_predict.py` pick it up unchanged.
+"""
+
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import KFold
+from xgboost import XGBRegressor
+
+from cost_predictor import MODEL_PARAMS, StageReport, connect_db, load_training_data, save_model
+from model_assets import MODELS_DIR
+from snapshot_cache import SNAPSHOT_DIR
+
+PARAM_GRID = {
+    "max_depth": [4, 6, 8],
+    "learning_rate": [0.05, 0.1, 0.3],
+    "min_child_weight": [1, 5],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.8, 1.0],
+}
+BASE_PARAMS = {"objective": "reg:squarederror", "tree_method": "hist", "eval_metric": "mae", "seed": 42}
+FOLDS = 5
+TRIALS = 20
+MAX_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 20
+PRUNE_MARGIN = 0.25
+LATENCY_ROWS = 10_000
+RESULTS_PATH = "tuning_results.csv"
+
+
+# 🎛 Search space
+def grid_trials(grid=PARAM_GRID):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+
+def random_trials(n, grid=PARAM_GRID, seed=42):
+    """`n` distinct parameter sets sampled from the grid (all of it if `n` covers it)."""
+    trials = grid_trials(grid)
+    return random.Random(seed).sample(trials, min(n, len(trials)))
+
+
+# 🧵 Worker state, set once per process by `_init_worker`
+_X = _y = _folds = _best = None
+_nthread = 1
+_matrices = {}
+
+
+def _init_worker(X, y, folds, best, nthread):
+    global _X, _y, _folds, _best, _nthread
+    _X, _y, _folds, _best, _nthread = X, y, folds, best, nthread
+
+
+def _fold_matrices(k):
+    """Train/validation `QuantileDMatrix` for fold `k`, built on first use."""
+    if k not in _matrices:
+        train_idx, valid_idx = _folds[k]
+        dtrain = xgb.QuantileDMatrix(_X[train_idx], _y[train_idx], nthread=_nthread)
+        dvalid = xgb.QuantileDMatrix(_X[valid_idx], _y[valid_idx], ref=dtrain, nthread=_nthread)
+        _matrices[k] = (dtrain, dvalid)
+    return _matrices[k]
+
+
+def _predict_latency_us(booster, X):
+    """Single-threaded prediction time per row, in microseconds."""
+    booster.set_param({"nthread": 1})
+    start = time.perf_counter()
+    booster.inplace_predict(X)
+    return (time.perf_counter() - start) / len(X) * 1e6
+
+
+def run_trial(trial, params, max_rounds=MAX_ROUNDS, early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+              prune_margin=PRUNE_MARGIN):
+    """Cross-validate one parameter set. Returns a results row."""
+    start = time.perf_counter()
+    maes, r2s, rounds = [], [], []
+    status = "complete"
+    for k in range(len(_folds)):
+        dtrain, dvalid = _fold_matrices(k)
+        booster = xgb.train(
+            {**BASE_PARAMS, **params, "nthread": _nthread}, dtrain,
+            num_boost_round=max_rounds, evals=[(dvalid, "valid")],
+            early_stopping_rounds=early_stopping_rounds, verbose_eval=False,
+        )
+        best_rounds = booster.best_iteration + 1
+        y_valid = _y[_folds[k][1]]
+        y_pred = booster.predict(dvalid, iteration_range=(0, best_rounds))
+        maes.append(mean_absolute_error(y_valid, y_pred))
+        r2s.append(r2_score(y_valid, y_pred))
+        rounds.append(best_rounds)
+        if maes[-1] > _best.value * (1 + prune_margin):
+            status = "pruned"
+            break
+    train_seconds = time.perf_counter() - start
+
+    mae = float(np.mean(maes))
+    if status == "complete":
+        with _best.get_lock():
+            _best.value = min(_best.value, mae)
+
+    # Size and latency of the last fold's model, cut at its best round
+    model = booster[:best_rounds]
+    sample = _X[_folds[k][1][:LATENCY_ROWS]]
+    return {
+        "trial": trial,
+        "status": status,
+        **params,
+        "folds": len(maes),
+        "mae": round(mae, 4),
+        "mae_std": round(float(np.std(maes)), 4),
+        "r2": round(float(np.mean(r2s)), 4),
+        "n_estimators": int(round(np.mean(rounds))),
+        "train_seconds": round(train_seconds, 2),
+        "model_bytes": len(model.save_raw("ubj")),
+        "predict_us_per_row": round(_predict_latency_us(model, sample), 3),
+    }
+
+
+# 🔎 Search
+def make_folds(n_rows, n_folds=FOLDS, seed=42):
+    return list(KFold(n_splits=n_folds, shuffle=True, random_state=seed).split(np.arange(n_rows)))
+
+
+def write_results(results, path=RESULTS_PATH):
+    df = pd.DataFrame(results).sort_values(["status", "mae"]).reset_index(drop=True)
+    df.to_csv(path, index=False)
+    return df
+
+
+def search(X, y, trials, n_folds=FOLDS, workers=None, results_path=RESULTS_PATH, **trial_kwargs):
+    """Run every trial on a process pool and write the results CSV. Returns it as a DataFrame."""
+    workers = workers or os.cpu_count() or 1
+    nthread = max(1, (os.cpu_count() or 1) // workers)
+    folds = make_folds(len(X), n_folds)
+    best = mp.Value("d", float("inf"))
+
+    results = []
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(X, y, folds, best, nthread)) as pool:
+        futures = [pool.submit(run_trial, i, params, **trial_kwargs) for i, params in enumerate(trials)]
+        for future in as_completed(futures):
+            row = future.result()
+            results.append(row)
+            mark = "✂️ " if row["status"] == "pruned" else "✅"
+            print(f"{mark} [{len(results)}/{len(trials)}] trial {row['trial']}: MAE {row['mae']:.2f} "
+                  f"({row['folds']} folds, {row['n_estimators']} rounds, {row['train_seconds']}s)")
+            write_results(results, results_path)
+    return write_results(results, results_path)
+
+
+def pick_trial(results, max_latency_us=None):
+    """Best complete trial by MAE, optionally within a per-row latency budget."""
+    candidates = results[results["status"] == "complete"]
+    if max_latency_us is not None:
+        candidates = candidates[candidates["predict_us_per_row"] <= max_latency_us]
+    if candidates.empty:
+        return None
+    return candidates.sort_values("mae").iloc[0]
+
+
+def trial_params(row):
+    params = {key: float(row[key]) for key in PARAM_GRID}
+    params["max_depth"] = int(params["max_depth"])
+    return params
+
+
+def refit(X, y, holdout, params, n_estimators, n_jobs=None):
+    """Fit the chosen parameters on all training rows and score the holdout. Returns `(model, mae, r2)`."""
+    model = XGBRegressor(
+        **{**MODEL_PARAMS, **params, "n_estimators": n_estimators},
+        tree_method="hist", n_jobs=n_jobs,
+    )
+    model.fit(X[~holdout], y[~holdout])
+    y_pred = model.predict(X[holdout])
+    return model, mean_absolute_error(y[holdout], y_pred), r2_score(y[holdout], y_pred)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Cross-validated hyperparameter search for the cost model.")
+    p.add_argument("--search", choices=["grid", "random"], default="random", help="Search strategy (default: random)")
+    p.add_argument("--trials", type=int, default=TRIALS, help=f"Trials for random search (default: {TRIALS})")
+    p.add_argument("--folds", type=int, default=FOLDS, help=f"Cross-validation folds (default: {FOLDS})")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Trial processes (default: CPU count)")
+    p.add_argument("--max-rounds", type=int, default=MAX_ROUNDS, help=f"Boosting round cap (default: {MAX_ROUNDS})")
+    p.add_argument("--early-stopping", type=int, default=EARLY_STOPPING_ROUNDS,
+                   help=f"Rounds without improvement before stopping (default: {EARLY_STOPPING_ROUNDS})")
+    p.add_argument("--prune-margin", type=float, default=PRUNE_MARGIN,
+                   help=f"Prune a trial whose fold MAE exceeds the best by this fraction (default: {PRUNE_MARGIN})")
+    p.add_argument("--sample", type=int, help="Cross-validate on at most this many training rows")
+    p.add_argument("--source", choices=["db", "snapshot"], default="db", help="Where to read claims (default: db)")
+    p.add_argument("--snapshot-dir", default=str(SNAPSHOT_DIR), help=f"Snapshot directory (default: {SNAPSHOT_DIR})")
+    p.add_argument("--no-cache", action="store_true", help="Don't read or write the feature store")
+    p.add_argument("--results", default=RESULTS_PATH, help=f"Results CSV (default: {RESULTS_PATH})")
+    p.add_argument("--max-latency", type=float, metavar="US",
+                   help="Export the best trial predicting under this many µs per row")
+    p.add_argument("--models-dir", default=MODELS_DIR, help=f"Where to save the .joblib assets (default: {MODELS_DIR})")
+    p.add_argument("--no-export", action="store_true", help="Only write the results, don't refit and save a model")
+    args = p.parse_args()
+
+    report = StageReport()
+    with connect_db() if args.source == "db" else nullcontext() as conn:
+        X, y, holdout, le_icd9, le_hcpcs = load_training_data(
+            args.source, report, conn, args.snapshot_dir, not args.no_cache
+        )
+
+    X_cv = X[~holdout].to_numpy(dtype=np.float32)
+    y_cv = y[~holdout].to_numpy(dtype=np.float32)
+    if args.sample and args.sample < len(X_cv):
+        keep = np.random.default_rng(42).choice(len(X_cv), args.sample, replace=False)
+        X_cv, y_cv = X_cv[keep], y_cv[keep]
+
+    trials = grid_trials() if args.search == "grid" else random_trials(args.trials)
+    print(f"🔎 {len(trials)} trials × {args.folds} folds on {len(X_cv):,} rows with {args.workers} worker(s)")
+    with report.stage("search"):
+        results = search(
+            X_cv, y_cv, trials, args.folds, args.workers, args.results,
+            max_rounds=args.max_rounds, early_stopping_rounds=args.early_stopping, prune_margin=args.prune_margin,
+        )
+    pruned = (results["status"] == "pruned").sum()
+    print(f"📄 Results for {len(results)} trials ({pruned} pruned) written to {args.results}")
+    print(results.head(5).to_string(index=False))
+
+    if not args.no_export:
+        best = pick_trial(results, args.max_latency)
+        if best is None:
+            print("❌ No complete trial meets the latency budget; nothing exported.")
+        else:
+            params = trial_params(best)
+            print(f"🏆 Trial {best['trial']}: {params}, {best['n_estimators']} rounds")
+            with report.stage("refit"):
+                model, mae, r2 = refit(X, y, holdout, params, int(best["n_estimators"]))
+            print(f"MAE: {mae:.2f}")
+            print(f"R^2 Score: {r2:.2f}")
+            with report.stage("save"):
+                save_model(model, le_icd9, le_hcpcs, args.models_dir)
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
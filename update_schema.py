@@ -1,5 +1,6 @@
 import mysql.connector
-from config.db_config import DB_CONFIG
+from config.db_config import connection
+from chronic_flags import mask_sql
 
 ALTER_QUERY = """
 ALTER TABLE beneficiary_info
@@ -16,19 +17,33 @@ ADD COLUMN SP_RA_OA TINYINT,
 ADD COLUMN SP_STRKETIA TINYINT;
 """
 
+# Bit-packed copy of the SP_* flags (see chronic_flags.py), backfilled from the flags
+MASK_ALTER_QUERY = "ALTER TABLE beneficiary_info ADD COLUMN chronic_mask SMALLINT UNSIGNED;"
+MASK_BACKFILL_QUERY = f"UPDATE beneficiary_info SET chronic_mask = {mask_sql()};"
+
+def add_columns(cursor, query, description):
+    try:
+        cursor.execute(query)
+        print(f"✅ Schema updated: {description}")
+    except mysql.connector.Error as err:
+        if err.errno == 1060:
+            print("⚠️ Columns already exist. Nothing changed.")
+        else:
+            raise
+
 try:
     print("🔌 Connecting to MySQL...")
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    cursor.execute(ALTER_QUERY)
-    conn.commit()
-    print("✅ Schema updated: Chronic condition columns added to `beneficiary_info`.")
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            add_columns(cursor, ALTER_QUERY, "Chronic condition columns added to `beneficiary_info`.")
+            add_columns(cursor, MASK_ALTER_QUERY, "`chronic_mask` column added to `beneficiary_info`.")
+            cursor.execute(MASK_BACKFILL_QUERY)
+            conn.commit()
+            print(f"✅ Backfilled `chronic_mask` for {cursor.rowcount:,} rows.")
+        finally:
+            cursor.close()
+    print("🔒 Connection returned to the pool.")
 except mysql.connector.Error as err:
-    if err.errno == 1060:
-        print("⚠️ Columns already exist. Nothing changed.")
-    else:
-        print(f"❌ Error: {err}")
-finally:
-    cursor.close()
-    conn.close()
-    print("🔒 Connection closed.")
+    # The pool rolls the connection back before reuse, or closes it if that fails too
+    print(f"❌ Error: {err}")